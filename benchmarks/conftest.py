@@ -0,0 +1,219 @@
+"""
+Benchmarks for the hot paths of Normandy.
+
+The benchmarks seed a test database with a synthetic dataset, made with the
+factories used by the tests, and measure the latency, throughput, database
+queries and memory use of API views, management commands and system checks.
+They are not run with the normal test suite. Run them with::
+
+    pytest benchmarks --recipes 1000 --benchmark-json results.json
+
+and compare two runs with ``bin/compare_benchmarks.py``.
+"""
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from normandy.base.queries import QueryCounter
+from normandy.base.tests import UserFactory
+from normandy.recipes.models import Recipe
+from normandy.recipes.tests import (
+    ActionFactory,
+    ApprovalRequestFactory,
+    BucketSampleFilterFactory,
+    ChannelFactory,
+    ChannelFilterFactory,
+    CountryFactory,
+    CountryFilterFactory,
+    LocaleFactory,
+    LocaleFilterFactory,
+    RecipeFactory,
+    SignatureFactory,
+    StableSampleFilterFactory,
+)
+
+
+DATASET_OPTIONS = [
+    ("recipes", 200, "Number of recipes to create"),
+    ("revisions", 3, "Number of revisions to create for each recipe"),
+    ("filters", 3, "Number of filter objects in each revision, up to 5"),
+    ("channels", 4, "Number of channels to create"),
+    ("countries", 50, "Number of countries to create"),
+    ("locales", 50, "Number of locales to create"),
+    ("actions", 5, "Number of actions to create"),
+]
+
+# Results of the benchmarks run in this session, written out at the end
+results = []
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("normandy benchmarks")
+    for name, default, help in DATASET_OPTIONS:
+        group.addoption(f"--{name}", type=int, default=default, help=f"{help} (default {default})")
+    group.addoption(
+        "--rounds", type=int, default=20, help="Number of timed calls of each benchmark"
+    )
+    group.addoption("--seed", type=int, default=0, help="Seed used to generate the dataset")
+    group.addoption("--benchmark-json", default=None, help="Path to write the results to, as JSON")
+
+
+def percentile(sorted_values, fraction):
+    """The nearest-rank percentile of a sorted list of values."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def measure(func, rounds):
+    """
+    Measure the cost of calling `func`.
+
+    The function is called once to warm up, once to count queries, once to
+    measure memory and then `rounds` times to measure time, so that each
+    measurement is not affected by the others.
+    """
+    func()
+
+    query_counter = QueryCounter()
+    with query_counter.capture():
+        func()
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    return {
+        "rounds": rounds,
+        "mean": statistics.mean(timings),
+        "min": timings[0],
+        "max": timings[-1],
+        "p50": percentile(timings, 0.5),
+        "p90": percentile(timings, 0.9),
+        "p99": percentile(timings, 0.99),
+        "throughput": rounds / sum(timings),
+        "queries": query_counter.count,
+        "db_time": query_counter.duration,
+        "max_repeated_queries": max(query_counter.shapes.values(), default=0),
+        "peak_memory": peak_memory,
+    }
+
+
+@pytest.fixture
+def benchmark(request):
+    """
+    Fixture to measure a function, and record the result for the session.
+
+    Usage::
+
+        def test_something(benchmark):
+            benchmark(lambda: do_something())
+    """
+
+    def run(func, name=None):
+        stats = measure(func, request.config.getoption("rounds"))
+        name = name or request.node.name
+        results.append({"name": name, "group": request.module.__name__, **stats})
+        return stats
+
+    return run
+
+
+@pytest.fixture(scope="session")
+def dataset(request, django_db_setup, django_db_blocker):
+    """
+    Seed the test database with a synthetic dataset, once per session.
+
+    Every recipe gets several revisions. The last revision of every other
+    recipe is approved, enabled and signed.
+    """
+    options = {name: request.config.getoption(name) for name, _, _ in DATASET_OPTIONS}
+    rng = random.Random(request.config.getoption("seed"))
+
+    with django_db_blocker.unblock():
+        channels = [ChannelFactory() for _ in range(options["channels"])]
+        countries = [CountryFactory() for _ in range(options["countries"])]
+        locales = [LocaleFactory() for _ in range(options["locales"])]
+        actions = [ActionFactory() for _ in range(options["actions"])]
+        user = UserFactory()
+
+        def sample(objects, count):
+            return rng.sample(objects, min(count, len(objects)))
+
+        def filter_object():
+            builders = [
+                lambda: ChannelFilterFactory(channel_objects=sample(channels, 1)),
+                lambda: LocaleFilterFactory(locale_objects=sample(locales, 3)),
+                lambda: CountryFilterFactory(country_objects=sample(countries, 3)),
+                StableSampleFilterFactory,
+                BucketSampleFilterFactory,
+            ]
+            return [build() for build in builders[: options["filters"]]]
+
+        for i in range(options["recipes"]):
+            recipe = RecipeFactory(
+                name=f"Recipe {i}", action=rng.choice(actions), filter_object_json=filter_object()
+            )
+            for revision_number in range(1, options["revisions"]):
+                recipe.revise(
+                    name=f"Recipe {i} revision {revision_number}",
+                    filter_object_json=filter_object(),
+                )
+
+            if i % 2 == 0:
+                approval_request = ApprovalRequestFactory(revision=recipe.latest_revision)
+                approval_request.approve(user, "r+")
+                recipe.approved_revision.enable(user)
+                recipe.refresh_from_db()
+                recipe.signature = SignatureFactory(data=recipe.canonical_json())
+                recipe.save()
+
+    return {**options, "recipe_ids": list(Recipe.objects.values_list("id", flat=True))}
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not results:
+        return
+    terminalreporter.section("benchmarks")
+    for result in results:
+        terminalreporter.write_line(
+            f"{result['name']:<60} "
+            f"p50 {result['p50'] * 1000:9.2f} ms  "
+            f"p90 {result['p90'] * 1000:9.2f} ms  "
+            f"{result['throughput']:9.1f} ops/s  "
+            f"{result['queries']:5d} queries  "
+            f"{result['peak_memory'] / 1024:9.0f} KiB"
+        )
+
+
+def pytest_sessionfinish(session):
+    path = session.config.getoption("benchmark_json")
+    if not path or not results:
+        return
+
+    data = {
+        "datetime": datetime.utcnow().isoformat(),
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "options": {
+            name: session.config.getoption(name)
+            for name in [name for name, _, _ in DATASET_OPTIONS] + ["rounds", "seed"]
+        },
+        "benchmarks": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
@@ -0,0 +1,42 @@
+import pytest
+
+
+pytestmark = pytest.mark.django_db
+
+# These are paths hit by self repair that need to be very fast. This is the
+# same list that the contract tests check for cache headers.
+HOT_PATHS = [
+    "/en-US/repair",
+    "/en-US/repair/",
+    "/api/v1/recipe/?enabled=1",
+    "/api/v1/recipe/signed/?enabled=1",
+    "/api/v1/action/",
+]
+
+V3_PATHS = [
+    "/api/v3/recipe/",
+    "/api/v3/recipe/{recipe_id}/",
+    "/api/v3/recipe/{recipe_id}/history/",
+    "/api/v3/capabilities/",
+]
+
+
+def get(client, path):
+    def request():
+        res = client.get(path)
+        assert res.status_code == 200
+        # Streamed listings are rendered while their content is read
+        res.content
+
+    return request
+
+
+@pytest.mark.parametrize("path", HOT_PATHS)
+def test_hot_paths(benchmark, client, dataset, path):
+    benchmark(get(client, path), name=f"GET {path}")
+
+
+@pytest.mark.parametrize("path", V3_PATHS)
+def test_v3_recipes(benchmark, client, dataset, path):
+    url = path.format(recipe_id=dataset["recipe_ids"][0])
+    benchmark(get(client, url), name=f"GET {path}")
@@ -0,0 +1,51 @@
+from io import StringIO
+
+from django.core.checks import run_checks
+from django.core.management import call_command
+
+import pytest
+import requests_mock
+
+from normandy.recipes import exports
+from normandy.recipes.models import Recipe
+from normandy.recipes.tests import SignatureFactory, fake_sign
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_update_recipe_signatures(benchmark, dataset, mocker):
+    autographer = mocker.patch("normandy.recipes.models.Autographer")
+    autographer.return_value.sign_data.side_effect = fake_sign
+
+    benchmark(lambda: call_command("update_recipe_signatures", "--force", stdout=StringIO()))
+
+
+def test_sync_remote_settings(benchmark, dataset, settings):
+    settings.REMOTE_SETTINGS_URL = "https://remotesettings.example.com/v1"
+    settings.REMOTE_SETTINGS_USERNAME = "normandy"
+    settings.REMOTE_SETTINGS_PASSWORD = "n0rm4ndy"
+    records_url = (
+        f"{settings.REMOTE_SETTINGS_URL}/buckets/{settings.REMOTE_SETTINGS_PUBLISH_BUCKET_ID}"
+        f"/collections/{settings.REMOTE_SETTINGS_CAPABILITIES_COLLECTION_ID}/records"
+    )
+    # Every enabled recipe is already published, so the whole run is spent
+    # comparing local recipes with their records.
+    records = [exports.recipe_as_record(r) for r in Recipe.objects.only_enabled()]
+
+    with requests_mock.mock() as requestsmock:
+        requestsmock.get(records_url, json={"data": records})
+        benchmark(
+            lambda: call_command("sync_remote_settings", "--full", "--dry-run", stdout=StringIO())
+        )
+
+
+def test_system_checks(benchmark, dataset, mocker):
+    # Don't fetch certificates. The signatures of the dataset are fake, so
+    # they are all reported as bad, but they are still all verified.
+    mocker.patch("normandy.recipes.signing.verify_x5u")
+    mocker.patch(
+        "normandy.recipes.signing.get_x5u_public_key", return_value=SignatureFactory.public_key
+    )
+
+    benchmark(run_checks)
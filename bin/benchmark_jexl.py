@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Compare the cost of validating JEXL expressions with a new JEXL instance for
+each expression, against the shared instance and cache used by Normandy.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normandy.recipes import jexl  # noqa
+
+
+EXPRESSIONS = [
+    '(normandy.channel in ["release", "beta"])',
+    '(normandy.locale in ["en-US", "en-GB"]) && (normandy.country in ["US", "GB"])',
+    '(["global-v1", normandy.userId]|bucketSample(0, 100, 10000))',
+    '("app.normandy.enabled"|preferenceValue == true) && (normandy.version >= "72")',
+    '(normandy.telemetry.main.environment.profile.creationDate|date < "2020-01-01"|date)',
+]
+
+
+def validate_with_new_instance(expression):
+    return list(jexl.build_jexl().validate(expression))
+
+
+def validate_with_shared_instance(expression):
+    jexl.clear_cache()
+    return jexl.validate(expression)
+
+
+def validate_with_cache(expression):
+    return jexl.validate(expression)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=200, help="Calls per expression")
+    args = parser.parse_args()
+
+    for name, func in [
+        ("new instance", validate_with_new_instance),
+        ("shared instance", validate_with_shared_instance),
+        ("shared instance and cache", validate_with_cache),
+    ]:
+        elapsed = timeit.timeit(
+            lambda: [func(expression) for expression in EXPRESSIONS], number=args.number
+        )
+        per_call = elapsed / (args.number * len(EXPRESSIONS))
+        print(f"{name:>26}: {per_call * 1e6:10.1f} µs per call")
+
+
+if __name__ == "__main__":
+    main()
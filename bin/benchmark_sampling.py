@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+"""
+Compare the cost of sampling client IDs one at a time, against sampling them
+in batches, for both stable samples and bucket samples.
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normandy.recipes import utils  # noqa
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=200000, help="Client IDs to sample")
+    args = parser.parse_args()
+
+    user_ids = [str(uuid.uuid4()) for _ in range(args.number)]
+    recipe_inputs = [[user_id, 42] for user_id in user_ids]
+    namespace_inputs = [[user_id] for user_id in user_ids]
+
+    for name, func in [
+        (
+            "stableSample one at a time",
+            lambda: [utils.deterministic_sample(0.1, inputs) for inputs in recipe_inputs],
+        ),
+        ("stableSample batched", lambda: utils.deterministic_sample_many(0.1, recipe_inputs)),
+        (
+            "bucketSample one at a time",
+            lambda: [
+                utils.bucket_sample(["global-v1", user_id], 0, 100, 10000) for user_id in user_ids
+            ],
+        ),
+        (
+            "bucketSample batched",
+            lambda: utils.bucket_sample_many(
+                0, 100, 10000, namespace_inputs, prefix=["global-v1"]
+            ),
+        ),
+    ]:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        print(f"{name:>26}: {elapsed / args.number * 1e6:10.2f} µs per client")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""
+Compare two runs of the benchmarks in ``benchmarks/``, as written by
+``pytest benchmarks --benchmark-json``, to find regressions.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        data = json.load(f)
+    return data["options"], {result["name"]: result for result in data["benchmarks"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("before", help="Results of the baseline run")
+    parser.add_argument("after", help="Results of the run to compare")
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Ratio of median times above which a benchmark is a regression",
+    )
+    args = parser.parse_args()
+
+    before_options, before = load(args.before)
+    after_options, after = load(args.after)
+    if before_options != after_options:
+        print("Warning: the runs used different options, so they may not be comparable")
+
+    regressions = 0
+    print(f"{'benchmark':<60} {'p50 before':>10} {'p50 after':>10} {'ratio':>6} {'queries':>9}")
+    for name, result in after.items():
+        if name not in before:
+            print(f"{name:<60} {'new':>10}")
+            continue
+        old = before[name]
+        ratio = result["p50"] / old["p50"]
+        is_regression = ratio > args.threshold or result["queries"] > old["queries"]
+        regressions += is_regression
+        print(
+            f"{name:<60} "
+            f"{old['p50'] * 1000:8.2f}ms {result['p50'] * 1000:8.2f}ms {ratio:6.2f} "
+            f"{result['queries'] - old['queries']:+9d}"
+            f"{'  REGRESSION' if is_regression else ''}"
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,72 @@
-from normandy.base.decorators import api_cache_control
+from rest_framework.response import Response
+
+from normandy.base.api.renderers import CanonicalJSONRenderer
+from normandy.base.api.responses import StreamingJSONResponse
+from normandy.base.decorators import api_cache_control, api_etag, api_response_cache
 
 
 class CachingViewsetMixin(object):
     """Modify a ModelViewSet to add caching to read methods"""
 
+    def get_cache_version(self, request):
+        """
+        Get a version of the data of this viewset to derive ETags and cache
+        keys from, or None to not use either. See
+        :func:`normandy.base.decorators.api_etag`.
+        """
+        return None
+
     @api_cache_control()
+    @api_etag
+    @api_response_cache
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
     @api_cache_control()
+    @api_etag
+    @api_response_cache
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
+
+
+class StreamingListMixin(object):
+    """
+    Modify a viewset without pagination to stream its listings as they are
+    rendered, when they are rendered as canonical JSON.
+    """
+
+    #: The number of objects fetched and rendered at a time.
+    stream_chunk_size = 100
+
+    def list(self, request, *args, **kwargs):
+        if self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.get_list_response(self.get_serializer(queryset, many=True))
+
+    def get_list_response(self, serializer):
+        """
+        Get the response for a list serializer, streaming it if the
+        requested format is canonical JSON.
+        """
+        if isinstance(self.request.accepted_renderer, CanonicalJSONRenderer):
+            return StreamingJSONResponse(serializer, self.stream_chunk_size)
+        return Response(serializer.data)
+
+
+class CursorPaginationMixin(object):
+    """
+    Modify a viewset to use `cursor_pagination_class` instead of its usual
+    pagination when it is requested with ``?pagination=cursor``, so that
+    existing clients keep getting numbered pages.
+    """
+
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        request = getattr(self, "request", None)
+        if not hasattr(self, "_paginator") and request is not None:
+            if request.query_params.get("pagination") == "cursor":
+                self._paginator = self.cursor_pagination_class()
+        return super().paginator
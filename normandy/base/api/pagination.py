@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination with a fixed ordering, whose first field may follow
+    relations.
+
+    Each page is found by filtering on the first field of the ordering from
+    where the last page ended, rather than with an offset, and the listing
+    isn't counted, so deep pages are as fast as the first one. Objects that
+    share a value of the first field are ordered by the other fields.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        # A cursor is only valid for the ordering it was made with, so
+        # ordering filters are ignored.
+        return tuple(self.ordering)
+
+    def _get_position_from_instance(self, instance, ordering):
+        value = instance
+        for attr in ordering[0].lstrip("-").split("__"):
+            value = value[attr] if isinstance(value, dict) else getattr(value, attr)
+        return str(value)
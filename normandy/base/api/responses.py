@@ -0,0 +1,132 @@
+import itertools
+import json
+import logging
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+
+from rest_framework.response import Response
+
+from normandy.base.api.renderers import CanonicalJSONRenderer
+from normandy.base.utils import canonical_json_dumps
+
+
+ERROR_STREAMING_FAILED = "normandy.base.api.responses.E001"
+
+
+logger = logging.getLogger(__name__)
+
+
+class PrerenderedResponse(Response):
+    """A response that serves content that has already been rendered."""
+
+    def __init__(self, content, content_type, **kwargs):
+        super().__init__(None, **kwargs)
+        self.prerendered_content = content
+        self.prerendered_content_type = content_type
+
+    @property
+    def data(self):
+        # Only parsed if something asks for it, such as the test client.
+        if self._data is None:
+            self._data = json.loads(self.prerendered_content)
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
+    @property
+    def rendered_content(self):
+        self["Content-Type"] = self.prerendered_content_type
+        return self.prerendered_content
+
+
+def iter_chunks(objects, chunk_size):
+    """
+    Iterate over a queryset in lists of at most `chunk_size` objects.
+
+    Unlike ``QuerySet.iterator()``, each chunk is fetched with the queryset's
+    ``select_related`` and ``prefetch_related``. The primary keys are fetched
+    first, so chunks come in the queryset's order, including any duplicate
+    rows made by joins.
+    """
+    if not isinstance(objects, QuerySet):
+        objects = list(objects)
+        for start in range(0, len(objects), chunk_size):
+            yield objects[start : start + chunk_size]
+        return
+
+    pks = list(objects.values_list("pk", flat=True))
+    for start in range(0, len(pks), chunk_size):
+        chunk = pks[start : start + chunk_size]
+        by_pk = {obj.pk: obj for obj in objects.filter(pk__in=chunk)}
+        # Objects deleted since the primary keys were fetched are skipped.
+        yield [by_pk[pk] for pk in chunk if pk in by_pk]
+
+
+def iter_canonical_json_list(serializer, chunk_size):
+    """
+    Render the data of a list serializer as canonical JSON, one chunk of
+    objects at a time. The output is identical to rendering it all at once
+    with :class:`normandy.base.api.renderers.CanonicalJSONRenderer`.
+    """
+    yield b"["
+    separator = b""
+    for chunk in iter_chunks(serializer.instance, chunk_size):
+        items = [canonical_json_dumps(serializer.child.to_representation(obj)) for obj in chunk]
+        if items:
+            yield separator + ",".join(items).encode()
+            separator = b","
+    yield b"]"
+
+
+def log_streaming_errors(chunks):
+    """
+    Pass through the chunks of a streamed response, logging any error that
+    happens while they are rendered.
+
+    The status has already been sent by then, so the error is raised again
+    for the server to abort the response, rather than end it as if the
+    truncated content was complete. That also stops it from being cached.
+    """
+    try:
+        yield from chunks
+    except Exception:
+        logger.exception(
+            "Error while streaming a response", extra={"code": ERROR_STREAMING_FAILED}
+        )
+        raise
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """
+    A response that renders the data of a list serializer as canonical JSON
+    while it is sent, so that the whole list is never held in memory.
+
+    The first chunk of objects is rendered when the response is created, so
+    that common failures, such as a broken query, still cause an error
+    response instead of a truncated one.
+    """
+
+    def __init__(self, serializer, chunk_size, **kwargs):
+        kwargs.setdefault("content_type", CanonicalJSONRenderer.media_type)
+        chunks = iter_canonical_json_list(serializer, chunk_size)
+        # The opening bracket, and either the first objects or the closing bracket
+        first_chunks = [next(chunks), next(chunks)]
+        super().__init__(log_streaming_errors(itertools.chain(first_chunks, chunks)), **kwargs)
+        self._joined_content = None
+        self._data = None
+
+    @property
+    def content(self):
+        # Only joined if something asks for it, such as the test client.
+        if self._joined_content is None:
+            self._joined_content = b"".join(self.streaming_content)
+        return self._joined_content
+
+    @property
+    def data(self):
+        if self._data is None:
+            self._data = json.loads(self.content)
+        return self._data
@@ -1,10 +1,23 @@
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+import markus
 from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, quote_etag
 from django.views.decorators.cache import cache_control
 
+from normandy.base.api.responses import PrerenderedResponse
 
-def api_cache_control(**kwargs):
+
+metrics = markus.get_metrics("normandy.api_response_cache")
+
+
+def get_api_cache_directives(**kwargs):
     """
-    Adds cache headers to a view using our API cache header defaults.
+    Get the Cache-Control directives for an API response, using our API cache
+    header defaults.
     """
     if settings.API_CACHE_ENABLED:
         directives = {"public": True, "max_age": settings.API_CACHE_TIME}
@@ -12,4 +25,129 @@ def api_cache_control(**kwargs):
         directives = {"no_cache": True, "no_store": True, "must_revalidate": True}
 
     directives.update(kwargs)
-    return cache_control(**directives)
+    return directives
+
+
+def api_cache_control(**kwargs):
+    """
+    Adds cache headers to a view using our API cache header defaults.
+    """
+    return cache_control(**get_api_cache_directives(**kwargs))
+
+
+def get_cache_version(view, request):
+    """
+    Get ``view.get_cache_version(request)``, only calling it once per view
+    instance, since each one handles a single request.
+    """
+    if not hasattr(view, "_cache_version"):
+        view._cache_version = view.get_cache_version(request)
+    return view._cache_version
+
+
+def get_cache_key(version, request):
+    """
+    Get a key for the response to a request, given the version of the data
+    it renders. The same data is rendered differently for each host, scheme,
+    path, set of query parameters and format, since responses contain
+    absolute URLs.
+    """
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    parts = [
+        version,
+        request.scheme,
+        request.get_host(),
+        request.path,
+        query,
+        getattr(request, "accepted_media_type", ""),
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def store_streamed(chunks, store):
+    """
+    Pass through the chunks of a streamed response, and call `store` with
+    all of them joined once they have all been sent.
+    """
+    sent = []
+    for chunk in chunks:
+        sent.append(chunk)
+        yield chunk
+    store(b"".join(sent))
+
+
+def api_etag(view_method):
+    """
+    Adds a strong ETag to a method of an API view, and answers requests with
+    a matching If-None-Match header with a 304 before the method runs.
+
+    The ETag is derived from ``view.get_cache_version(request)``, which must
+    change whenever the data the view renders does, and should be much
+    cheaper than rendering it. If it returns None, no ETag is used.
+    """
+
+    @wraps(view_method)
+    def wrapped(view, request, *args, **kwargs):
+        # Get the version before rendering, so that a change made while
+        # rendering can only make the ETag older than the content, not newer.
+        version = get_cache_version(view, request)
+        if version is None:
+            return view_method(view, request, *args, **kwargs)
+
+        etag = quote_etag(get_cache_key(version, request))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        response["ETag"] = etag
+        return response
+
+    return wrapped
+
+
+def api_response_cache(view_method):
+    """
+    Caches the rendered responses of a method of an API view on the server.
+
+    Like :func:`api_etag`, responses are keyed by the version returned by
+    ``view.get_cache_version(request)``, so changing the data invalidates
+    them immediately. Only JSON responses are cached, since the browsable API
+    includes details of the user.
+    """
+
+    @wraps(view_method)
+    def wrapped(view, request, *args, **kwargs):
+        media_type = getattr(request, "accepted_media_type", "")
+        if not settings.API_RESPONSE_CACHE_ENABLED or not media_type.startswith(
+            "application/json"
+        ):
+            return view_method(view, request, *args, **kwargs)
+
+        version = get_cache_version(view, request)
+        if version is None:
+            return view_method(view, request, *args, **kwargs)
+
+        key = f"api-response:{get_cache_key(version, request)}"
+        tags = [f"view:{type(view).__name__}.{view_method.__name__}"]
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.incr("hit", tags=tags)
+            content, content_type = cached
+            return PrerenderedResponse(content, content_type)
+
+        metrics.incr("miss", tags=tags)
+        response = view_method(view, request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+
+        def store(content):
+            cache.set(key, (content, response["Content-Type"]), settings.API_RESPONSE_CACHE_TIME)
+
+        if response.streaming:
+            response.streaming_content = store_streamed(response.streaming_content, store)
+        elif hasattr(response, "add_post_render_callback"):
+            response.add_post_render_callback(lambda rendered: store(rendered.content))
+        return response
+
+    return wrapped
@@ -14,8 +14,11 @@ from django.middleware.security import SecurityMiddleware
 
 from whitenoise.middleware import WhiteNoiseMiddleware
 
+from normandy.base.queries import QueryBudgetExceeded, QueryCounter
+
 
 DEBUG_HTTP_TO_HTTPS_REDIRECT = "normandy.base.middleware.D001"
+WARNING_QUERY_BUDGET_EXCEEDED = "normandy.base.middleware.W001"
 
 
 logger = logging.getLogger(__name__)
@@ -122,27 +125,104 @@ class NormandySecurityMiddleware(SecurityMiddleware):
         return response
 
 
+def get_view_name(request):
+    """The dotted path of the view that handled a request."""
+    if request.resolver_match:
+        view = request.resolver_match.func
+        return f"{view.__module__}.{view.__name__}"
+    else:
+        return "<unknown view>"
+
+
+def call_when_exhausted(iterator, callback):
+    """Yield the items of `iterator`, then call `callback`."""
+    yield from iterator
+    callback()
+
+
 def response_metrics_middleware(get_response):
     def middleware(request):
         start_time = time.time()
         response = get_response(request)
         delta = time.time() - start_time
 
-        if request.resolver_match:
-            view = request.resolver_match.func
-            view_name = f"{view.__module__}.{view.__name__}"
+        tags = [
+            f"status:{response.status_code}",
+            f"view:{get_view_name(request)}",
+            f"method:{request.method}",
+        ]
+        metrics.timing("response", value=delta * 1000.0, tags=tags)
+
+        # Set by query_budget_middleware, if it is enabled
+        query_counter = getattr(request, "query_counter", None)
+        if query_counter is not None:
+
+            def send_query_metrics():
+                metrics.histogram("response.queries", value=query_counter.count, tags=tags)
+                metrics.timing(
+                    "response.db_time", value=query_counter.duration * 1000.0, tags=tags
+                )
+
+            # Streamed responses make queries until all their content is sent
+            if response.streaming:
+                response.streaming_content = call_when_exhausted(
+                    response.streaming_content, send_query_metrics
+                )
+            else:
+                send_query_metrics()
+
+        return response
+
+    return middleware
+
+
+def query_budget_middleware(get_response):
+    """
+    Counts the queries made while handling each request, and checks them
+    against the query budget of the view.
+
+    A request exceeds the budget if it makes more queries than the budget of
+    its view in ``settings.QUERY_BUDGETS``, or ``settings.QUERY_BUDGET_DEFAULT``
+    for views without one, or if it repeats the same query more than
+    ``settings.QUERY_BUDGET_MAX_REPEATS`` times. Requests that exceed their
+    budget are logged, or fail if ``settings.QUERY_BUDGET_RAISE`` is set.
+    """
+
+    def middleware(request):
+        query_counter = QueryCounter()
+        with query_counter.capture():
+            response = get_response(request)
+        request.query_counter = query_counter
+
+        def check_budget():
+            view_name = get_view_name(request)
+            max_queries = settings.QUERY_BUDGETS.get(view_name, settings.QUERY_BUDGET_DEFAULT)
+            problems = query_counter.problems(
+                max_queries=max_queries, max_repeats=settings.QUERY_BUDGET_MAX_REPEATS
+            )
+            if problems:
+                message = f"{view_name} exceeded its query budget: " + "; ".join(problems)
+                if settings.QUERY_BUDGET_RAISE:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(
+                    message,
+                    extra={
+                        "code": WARNING_QUERY_BUDGET_EXCEEDED,
+                        "view": view_name,
+                        "queries": query_counter.count,
+                        "db_time": query_counter.duration,
+                    },
+                )
+
+        # Streamed responses make queries while their content is sent, so
+        # they are counted and checked once all of it has been sent.
+        if response.streaming:
+            response.streaming_content = call_when_exhausted(
+                query_counter.capture_iterator(response.streaming_content), check_budget
+            )
         else:
-            view_name = "<unknown view>"
-
-        metrics.timing(
-            "response",
-            value=delta * 1000.0,
-            tags=[
-                f"status:{response.status_code}",
-                f"view:{view_name}",
-                f"method:{request.method}",
-            ],
-        )
+            check_budget()
+
         return response
 
     return middleware
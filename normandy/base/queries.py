@@ -0,0 +1,74 @@
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a request makes more queries than its budget allows."""
+
+
+class QueryCounter(object):
+    """
+    Counts the queries made on the database connections while capturing, the
+    time spent on them, and how many times each query was made.
+
+    Queries are compared by their SQL before parameters are substituted, so
+    the same query made for each item of a list, such as the queries of an
+    N+1 problem, is counted as a repeat.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.monotonic() - start
+            self.count += 1
+            self.shapes[sql] += 1
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def capture_iterator(self, iterator):
+        """
+        Yield the items of `iterator`, counting the queries made to produce
+        each of them, such as those made while streaming a response.
+        """
+        iterator = iter(iterator)
+        while True:
+            with self.capture():
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def repeated(self, max_repeats):
+        """List the queries made more than `max_repeats` times, with their counts."""
+        return [(sql, count) for sql, count in self.shapes.most_common() if count > max_repeats]
+
+    def problems(self, max_queries=None, max_repeats=None):
+        """
+        Describe how the captured queries exceed a budget. Limits that are
+        None aren't checked.
+
+        :returns: A list of messages, which is empty if the budget was kept
+        """
+        problems = []
+        if max_queries is not None and self.count > max_queries:
+            problems.append(f"{self.count} queries were made, but the budget is {max_queries}")
+        if max_repeats is not None:
+            for sql, count in self.repeated(max_repeats):
+                problems.append(f"A query was repeated {count} times: {sql}")
+        return problems
@@ -1,6 +1,6 @@
 from django.http import HttpResponse
 
-from normandy.base.decorators import api_cache_control
+from normandy.base.decorators import api_cache_control, api_etag, get_cache_key
 
 
 class TestApiCacheControl(object):
@@ -43,3 +43,72 @@ class TestApiCacheControl(object):
         assert "public" in response["Cache-Control"]
         assert "max-age=44" in response["Cache-Control"]
         assert "no-transform" in response["Cache-Control"]
+
+
+class TestGetCacheKey(object):
+    def test_query_parameters_are_normalized(self, rf):
+        key = get_cache_key("1", rf.get("/foo/bar?a=1&b=2&b=3"))
+        assert get_cache_key("1", rf.get("/foo/bar?b=2&b=3&a=1")) == key
+        assert get_cache_key("1", rf.get("/foo/bar?a=1&b=3&b=2")) != key
+
+    def test_it_depends_on_the_version_and_path(self, rf):
+        key = get_cache_key("1", rf.get("/foo/bar"))
+        assert get_cache_key("2", rf.get("/foo/bar")) != key
+        assert get_cache_key("1", rf.get("/foo/baz")) != key
+
+    def test_it_depends_on_the_host_and_scheme(self, rf, settings):
+        settings.ALLOWED_HOSTS = ["testserver", "example.com"]
+        key = get_cache_key("1", rf.get("/foo/bar"))
+        assert get_cache_key("1", rf.get("/foo/bar", HTTP_HOST="example.com")) != key
+        assert get_cache_key("1", rf.get("/foo/bar", secure=True)) != key
+
+
+class EtagView(object):
+    def __init__(self, version):
+        self.version = version
+        self.calls = 0
+
+    def get_cache_version(self, request):
+        return self.version
+
+    @api_etag
+    def get(self, request):
+        self.calls += 1
+        return HttpResponse("content")
+
+
+class TestApiEtag(object):
+    def test_it_adds_an_etag(self, rf):
+        view = EtagView("1")
+        response = view.get(rf.get("/foo/bar"))
+        assert response.status_code == 200
+        assert response["ETag"].startswith('"')
+        assert view.get(rf.get("/foo/bar"))["ETag"] == response["ETag"]
+
+    def test_etag_depends_on_version_and_url(self, rf):
+        etag = EtagView("1").get(rf.get("/foo/bar"))["ETag"]
+        assert EtagView("2").get(rf.get("/foo/bar"))["ETag"] != etag
+        assert EtagView("1").get(rf.get("/foo/bar?baz=1"))["ETag"] != etag
+
+    def test_matching_requests_are_not_rendered(self, rf):
+        view = EtagView("1")
+        etag = view.get(rf.get("/foo/bar"))["ETag"]
+
+        response = view.get(rf.get("/foo/bar", HTTP_IF_NONE_MATCH=etag))
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+        assert view.calls == 1
+
+    def test_stale_requests_are_rendered(self, rf):
+        etag = EtagView("1").get(rf.get("/foo/bar"))["ETag"]
+
+        view = EtagView("2")
+        response = view.get(rf.get("/foo/bar", HTTP_IF_NONE_MATCH=etag))
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert view.calls == 1
+
+    def test_no_version(self, rf):
+        response = EtagView(None).get(rf.get("/foo/bar", HTTP_IF_NONE_MATCH="*"))
+        assert response.status_code == 200
+        assert not response.has_header("ETag")
@@ -1,14 +1,20 @@
 from random import randint
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
 import pytest
-from markus import TIMING
+from markus import HISTOGRAM, TIMING
 from markus.testing import MetricsMock
 
 from normandy.base.middleware import (
     NormandyCommonMiddleware,
     NormandySecurityMiddleware,
     DEBUG_HTTP_TO_HTTPS_REDIRECT,
+    WARNING_QUERY_BUDGET_EXCEEDED,
 )
+from normandy.base.queries import QueryBudgetExceeded
+from normandy.recipes.tests import RecipeFactory
 
 
 @pytest.fixture
@@ -103,3 +109,68 @@ class TestResponseMetricsMiddleware(object):
                 stat="normandy.response",
                 tags=["status:200", "view:normandy.base.api.views.APIRootView", "method:GET"],
             )
+
+
+@pytest.mark.django_db
+class TestQueryBudgetMiddleware(object):
+    view_name = "normandy.recipes.api.v1.views.RecipeViewSet"
+
+    @pytest.fixture
+    def enable_query_budget(self, settings):
+        metrics_middleware = "normandy.base.middleware.response_metrics_middleware"
+        settings.MIDDLEWARE = [
+            metrics_middleware,
+            "normandy.base.middleware.query_budget_middleware",
+        ] + [m for m in settings.MIDDLEWARE if m != metrics_middleware]
+
+    def test_it_sends_query_metrics(self, client, enable_query_budget):
+        with MetricsMock() as mm:
+            res = client.get("/api/v1/recipe/")
+            assert res.status_code == 200
+            tags = ["status:200", f"view:{self.view_name}", "method:GET"]
+            # The listing is streamed, so it is counted once it has been sent
+            assert not mm.has_record(HISTOGRAM, stat="normandy.response.queries", tags=tags)
+            res.content
+            assert mm.has_record(HISTOGRAM, stat="normandy.response.queries", tags=tags)
+            assert mm.has_record(TIMING, stat="normandy.response.db_time", tags=tags)
+
+    def test_it_counts_queries_made_while_streaming(self, client, enable_query_budget, mocker):
+        # The first chunk is rendered by the view, and the others while streaming
+        mocker.patch("normandy.recipes.api.v1.views.RecipeViewSet.stream_chunk_size", 1)
+        RecipeFactory.create_batch(3)
+        with MetricsMock() as mm:
+            res = client.get("/api/v1/recipe/")
+            assert res.status_code == 200
+            queries = CaptureQueriesContext(connection)
+            with queries:
+                res.content
+            assert len(queries) > 0
+
+            records = mm.filter_records(HISTOGRAM, stat="normandy.response.queries")
+            assert len(records) == 1
+            assert records[0].value >= len(queries)
+
+    def test_it_fails_requests_over_budget(self, client, enable_query_budget, settings):
+        settings.QUERY_BUDGET_RAISE = True
+        settings.QUERY_BUDGETS = {self.view_name: 0}
+        with pytest.raises(QueryBudgetExceeded):
+            # The listing is streamed, so it is checked once it has been sent
+            client.get("/api/v1/recipe/").content
+
+        # Other views use the default budget
+        res = client.get("/api/v1/action/")
+        assert res.status_code == 200
+
+    def test_it_logs_requests_over_budget(
+        self, client, enable_query_budget, settings, mock_logger
+    ):
+        settings.QUERY_BUDGET_RAISE = False
+        settings.QUERY_BUDGETS = {self.view_name: 0}
+        res = client.get("/api/v1/recipe/")
+        assert res.status_code == 200
+        res.content
+        mock_logger.warning.assert_called_once()
+        args, kwargs = mock_logger.warning.call_args
+        assert args[0].startswith(f"{self.view_name} exceeded its query budget")
+        assert kwargs["extra"]["code"] == WARNING_QUERY_BUDGET_EXCEEDED
+        assert kwargs["extra"]["view"] == self.view_name
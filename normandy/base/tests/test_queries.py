@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+
+import pytest
+
+from normandy.base.queries import QueryCounter
+from normandy.base.tests import UserFactory
+
+
+@pytest.mark.django_db
+class TestQueryCounter(object):
+    def test_it_counts_queries(self):
+        UserFactory.create_batch(3)
+        query_counter = QueryCounter()
+
+        with query_counter.capture():
+            assert User.objects.count() == 3
+            assert len(list(User.objects.all())) == 3
+
+        assert query_counter.count == 2
+        assert query_counter.duration > 0
+
+    def test_it_only_counts_while_capturing(self):
+        query_counter = QueryCounter()
+        with query_counter.capture():
+            User.objects.count()
+        User.objects.count()
+        assert query_counter.count == 1
+
+    def test_it_finds_repeated_queries(self):
+        users = UserFactory.create_batch(3)
+        query_counter = QueryCounter()
+
+        with query_counter.capture():
+            for user in users:
+                User.objects.get(id=user.id)
+            User.objects.count()
+
+        [(sql, count)] = query_counter.repeated(2)
+        assert count == 3
+        assert query_counter.repeated(3) == []
+
+    def test_problems(self):
+        users = UserFactory.create_batch(3)
+        query_counter = QueryCounter()
+
+        with query_counter.capture():
+            for user in users:
+                User.objects.get(id=user.id)
+
+        assert query_counter.problems() == []
+        assert query_counter.problems(max_queries=3, max_repeats=3) == []
+        problems = query_counter.problems(max_queries=2, max_repeats=2)
+        assert len(problems) == 2
+        assert problems[0] == "3 queries were made, but the budget is 2"
+        assert problems[1].startswith("A query was repeated 3 times: SELECT")
@@ -0,0 +1,106 @@
+import json
+
+from django.contrib.auth.models import User
+
+import pytest
+from rest_framework import serializers
+
+from normandy.base.api.renderers import CanonicalJSONRenderer
+from normandy.base.api.responses import (
+    ERROR_STREAMING_FAILED,
+    PrerenderedResponse,
+    StreamingJSONResponse,
+    iter_canonical_json_list,
+    iter_chunks,
+)
+from normandy.base.tests import UserFactory
+
+
+class UserSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = User
+        fields = ["id", "username", "email"]
+
+
+class FailingUserSerializer(UserSerializer):
+    """Fails to render the user whose id is in the context as `failing_id`."""
+
+    def to_representation(self, user):
+        if user.id == self.context["failing_id"]:
+            raise ValueError("Can't render this user")
+        return super().to_representation(user)
+
+
+class TestPrerenderedResponse(object):
+    def test_it_works(self):
+        response = PrerenderedResponse(b'{"a":1}', "application/json")
+        assert response.rendered_content == b'{"a":1}'
+        assert response["Content-Type"] == "application/json"
+        assert response.data == {"a": 1}
+
+
+class TestIterChunks(object):
+    def test_lists(self):
+        assert list(iter_chunks([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+        assert list(iter_chunks([], 2)) == []
+
+    @pytest.mark.django_db
+    def test_querysets_keep_their_order(self):
+        users = UserFactory.create_batch(5)
+        chunks = list(iter_chunks(User.objects.order_by("-id"), 2))
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [user for chunk in chunks for user in chunk] == sorted(
+            users, key=lambda user: -user.id
+        )
+
+
+@pytest.mark.django_db
+class TestIterCanonicalJSONList(object):
+    @pytest.mark.parametrize("count", [0, 1, 5])
+    def test_it_matches_rendering_at_once(self, count):
+        UserFactory.create_batch(count)
+        serializer = UserSerializer(User.objects.order_by("id"), many=True)
+
+        streamed = b"".join(iter_canonical_json_list(serializer, 2))
+        assert streamed == CanonicalJSONRenderer().render(serializer.data)
+
+    def test_response(self):
+        user = UserFactory()
+        response = StreamingJSONResponse(UserSerializer(User.objects.all(), many=True), 2)
+        assert response.streaming
+        assert response["Content-Type"] == "application/json"
+        assert json.loads(b"".join(response.streaming_content)) == [
+            {"id": user.id, "username": user.username, "email": user.email}
+        ]
+
+    def test_errors_in_the_first_chunk_are_raised(self):
+        user = UserFactory()
+        serializer = FailingUserSerializer(
+            User.objects.all(), many=True, context={"failing_id": user.id}
+        )
+
+        with pytest.raises(ValueError):
+            StreamingJSONResponse(serializer, 2)
+
+    def test_errors_while_streaming_are_logged(self, mocker):
+        mock_logger = mocker.patch("normandy.base.api.responses.logger")
+        users = UserFactory.create_batch(2)
+        serializer = FailingUserSerializer(
+            User.objects.order_by("id"), many=True, context={"failing_id": users[1].id}
+        )
+
+        response = StreamingJSONResponse(serializer, 1)
+        sent = []
+        with pytest.raises(ValueError):
+            for chunk in response.streaming_content:
+                sent.append(chunk)
+
+        assert json.loads(sent[1]) == {
+            "id": users[0].id,
+            "username": users[0].username,
+            "email": users[0].email,
+        }
+        assert len(sent) == 2
+        mock_logger.exception.assert_called_once_with(
+            "Error while streaming a response", extra={"code": ERROR_STREAMING_FAILED}
+        )
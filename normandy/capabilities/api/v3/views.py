@@ -4,12 +4,18 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from normandy.capabilities.api.v3.serializers import CapabilitiesInfoSerializer
-from normandy.base.decorators import api_cache_control
-from normandy.recipes.models import Recipe
+from normandy.base.decorators import api_cache_control, api_etag, api_response_cache
+from normandy.recipes.bundles import get_collection_version
+from normandy.recipes.models import CollectionGeneration, Recipe
 
 
 class CapabilitiesView(APIView):
+    def get_cache_version(self, request):
+        return get_collection_version(CollectionGeneration.RECIPES)
+
     @api_cache_control()
+    @api_etag
+    @api_response_cache
     def get(self, request):
         capabilities = {}
 
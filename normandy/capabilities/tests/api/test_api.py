@@ -26,3 +26,16 @@ class TestServiceInfoView(object):
             assert res.data["capabilities"][cap]["is_baseline"] == (
                 cap in settings.BASELINE_CAPABILITIES
             )
+
+    def test_answers_conditional_requests(self, api_client):
+        res = api_client.get("/api/v3/capabilities/")
+        assert res.status_code == 200
+        etag = res["ETag"]
+
+        res = api_client.get("/api/v3/capabilities/", HTTP_IF_NONE_MATCH=etag)
+        assert res.status_code == 304
+
+        RecipeFactory(extra_capabilities=["test-capability"])
+        res = api_client.get("/api/v3/capabilities/", HTTP_IF_NONE_MATCH=etag)
+        assert res.status_code == 200
+        assert "test-capability" in res.data["capabilities"]
@@ -1,3 +1,6 @@
+from contextlib import contextmanager
+
+from django.conf import settings
 from django.core.management import call_command
 from django.db import connection
 from django.db.migrations.executor import MigrationExecutor
@@ -8,8 +11,9 @@ from graphene.test import Client as GrapheneClient
 from rest_framework.test import APIClient
 
 from normandy.schema import schema as normandy_schema
+from normandy.base.queries import QueryCounter
 from normandy.base.tests import UserFactory
-from normandy.recipes import geolocation as geolocation_module
+from normandy.recipes import geolocation as geolocation_module, signing
 from normandy.recipes.tests import fake_sign
 
 
@@ -22,6 +26,34 @@ def api_client():
     return client
 
 
+@pytest.fixture
+def query_budget():
+    """
+    Fixture to fail a test if a block of code makes more queries than its
+    budget, or repeats a query more than ``settings.QUERY_BUDGET_MAX_REPEATS``
+    times.
+
+    Usage::
+
+        def test_something(client, query_budget):
+            with query_budget(max_queries=10):
+                client.get("/api/v1/recipe/")
+    """
+
+    @contextmanager
+    def check_budget(max_queries=None, max_repeats=None):
+        if max_repeats is None:
+            max_repeats = settings.QUERY_BUDGET_MAX_REPEATS
+        query_counter = QueryCounter()
+        with query_counter.capture():
+            yield query_counter
+        problems = query_counter.problems(max_queries=max_queries, max_repeats=max_repeats)
+        if problems:
+            pytest.fail("Query budget exceeded: " + "; ".join(problems))
+
+    return check_budget
+
+
 @pytest.fixture
 def gql_client():
     """Fixture to provide a Graphene client."""
@@ -29,6 +61,17 @@ def gql_client():
     return client
 
 
+@pytest.fixture(autouse=True)
+def clear_validated_chains():
+    """
+    Forget the certificate chains validated by other tests, so that whether
+    a chain is validated doesn't depend on the order tests run in.
+    """
+    signing.validated_chains.clear()
+    yield
+    signing.validated_chains.clear()
+
+
 @pytest.fixture
 def geolocation():
     """Fixture to load geolocation data."""
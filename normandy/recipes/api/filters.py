@@ -1,3 +1,6 @@
+from django.conf import settings
+from django.db.models import Q
+
 import django_filters
 
 from normandy.recipes.models import Recipe
@@ -31,17 +34,24 @@ class BaselineCapabilitiesFilter(django_filters.Filter):
             baseline_only = lc_value in ["true", "1"]
 
         if baseline_only:
-            recipes = list(qs)
-            if not all(isinstance(recipe, Recipe) for recipe in recipes):
+            if qs.model is not Recipe:
                 raise TypeError("BaselineCapabilitiesFilter can only be used to filter recipes")
-            match_ids = []
-            for recipe in recipes:
-                if (
-                    recipe.approved_revision
-                    and recipe.approved_revision.uses_only_baseline_capabilities()
-                ):
-                    match_ids.append(recipe.id)
-            return Recipe.objects.filter(id__in=match_ids)
+
+            # Revisions that haven't had their capabilities stored yet are
+            # checked in Python, so results are correct before the backfill.
+            unstored_ids = [
+                recipe.id
+                for recipe in qs.filter(
+                    approved_revision__isnull=False,
+                    approved_revision__stored_capabilities__isnull=True,
+                ).select_related("approved_revision__action")
+                if recipe.approved_revision.uses_only_baseline_capabilities()
+            ]
+            baseline = list(settings.BASELINE_CAPABILITIES)
+            return qs.filter(
+                Q(approved_revision__stored_capabilities__contained_by=baseline)
+                | Q(id__in=unstored_ids)
+            )
 
         return qs
 
@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.db import transaction
 from django.db.models import Q
+from django.utils.cache import add_never_cache_headers, patch_cache_control
 from django.views.decorators.cache import never_cache
 
 import django_filters
@@ -9,11 +10,30 @@ from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound, ParseError
 from rest_framework.response import Response
 
-from normandy.base.api.mixins import CachingViewsetMixin
+from normandy.base.api.mixins import CachingViewsetMixin, StreamingListMixin
 from normandy.base.api.permissions import AdminEnabledOrReadOnly
-from normandy.base.api.renderers import JavaScriptRenderer
-from normandy.base.decorators import api_cache_control
-from normandy.recipes.models import Action, ApprovalRequest, Client, Recipe, RecipeRevision
+from normandy.base.api.renderers import CanonicalJSONRenderer, JavaScriptRenderer
+from normandy.base.decorators import (
+    api_cache_control,
+    api_etag,
+    api_response_cache,
+    get_api_cache_directives,
+)
+from normandy.recipes.bundles import (
+    BundleResponse,
+    get_collection_version,
+    get_signed_recipe_bundle,
+)
+from normandy.recipes.models import (
+    Action,
+    ApprovalRequest,
+    Client,
+    CollectionGeneration,
+    Recipe,
+    RecipeRevision,
+    TargetingKey,
+)
+from normandy.recipes.utils import major_version
 from normandy.recipes.api.filters import (
     BaselineCapabilitiesFilter,
     CharSplitFilter,
@@ -40,8 +60,13 @@ class ActionViewSet(CachingViewsetMixin, viewsets.ReadOnlyModelViewSet):
     lookup_field = "name"
     lookup_value_regex = r"[_\-\w]+"
 
+    def get_cache_version(self, request):
+        return get_collection_version(CollectionGeneration.ACTIONS)
+
     @action(detail=False, methods=["GET"])
     @api_cache_control()
+    @api_etag
+    @api_response_cache
     def signed(self, request, pk=None):
         actions = self.filter_queryset(self.get_queryset()).exclude(signature=None)
         serializer = SignedActionSerializer(actions, many=True)
@@ -87,19 +112,21 @@ class SignedRecipeFilters(RecipeFilters):
     only_baseline_capabilities = BaselineCapabilitiesFilter(default_only_baseline=True)
 
 
-class RecipeViewSet(CachingViewsetMixin, viewsets.ReadOnlyModelViewSet):
+class RecipeViewSet(CachingViewsetMixin, StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     """Viewset for viewing and uploading recipes."""
 
     queryset = (
         Recipe.objects.all()
         # Foreign keys
+        .select_related("signature")
+        .select_related("approved_revision")
+        .select_related("approved_revision__action")
+        .select_related("approved_revision__enabled_state")
         .select_related("latest_revision")
         .select_related("latest_revision__action")
         .select_related("latest_revision__approval_request")
-        # Many-to-many
-        .prefetch_related("latest_revision__channels")
-        .prefetch_related("latest_revision__countries")
-        .prefetch_related("latest_revision__locales")
+        .select_related("latest_revision__approval_request__approver")
+        .select_related("latest_revision__approval_request__creator")
     )
     serializer_class = RecipeSerializer
     filterset_class = RecipeFilters
@@ -125,6 +152,9 @@ class RecipeViewSet(CachingViewsetMixin, viewsets.ReadOnlyModelViewSet):
 
         return queryset
 
+    def get_cache_version(self, request):
+        return get_collection_version(CollectionGeneration.RECIPES)
+
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
@@ -135,22 +165,68 @@ class RecipeViewSet(CachingViewsetMixin, viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=["GET"], filterset_class=SignedRecipeFilters)
     @api_cache_control()
+    @api_etag
+    @api_response_cache
     def signed(self, request, pk=None):
+        # The unfiltered listing is requested by every client, so serve it from
+        # the pre-rendered bundle. Anything else is rendered on demand.
+        if not request.query_params and isinstance(
+            request.accepted_renderer, CanonicalJSONRenderer
+        ):
+            return BundleResponse(get_signed_recipe_bundle())
+
         recipes = self.filter_queryset(self.get_queryset()).exclude(signature=None)
-        serializer = SignedRecipeSerializer(recipes, many=True)
-        return Response(serializer.data)
+        return self.get_list_response(SignedRecipeSerializer(recipes, many=True))
+
+    @action(
+        detail=False,
+        methods=["GET"],
+        url_path="signed/targeted",
+        filterset_class=SignedRecipeFilters,
+    )
+    def signed_targeted(self, request, pk=None):
+        """
+        List the signed recipes that could match a client with the channel,
+        locale, version, platform and country given in the query parameters.
+
+        Only those attributes are checked. Clients must still evaluate the
+        filter expressions of the listed recipes.
+        """
+        client_values = {
+            attribute: request.query_params.get(attribute) for attribute in TargetingKey.ATTRIBUTES
+        }
+        if client_values[TargetingKey.VERSION]:
+            version = major_version(client_values[TargetingKey.VERSION])
+            client_values[TargetingKey.VERSION] = None if version is None else str(version)
+
+        # Without a country parameter the response depends on the location of
+        # the client, so it can't be shared by caches.
+        geolocated = TargetingKey.COUNTRY not in request.query_params
+        if geolocated:
+            client_values[TargetingKey.COUNTRY] = Client(request).country
+
+        recipes = self.filter_queryset(self.get_queryset()).exclude(signature=None)
+        recipes = TargetingKey.filter_recipes(recipes, client_values)
+        response = self.get_list_response(SignedRecipeSerializer(recipes, many=True))
+        if geolocated:
+            add_never_cache_headers(response)
+        else:
+            patch_cache_control(response, **get_api_cache_directives())
+        return response
 
     @action(detail=True, methods=["GET"])
     @api_cache_control()
+    @api_etag
+    @api_response_cache
     def history(self, request, pk=None):
         recipe = self.get_object()
         serializer = RecipeRevisionSerializer(
             recipe.revisions.all(), many=True, context={"request": request}
         )
-        return Response(serializer.data)
+        return self.get_list_response(serializer)
 
 
-class RecipeRevisionViewSet(viewsets.ReadOnlyModelViewSet):
+class RecipeRevisionViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = (
         RecipeRevision.objects.all()
         .select_related("action")
@@ -166,7 +242,7 @@ class RecipeRevisionViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class ApprovalRequestViewSet(viewsets.ReadOnlyModelViewSet):
+class ApprovalRequestViewSet(StreamingListMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ApprovalRequest.objects.all()
     serializer_class = ApprovalRequestSerializer
     permission_classes = [AdminEnabledOrReadOnly, permissions.DjangoModelPermissionsOrAnonReadOnly]
@@ -1,19 +1,19 @@
-from pyjexl import JEXL
 from rest_framework import serializers
 from factory.fuzzy import FuzzyText
 
 from normandy.base.api.v3.serializers import UserSerializer
-from normandy.recipes import filters
+from normandy.recipes import filters, jexl
 from normandy.recipes.api.fields import ActionImplementationHyperlinkField, FilterObjectField
 from normandy.recipes.models import (
     Action,
     ApprovalRequest,
+    BucketAllocation,
     EnabledState,
     Recipe,
     RecipeRevision,
     Signature,
 )
-from normandy.recipes.validators import JSONSchemaValidator
+from normandy.recipes.validators import get_schema_validator
 
 
 class CustomizableSerializerMixin:
@@ -47,6 +47,12 @@ class ApprovalRequestSerializer(serializers.ModelSerializer):
         fields = ["approved", "approver", "comment", "created", "creator", "id"]
 
 
+class BucketAllocationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BucketAllocation
+        fields = ["id", "recipe_id", "revision_id", "namespace", "start", "count"]
+
+
 class EnabledStateSerializer(CustomizableSerializerMixin, serializers.ModelSerializer):
     creator = UserSerializer()
 
@@ -190,19 +196,7 @@ class RecipeSerializer(CustomizableSerializerMixin, serializers.ModelSerializer)
 
     def validate_extra_filter_expression(self, value):
         if value:
-            jexl = JEXL()
-
-            # Add mock transforms for validation. See
-            # https://mozilla.github.io/normandy/user/filters.html#transforms
-            # for a list of what transforms we expect to be available.
-            jexl.add_transform("date", lambda x: x)
-            jexl.add_transform("stableSample", lambda x: x)
-            jexl.add_transform("bucketSample", lambda x: x)
-            jexl.add_transform("preferenceValue", lambda x: x)
-            jexl.add_transform("preferenceIsUserSet", lambda x: x)
-            jexl.add_transform("preferenceExists", lambda x: x)
-
-            errors = list(jexl.validate(value))
+            errors = jexl.validate(value)
             if errors:
                 raise serializers.ValidationError(errors)
 
@@ -223,7 +217,7 @@ class RecipeSerializer(CustomizableSerializerMixin, serializers.ModelSerializer)
             # Get the schema associated with the selected action
             schema = action.arguments_schema
 
-            schemaValidator = JSONSchemaValidator(schema)
+            schemaValidator = get_schema_validator(schema)
             errorResponse = {}
             errors = sorted(schemaValidator.iter_errors(arguments), key=lambda e: e.path)
 
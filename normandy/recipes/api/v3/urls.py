@@ -12,7 +12,14 @@ router.register("action", views.ActionViewSet)
 router.register("recipe", views.RecipeViewSet)
 router.register("recipe_revision", views.RecipeRevisionViewSet)
 router.register("approval_request", views.ApprovalRequestViewSet)
+router.register("bucket_allocation", views.BucketAllocationViewSet)
 router.register_view("filters", views.Filters, name="filters")
+router.register_view(
+    "targeting_simulation",
+    views.TargetingSimulation,
+    name="targeting-simulation",
+    allow_cdn=False,
+)
 
 urlpatterns = [
     url(r"", include(router.urls)),
@@ -2,6 +2,7 @@ import re
 
 from django.conf import settings
 from django.db import transaction
+from django.contrib.postgres.search import TrigramSimilarity
 from django.db.models import Q
 from django.http import HttpResponse
 
@@ -13,14 +14,19 @@ from rest_framework.response import Response
 
 from normandy.base.api import UpdateOrCreateModelViewSet
 from normandy.base.api.filters import AliasedOrderingFilter
-from normandy.base.api.mixins import CachingViewsetMixin
+from normandy.base.api.mixins import CachingViewsetMixin, CursorPaginationMixin
+from normandy.base.api.pagination import KeysetPagination
 from normandy.base.api.permissions import AdminEnabledOrReadOnly
-from normandy.base.decorators import api_cache_control
+from normandy.base.decorators import api_cache_control, api_etag, api_response_cache
+from normandy.recipes.bundles import get_collection_version
+from normandy.recipes.evaluation import simulate_enabled_recipes
 from normandy.recipes.models import (
     Action,
     ApprovalRequest,
+    BucketAllocation,
     EnabledState,
     Channel,
+    CollectionGeneration,
     Country,
     Locale,
     Recipe,
@@ -35,6 +41,7 @@ from normandy.recipes.api.v3 import shield_identicon
 from normandy.recipes.api.v3.serializers import (
     ActionSerializer,
     ApprovalRequestSerializer,
+    BucketAllocationSerializer,
     RecipeRevisionSerializer,
     RecipeSerializer,
 )
@@ -46,6 +53,9 @@ class ActionViewSet(CachingViewsetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Action.objects.all()
     serializer_class = ActionSerializer
 
+    def get_cache_version(self, request):
+        return get_collection_version(CollectionGeneration.ACTIONS)
+
 
 class RecipeFilters(django_filters.FilterSet):
     enabled = EnabledStateFilter()
@@ -63,13 +73,21 @@ class RecipeFilters(django_filters.FilterSet):
 
 class RecipeOrderingFilter(AliasedOrderingFilter):
     aliases = {
-        "last_updated": ("latest_revision__updated", "Last Updated"),
+        "last_updated": ("last_updated", "Last Updated"),
         "name": ("latest_revision__name", "Name"),
         "action": ("latest_revision__action__name", "Action"),
     }
 
 
-class RecipeViewSet(CachingViewsetMixin, UpdateOrCreateModelViewSet):
+class RecipeCursorPagination(KeysetPagination):
+    ordering = ("-last_updated", "-id")
+
+
+class CreatedCursorPagination(KeysetPagination):
+    ordering = ("-created", "-id")
+
+
+class RecipeViewSet(CachingViewsetMixin, CursorPaginationMixin, UpdateOrCreateModelViewSet):
     """Viewset for viewing and uploading recipes."""
 
     queryset = (
@@ -80,11 +98,16 @@ class RecipeViewSet(CachingViewsetMixin, UpdateOrCreateModelViewSet):
             "approved_revision__approval_request",
             "approved_revision__approval_request__creator",
             "approved_revision__approval_request__approver",
+            "approved_revision__enabled_state",
+            "approved_revision__recipe",
             "latest_revision__action",
             "latest_revision__user",
             "latest_revision__approval_request",
             "latest_revision__approval_request__creator",
             "latest_revision__approval_request__approver",
+            "latest_revision__enabled_state",
+            "latest_revision__recipe",
+            "signature",
         )
         .prefetch_related(
             "approved_revision__channels",
@@ -103,6 +126,7 @@ class RecipeViewSet(CachingViewsetMixin, UpdateOrCreateModelViewSet):
     filterset_class = RecipeFilters
     filter_backends = [django_filters.rest_framework.DjangoFilterBackend, RecipeOrderingFilter]
     permission_classes = [permissions.DjangoModelPermissionsOrAnonReadOnly, AdminEnabledOrReadOnly]
+    cursor_pagination_class = RecipeCursorPagination
 
     def get_queryset(self):
         queryset = self.queryset
@@ -116,19 +140,26 @@ class RecipeViewSet(CachingViewsetMixin, UpdateOrCreateModelViewSet):
             text = self.request.GET.get("text")
             if "\x00" in text:
                 raise ParseError("Null bytes in text")
-            tokens = set(re.split(r"[ /_-]", text))
+            # The search text is stored in lower case, so that `contains`
+            # can use its trigram index, which `icontains` can't.
+            tokens = set(re.split(r"[ /_-]", text.lower()))
             query = Q()
             for token in tokens:
-                query &= (
-                    Q(latest_revision__name__icontains=token)
-                    | Q(latest_revision__extra_filter_expression__icontains=token)
-                    | Q(latest_revision__arguments_json__icontains=token)
-                )
-
-            queryset = queryset.filter(query)
+                query &= Q(latest_revision__stored_search_text__contains=token)
+
+            # Rank recipes by how closely their name matches. An ordering
+            # requested by the client takes precedence.
+            queryset = (
+                queryset.filter(query)
+                .annotate(search_rank=TrigramSimilarity("latest_revision__name", text))
+                .order_by("-search_rank", "-last_updated")
+            )
 
         return queryset
 
+    def get_cache_version(self, request):
+        return get_collection_version(CollectionGeneration.RECIPES)
+
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
@@ -139,6 +170,8 @@ class RecipeViewSet(CachingViewsetMixin, UpdateOrCreateModelViewSet):
 
     @action(detail=True, methods=["GET"])
     @api_cache_control()
+    @api_etag
+    @api_response_cache
     def history(self, request, pk=None):
         recipe = self.get_object()
         serializer = RecipeRevisionSerializer(
@@ -177,14 +210,25 @@ class RecipeViewSet(CachingViewsetMixin, UpdateOrCreateModelViewSet):
         return Response(RecipeSerializer(recipe).data)
 
 
-class RecipeRevisionViewSet(viewsets.ReadOnlyModelViewSet):
+class RecipeRevisionViewSet(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
     queryset = (
         RecipeRevision.objects.all()
-        .select_related("action", "approval_request", "recipe")
-        .prefetch_related("enabled_states", "channels", "countries", "locales")
+        .select_related(
+            "action",
+            "approval_request",
+            "approval_request__approver",
+            "approval_request__creator",
+            "enabled_state",
+            "recipe",
+            "user",
+        )
+        .prefetch_related(
+            "enabled_states", "enabled_states__creator", "channels", "countries", "locales"
+        )
     )
     serializer_class = RecipeRevisionSerializer
     permission_classes = [AdminEnabledOrReadOnly, permissions.DjangoModelPermissionsOrAnonReadOnly]
+    cursor_pagination_class = CreatedCursorPagination
 
     @action(detail=True, methods=["POST"])
     def request_approval(self, request, pk=None):
@@ -203,10 +247,11 @@ class RecipeRevisionViewSet(viewsets.ReadOnlyModelViewSet):
         )
 
 
-class ApprovalRequestViewSet(viewsets.ReadOnlyModelViewSet):
+class ApprovalRequestViewSet(CursorPaginationMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ApprovalRequest.objects.all()
     serializer_class = ApprovalRequestSerializer
     permission_classes = [AdminEnabledOrReadOnly, permissions.DjangoModelPermissionsOrAnonReadOnly]
+    cursor_pagination_class = CreatedCursorPagination
 
     @action(detail=True, methods=["POST"])
     def approve(self, request, pk=None):
@@ -263,6 +308,44 @@ class ApprovalRequestViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class BucketAllocationViewSet(CachingViewsetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Viewset for viewing the ranges of buckets used by the namespace sample
+    filters of enabled recipes.
+    """
+
+    queryset = BucketAllocation.objects.all()
+    serializer_class = BucketAllocationSerializer
+    filterset_fields = ["namespace", "recipe"]
+
+    @action(detail=False, methods=["GET"])
+    @api_cache_control()
+    def free(self, request):
+        namespace = request.query_params.get("namespace")
+        if not namespace:
+            return Response(
+                {"namespace": "This field is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            count = float(request.query_params.get("count", ""))
+        except ValueError:
+            count = None
+        if count is None or not count > 0:
+            return Response(
+                {"count": "A positive number is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        start = BucketAllocation.first_free_range(namespace, count)
+        if start is None:
+            return Response(
+                {"error": f"There is no free range of {count:g} buckets in {namespace!r}."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response({"namespace": namespace, "start": start, "count": count})
+
+
 class Filters(views.APIView):
     authentication_classes = []
     permission_classes = []
@@ -281,6 +364,30 @@ class Filters(views.APIView):
         )
 
 
+class TargetingSimulation(views.APIView):
+    """
+    Estimate the share of clients targeted by each enabled recipe, by
+    evaluating their filters against simulated clients.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, format=None):
+        try:
+            client_count = int(request.query_params.get("clients", 10000))
+            seed = request.query_params.get("seed")
+            seed = int(seed) if seed is not None else None
+        except ValueError:
+            raise ParseError("clients and seed must be integers")
+
+        max_clients = settings.TARGETING_SIMULATION_MAX_CLIENTS
+        if not 0 < client_count <= max_clients:
+            raise ParseError(f"clients must be between 1 and {max_clients}")
+
+        total, results = simulate_enabled_recipes(client_count, seed=seed)
+        return Response({"clients": total, "results": results})
+
+
 class IdenticonView(views.APIView):
     @api_cache_control(max_age=settings.IMMUTABLE_CACHE_TIME, immutable=True)
     def get(self, request, *, generation, seed):
@@ -14,3 +14,6 @@ class RecipesApp(AppConfig):
         checks.register()
         RemoteSettings().check_config()
         load_geoip_database()
+
+        # Import for side-effect: registers signal handlers
+        import normandy.recipes.signals  # NOQA
@@ -0,0 +1,89 @@
+import hashlib
+import json
+
+from django.conf import settings
+
+from normandy.base.api.renderers import CanonicalJSONRenderer
+from normandy.base.api.responses import PrerenderedResponse
+from normandy.recipes.api.filters import BaselineCapabilitiesFilter
+from normandy.recipes.api.v1.serializers import SignedRecipeSerializer
+from normandy.recipes.models import CollectionGeneration, Recipe, SignedRecipeBundle
+
+
+def get_settings_key():
+    """
+    A digest of the settings that affect the rendered signed recipe listing.
+    A bundle built with different settings must not be served.
+    """
+    data = {
+        "baseline_capabilities": sorted(settings.BASELINE_CAPABILITIES),
+        "x5u_cache_bust": settings.AUTOGRAPH_X5U_CACHE_BUST,
+    }
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def get_collection_version(name):
+    """
+    A version of a collection served by the API, to derive ETags from. It
+    changes whenever the collection, or the settings it is rendered with, do.
+    """
+    return f"{name}:{CollectionGeneration.get(name)}:{get_settings_key()}"
+
+
+def render_signed_recipes():
+    """
+    Render the signed recipe listing exactly as `/api/v1/recipe/signed/`
+    would with no query parameters.
+    """
+    recipes = (
+        Recipe.objects.exclude(signature=None)
+        .select_related("signature")
+        .select_related("approved_revision")
+        .select_related("approved_revision__action")
+    )
+    recipes = BaselineCapabilitiesFilter(default_only_baseline=True).filter(recipes, None)
+    serializer = SignedRecipeSerializer(recipes, many=True)
+    return CanonicalJSONRenderer().render(serializer.data)
+
+
+def build_signed_recipe_bundle():
+    """
+    Render the signed recipe listing and store it as the bundle.
+
+    If a recipe changes while the bundle is being rendered, the result is
+    returned but not stored, so that a stale bundle is never marked current.
+    """
+    bundle, _ = SignedRecipeBundle.objects.get_or_create(id=SignedRecipeBundle.SINGLETON_ID)
+    generation = bundle.generation
+
+    bundle.content = render_signed_recipes()
+    bundle.etag = hashlib.sha256(bundle.content).hexdigest()
+    bundle.settings_key = get_settings_key()
+    bundle.built_generation = generation
+
+    SignedRecipeBundle.objects.filter(id=bundle.id, generation=generation).update(
+        built_generation=generation,
+        content=bundle.content,
+        etag=bundle.etag,
+        settings_key=bundle.settings_key,
+    )
+    return bundle
+
+
+def get_signed_recipe_bundle():
+    """Get the current bundle, rebuilding it if it is stale."""
+    try:
+        bundle = SignedRecipeBundle.objects.get(id=SignedRecipeBundle.SINGLETON_ID)
+    except SignedRecipeBundle.DoesNotExist:
+        return build_signed_recipe_bundle()
+
+    if bundle.is_current(get_settings_key()):
+        return bundle
+    return build_signed_recipe_bundle()
+
+
+class BundleResponse(PrerenderedResponse):
+    """A response that serves the already rendered content of a bundle."""
+
+    def __init__(self, bundle, **kwargs):
+        super().__init__(bytes(bundle.content), CanonicalJSONRenderer.media_type, **kwargs)
@@ -43,6 +43,26 @@ def actions_have_consistent_hashes(app_configs, **kwargs):
     return errors
 
 
+def verify_signatures(objects, kind):
+    """
+    Verify the signatures of a list of signed recipes or actions.
+
+    Returns pairs of each object along with None if its signature is valid,
+    or the problem that was found with it.
+    """
+    verifier = signing.SignatureVerifier()
+    with verifier.timed("serialize"):
+        items = []
+        for obj in objects:
+            signature = obj.signature
+            items.append(
+                (obj.canonical_json(), signature.signature, signature.x5u, signature.public_key)
+            )
+    results = verifier.verify(items)
+    verifier.report(kind, len(objects))
+    return zip(objects, results)
+
+
 def recipe_signatures_are_correct(app_configs, **kwargs):
     errors = []
     try:
@@ -54,25 +74,20 @@ def recipe_signatures_are_correct(app_configs, **kwargs):
         return errors
 
     try:
-        for recipe in signed_recipes:
-            data = recipe.canonical_json()
-            signature = recipe.signature.signature
-            pubkey = recipe.signature.public_key
+        for recipe, problem in verify_signatures(signed_recipes, "recipe"):
             x5u = recipe.signature.x5u
-            try:
-                if x5u:
-                    signing.verify_signature_x5u(data, signature, x5u)
-                else:
-                    signing.verify_signature_pubkey(data, signature, pubkey)
-            except signing.BadSignature as e:
+            if isinstance(problem, signing.BadSignature):
                 msg = "Recipe '{recipe}' (id={recipe.id}) has a bad signature: {detail}".format(
-                    recipe=recipe, detail=e.detail
+                    recipe=recipe, detail=problem.detail
                 )
                 errors.append(Error(msg, id=ERROR_INVALID_RECIPE_SIGNATURE))
-            except requests.RequestException as exc:
+            elif isinstance(problem, signing.BadCertificate):
+                msg = f"Recipe '{recipe}' (id={recipe.id}) has a bad certificate: {problem.detail}"
+                errors.append(Error(msg, id=ERROR_BAD_SIGNING_CERTIFICATE))
+            elif isinstance(problem, requests.RequestException):
                 msg = (
                     f"The signature for recipe with ID {recipe.id} could not be be verified due to "
-                    f"network error when requesting the url {x5u!r}. {exc}"
+                    f"network error when requesting the url {x5u!r}. {problem}"
                 )
                 errors.append(Error(msg, id=ERROR_COULD_NOT_VERIFY_CERTIFICATE))
     except (ProgrammingError, OperationalError, ImproperlyConfigured) as e:
@@ -95,23 +110,18 @@ def action_signatures_are_correct(app_configs, **kwargs):
         return errors
 
     try:
-        for action in signed_actions:
-            data = action.canonical_json()
-            signature = action.signature.signature
-            pubkey = action.signature.public_key
+        for action, problem in verify_signatures(signed_actions, "action"):
             x5u = action.signature.x5u
-            try:
-                if x5u:
-                    signing.verify_signature_x5u(data, signature, x5u)
-                else:
-                    signing.verify_signature_pubkey(data, signature, pubkey)
-            except signing.BadSignature as e:
-                msg = f"Action '{action}' (id={action.id}) has a bad signature: {e.detail}"
+            if isinstance(problem, signing.BadSignature):
+                msg = f"Action '{action}' (id={action.id}) has a bad signature: {problem.detail}"
                 errors.append(Error(msg, id=ERROR_INVALID_ACTION_SIGNATURE))
-            except requests.RequestException as exc:
+            elif isinstance(problem, signing.BadCertificate):
+                msg = f"Action '{action}' (id={action.id}) has a bad certificate: {problem.detail}"
+                errors.append(Error(msg, id=ERROR_BAD_SIGNING_CERTIFICATE))
+            elif isinstance(problem, requests.RequestException):
                 msg = (
                     f"The signature for action with ID {action.id} could not be be verified due to "
-                    f"network error when requesting the url {x5u!r}. {exc}"
+                    f"network error when requesting the url {x5u!r}. {problem}"
                 )
                 errors.append(Error(msg, id=ERROR_COULD_NOT_VERIFY_CERTIFICATE))
     except (ProgrammingError, OperationalError, ImproperlyConfigured) as e:
@@ -0,0 +1,586 @@
+"""
+Server-side evaluation of recipe filter expressions.
+
+Clients evaluate the JEXL filter expression of each recipe to decide if they
+should execute it. To estimate how many clients a recipe will reach, the same
+expressions can be evaluated here against simulated client contexts.
+
+Expressions are compiled into Python closures once, and each closure
+evaluates a whole batch of client contexts at a time, returning a column with
+one value per client. The right side of ``&&`` and ``||`` and the branches of
+conditional expressions are only evaluated for the clients that need them.
+
+A client context is a dict shaped like the context available to filter
+expressions in the client, for example::
+
+    {
+        "normandy": {"userId": "...", "channel": "release", "locale": "en-US", ...},
+        "env": {"version": "80.0"},
+        "preferences": {"browser.search.region": "US"},
+        "userSetPreferences": ["browser.search.region"],
+    }
+"""
+
+import functools
+import json
+import random
+import uuid
+from datetime import datetime, time
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from pyjexl import JEXL
+from pyjexl.exceptions import ParseError
+
+from normandy.recipes.models import Channel, Country, Locale, Recipe
+from normandy.recipes.utils import bucket_sample_many, deterministic_sample_many
+
+
+COMPILE_CACHE_SIZE = 1024
+SIMULATED_VERSIONS = [f"{version}.0" for version in range(70, 81)]
+SIMULATED_PLATFORMS = ["isWindows", "isMac", "isLinux"]
+
+
+def _intersect(left, right):
+    if not isinstance(left, list) or not isinstance(right, list):
+        return []
+    return [item for item in left if item in right]
+
+
+@functools.lru_cache(maxsize=1)
+def get_parser():
+    # Transforms are only needed to evaluate expressions, not to parse them.
+    jexl = JEXL()
+    jexl.add_binary_operator("intersect", 20, _intersect)
+    return jexl
+
+
+def _get(subject, name):
+    return subject.get(name) if isinstance(subject, dict) else None
+
+
+def _merge(column, indices, values):
+    merged = list(column)
+    for index, value in zip(indices, values):
+        merged[index] = value
+    return merged
+
+
+def _subset(contexts, relatives, indices):
+    return (
+        [contexts[i] for i in indices],
+        None if relatives is None else [relatives[i] for i in indices],
+    )
+
+
+def _safe(operation, default):
+    def safe_operation(left, right):
+        try:
+            return operation(left, right)
+        except (TypeError, ZeroDivisionError):
+            return default
+
+    return safe_operation
+
+
+def _in(left, right):
+    return right is not None and left in right
+
+
+# Clients evaluate expressions in JavaScript, where comparing mismatched types
+# is false instead of an error. Each operator is tried on the whole column
+# first, and only falls back to checking values one at a time if that fails.
+BINARY_OPERATORS = {
+    "+": (lambda a, b: a + b, None),
+    "-": (lambda a, b: a - b, None),
+    "*": (lambda a, b: a * b, None),
+    "//": (lambda a, b: a // b, None),
+    "/": (lambda a, b: a / b, None),
+    "%": (lambda a, b: a % b, None),
+    "^": (lambda a, b: a ** b, None),
+    "==": (lambda a, b: a == b, False),
+    "!=": (lambda a, b: a != b, True),
+    ">=": (lambda a, b: a >= b, False),
+    ">": (lambda a, b: a > b, False),
+    "<=": (lambda a, b: a <= b, False),
+    "<": (lambda a, b: a < b, False),
+    "in": (_in, False),
+    "intersect": (_intersect, []),
+}
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str):
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                parsed_date = parse_date(value)
+                parsed = parsed_date and datetime.combine(parsed_date, time())
+        except ValueError:
+            parsed = None
+    else:
+        parsed = None
+
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.utc)
+    return parsed
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def _version_key(version):
+    parts = []
+    for part in version.split("."):
+        digits = ""
+        while part and part[0].isdigit():
+            digits, part = digits + part[0], part[1:]
+        # A pre-release suffix such as "a1" or "b3" sorts before the release.
+        parts.append((int(digits or 0), part == "", part))
+    return tuple(parts)
+
+
+def _version_compare(left, right):
+    left_key, right_key = _version_key(str(left)), _version_key(str(right))
+    padding = (0, True, "")
+    length = max(len(left_key), len(right_key))
+    left_key += (padding,) * (length - len(left_key))
+    right_key += (padding,) * (length - len(right_key))
+    return (left_key > right_key) - (left_key < right_key)
+
+
+def _as_inputs(value):
+    return value if isinstance(value, list) else [value]
+
+
+def transform_date(values, args, contexts):
+    return [_to_datetime(value) for value in values]
+
+
+def _sample_grouped(values, keys, sample_many):
+    # The sampling arguments are almost always the same for every client, so
+    # clients are grouped by them and each group is sampled in one call. They
+    # are grouped by their JSON, since transforms can return lists or objects,
+    # which can't be used as dict keys.
+    groups = {}
+    for i, key in enumerate(keys):
+        group_key = json.dumps(key, sort_keys=True, default=repr)
+        groups.setdefault(group_key, (key, []))[1].append(i)
+
+    result = [None] * len(values)
+    for key, indices in groups.values():
+        samples = sample_many(key, [_as_inputs(values[i]) for i in indices])
+        for i, sample in zip(indices, samples):
+            result[i] = sample
+    return result
+
+
+def transform_stable_sample(values, args, contexts):
+    (rates,) = args
+    return _sample_grouped(values, rates, deterministic_sample_many)
+
+
+def transform_bucket_sample(values, args, contexts):
+    return _sample_grouped(
+        values, list(zip(*args)), lambda key, inputs: bucket_sample_many(*key, inputs)
+    )
+
+
+def transform_preference_value(values, args, contexts):
+    defaults = args[0] if args else [None] * len(values)
+    return [
+        (_get(context, "preferences") or {}).get(pref, default)
+        for pref, default, context in zip(values, defaults, contexts)
+    ]
+
+
+def transform_preference_exists(values, args, contexts):
+    return [
+        pref in (_get(context, "preferences") or {}) for pref, context in zip(values, contexts)
+    ]
+
+
+def transform_preference_is_user_set(values, args, contexts):
+    return [
+        pref in (_get(context, "userSetPreferences") or [])
+        for pref, context in zip(values, contexts)
+    ]
+
+
+def transform_keys(values, args, contexts):
+    return [list(value.keys()) if isinstance(value, dict) else None for value in values]
+
+
+def transform_version_compare(values, args, contexts):
+    (others,) = args
+    return [
+        None if value is None or other is None else _version_compare(value, other)
+        for value, other in zip(values, others)
+    ]
+
+
+# Transforms documented at
+# https://mozilla.github.io/normandy/user/filters.html#transforms
+TRANSFORMS = {
+    "date": transform_date,
+    "stableSample": transform_stable_sample,
+    "bucketSample": transform_bucket_sample,
+    "preferenceValue": transform_preference_value,
+    "preferenceExists": transform_preference_exists,
+    "preferenceIsUserSet": transform_preference_is_user_set,
+    "keys": transform_keys,
+    "versionCompare": transform_version_compare,
+}
+
+
+def compile_literal(node):
+    value = node.value
+    return lambda contexts, relatives: [value] * len(contexts)
+
+
+def compile_array_literal(node):
+    items = [compile_node(item) for item in node.value]
+
+    def evaluate(contexts, relatives):
+        columns = [item(contexts, relatives) for item in items]
+        if not columns:
+            return [[] for _ in contexts]
+        return [list(row) for row in zip(*columns)]
+
+    return evaluate
+
+
+def compile_object_literal(node):
+    keys = list(node.value.keys())
+    values = [compile_node(value) for value in node.value.values()]
+
+    def evaluate(contexts, relatives):
+        columns = [value(contexts, relatives) for value in values]
+        if not columns:
+            return [{} for _ in contexts]
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+
+    return evaluate
+
+
+def compile_identifier(node):
+    name = node.value
+
+    if node.relative:
+        return lambda contexts, relatives: [_get(relative, name) for relative in relatives]
+
+    if node.subject is not None:
+        subject = compile_node(node.subject)
+        return lambda contexts, relatives: [
+            _get(value, name) for value in subject(contexts, relatives)
+        ]
+
+    return lambda contexts, relatives: [_get(context, name) for context in contexts]
+
+
+def compile_unary_expression(node):
+    if node.operator.symbol != "!":
+        raise ValueError(f"Unsupported operator {node.operator.symbol!r}")
+
+    right = compile_node(node.right)
+    return lambda contexts, relatives: [not value for value in right(contexts, relatives)]
+
+
+def compile_short_circuit(node):
+    left = compile_node(node.left)
+    right = compile_node(node.right)
+    evaluate_right_if = bool if node.operator.symbol == "&&" else (lambda value: not value)
+
+    def evaluate(contexts, relatives):
+        column = left(contexts, relatives)
+        indices = [i for i, value in enumerate(column) if evaluate_right_if(value)]
+        if not indices:
+            return column
+        return _merge(column, indices, right(*_subset(contexts, relatives, indices)))
+
+    return evaluate
+
+
+def compile_binary_expression(node):
+    symbol = node.operator.symbol
+    if symbol in ("&&", "||"):
+        return compile_short_circuit(node)
+
+    try:
+        operation, default = BINARY_OPERATORS[symbol]
+    except KeyError:
+        raise ValueError(f"Unsupported operator {symbol!r}")
+
+    safe_operation = _safe(operation, default)
+    left = compile_node(node.left)
+    right = compile_node(node.right)
+
+    def evaluate(contexts, relatives):
+        pairs = list(zip(left(contexts, relatives), right(contexts, relatives)))
+        try:
+            return [operation(a, b) for a, b in pairs]
+        except (TypeError, ZeroDivisionError):
+            return [safe_operation(a, b) for a, b in pairs]
+
+    return evaluate
+
+
+def compile_conditional_expression(node):
+    test = compile_node(node.test)
+    consequent = compile_node(node.consequent)
+    alternate = compile_node(node.alternate)
+
+    def evaluate(contexts, relatives):
+        column = test(contexts, relatives)
+        truthy = [i for i, value in enumerate(column) if value]
+        falsy = [i for i, value in enumerate(column) if not value]
+        result = [None] * len(contexts)
+        if truthy:
+            result = _merge(result, truthy, consequent(*_subset(contexts, relatives, truthy)))
+        if falsy:
+            result = _merge(result, falsy, alternate(*_subset(contexts, relatives, falsy)))
+        return result
+
+    return evaluate
+
+
+def compile_transform(node):
+    try:
+        transform = TRANSFORMS[node.name]
+    except KeyError:
+        raise ValueError(f"No transform found with the name {node.name!r}")
+
+    subject = compile_node(node.subject)
+    args = [compile_node(arg) for arg in node.args]
+
+    def evaluate(contexts, relatives):
+        return transform(
+            subject(contexts, relatives), [arg(contexts, relatives) for arg in args], contexts
+        )
+
+    return evaluate
+
+
+def compile_filter_expression(node):
+    subject = compile_node(node.subject)
+    expression = compile_node(node.expression)
+
+    if node.relative:
+        # Every item of every client's array is evaluated as one batch, and
+        # the results are then grouped back by client.
+        def evaluate(contexts, relatives):
+            owners, items = [], []
+            for i, value in enumerate(subject(contexts, relatives)):
+                for item in value if isinstance(value, list) else []:
+                    owners.append(i)
+                    items.append(item)
+
+            result = [[] for _ in contexts]
+            if items:
+                matches = expression([contexts[i] for i in owners], items)
+                for owner, item, match in zip(owners, items, matches):
+                    if match:
+                        result[owner].append(item)
+            return result
+
+        return evaluate
+
+    def evaluate(contexts, relatives):
+        result = []
+        for value, key in zip(subject(contexts, relatives), expression(contexts, relatives)):
+            if key is True:
+                result.append(value)
+            elif key is False:
+                result.append(None)
+            else:
+                try:
+                    result.append(value[key])
+                except (IndexError, KeyError, TypeError):
+                    result.append(None)
+        return result
+
+    return evaluate
+
+
+NODE_COMPILERS = {
+    "Literal": compile_literal,
+    "ArrayLiteral": compile_array_literal,
+    "ObjectLiteral": compile_object_literal,
+    "Identifier": compile_identifier,
+    "UnaryExpression": compile_unary_expression,
+    "BinaryExpression": compile_binary_expression,
+    "ConditionalExpression": compile_conditional_expression,
+    "Transform": compile_transform,
+    "FilterExpression": compile_filter_expression,
+}
+
+
+# Transforms that read from the client context, rather than only their inputs.
+CONTEXT_TRANSFORMS = {"preferenceValue", "preferenceExists", "preferenceIsUserSet"}
+
+
+def is_constant(node):
+    """Return True if the value of `node` is the same for every client."""
+    node_type = type(node).__name__
+    if node_type == "Literal":
+        return True
+    elif node_type == "ArrayLiteral":
+        return all(is_constant(item) for item in node.value)
+    elif node_type == "ObjectLiteral":
+        return all(is_constant(value) for value in node.value.values())
+    elif node_type == "UnaryExpression":
+        return is_constant(node.right)
+    elif node_type == "BinaryExpression":
+        return is_constant(node.left) and is_constant(node.right)
+    elif node_type == "ConditionalExpression":
+        return all(is_constant(n) for n in (node.test, node.consequent, node.alternate))
+    elif node_type == "Transform":
+        return (
+            node.name not in CONTEXT_TRANSFORMS
+            and is_constant(node.subject)
+            and all(is_constant(arg) for arg in node.args)
+        )
+    return False
+
+
+def compile_node(node):
+    try:
+        compiler = NODE_COMPILERS[type(node).__name__]
+    except KeyError:
+        raise ValueError(f"Could not compile expression: {node!r}")
+
+    evaluate = compiler(node)
+    if is_constant(node) and type(node).__name__ != "Literal":
+        # Parts of the expression that don't depend on the client, such as
+        # the dates compared against in date ranges, are only evaluated once.
+        (value,) = evaluate([{}], None)
+        return lambda contexts, relatives: [value] * len(contexts)
+    return evaluate
+
+
+@functools.lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(expression):
+    """
+    Compile a JEXL expression into a function that takes a list of client
+    contexts and returns the value of the expression for each of them.
+
+    :raises pyjexl.exceptions.ParseError: if the expression can't be parsed.
+    :raises ValueError: if the expression uses an unknown transform or operator.
+    """
+    evaluate = compile_node(get_parser().parse(expression))
+    return lambda contexts: evaluate(contexts, None)
+
+
+def evaluate(expression, contexts):
+    """Evaluate a JEXL expression for each of a list of client contexts."""
+    return compile_expression(expression)(list(contexts))
+
+
+def generate_clients(count, channels, locales, countries, seed=None):
+    """
+    Generate random client contexts for simulating targeting.
+
+    Channels, locales and countries are picked uniformly from the given lists.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    for _ in range(count):
+        version = rng.choice(SIMULATED_VERSIONS)
+        platform = rng.choice(SIMULATED_PLATFORMS)
+        yield {
+            "normandy": {
+                "userId": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "channel": rng.choice(channels) if channels else None,
+                "locale": rng.choice(locales) if locales else None,
+                "country": rng.choice(countries) if countries else None,
+                "version": version,
+                "request_time": now,
+                "os": {name: name == platform for name in SIMULATED_PLATFORMS},
+                "addons": {},
+                "telemetry": {},
+            },
+            "env": {"version": version},
+            "preferences": {},
+            "userSetPreferences": [],
+        }
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def simulate_targeting(recipes, clients, batch_size=None):
+    """
+    Evaluate the filter expressions of the approved revisions of `recipes`
+    against `clients`, a stream of client contexts.
+
+    Clients are evaluated in batches of ``TARGETING_SIMULATION_BATCH_SIZE``.
+    The ``normandy.recipe`` field of each context is set to the recipe being
+    evaluated.
+
+    :returns: A tuple of the number of clients, and a list with the number of
+        matching clients for each recipe. Recipes whose filter expression
+        can't be evaluated are reported with an error instead.
+    """
+    batch_size = batch_size or settings.TARGETING_SIMULATION_BATCH_SIZE
+    results = []
+    for recipe in recipes:
+        result = {"id": recipe.id, "name": recipe.approved_revision.name, "matches": 0}
+        try:
+            result["evaluate"] = compile_expression(recipe.approved_revision.filter_expression)
+            result["error"] = None
+        except (ParseError, ValueError) as e:
+            result["error"] = str(e)
+        results.append(result)
+
+    total = 0
+    for batch in _batches(clients, batch_size):
+        total += len(batch)
+        for result in results:
+            if result["error"]:
+                continue
+
+            for context in batch:
+                context.setdefault("normandy", {})["recipe"] = {"id": result["id"]}
+            try:
+                result["matches"] += sum(1 for value in result["evaluate"](batch) if value)
+            except (TypeError, ValueError) as e:
+                result["error"] = str(e)
+
+    for result in results:
+        result.pop("evaluate", None)
+        if result["error"]:
+            result["matches"] = None
+            result["rate"] = None
+        else:
+            result["rate"] = result["matches"] / total if total else 0.0
+
+    return total, results
+
+
+def simulate_enabled_recipes(client_count, seed=None, batch_size=None):
+    """
+    Simulate the targeting of every enabled recipe against `client_count`
+    generated clients, using the channels, locales and countries known to
+    Normandy.
+
+    :returns: The same as :func:`simulate_targeting`.
+    """
+    recipes = Recipe.objects.only_enabled().select_related("approved_revision").order_by("id")
+    clients = generate_clients(
+        client_count,
+        channels=list(Channel.objects.values_list("slug", flat=True)),
+        locales=list(Locale.objects.values_list("code", flat=True)),
+        countries=list(Country.objects.values_list("code", flat=True)),
+        seed=seed,
+    )
+    return simulate_targeting(recipes, clients, batch_size=batch_size)
@@ -145,15 +145,27 @@ class RemoteSettings:
                     f"Review was not disabled on Remote Settings collection {collection}."
                 )
 
-    def published_recipes(self):
+    def published_recipes(self, since=None, ids=None):
         """
         Return the current list of remote records.
+
+        :param since: only return the records that changed after this
+            timestamp, including tombstones for the deleted ones.
+        :param ids: only return the records with these ids.
         """
         if self.client is None:
             raise ImproperlyConfigured("Remote Settings is not enabled.")
 
+        filters = {}
+        if since is not None:
+            filters["_since"] = since
+        if ids is not None:
+            filters["in_id"] = ",".join(sorted(ids))
+
         capabilities_records = self.client.get_records(
-            bucket=rs_settings.PUBLISH_BUCKET_ID, collection=rs_settings.CAPABILITIES_COLLECTION_ID
+            bucket=rs_settings.PUBLISH_BUCKET_ID,
+            collection=rs_settings.CAPABILITIES_COLLECTION_ID,
+            **filters,
         )
         return capabilities_records
 
@@ -190,32 +202,100 @@ class RemoteSettings:
             return  # no-op if disabled.
 
         # 1. Delete the record
-        either_existed = False
+        either_existed = self._delete_record(recipe)
+
+        # 2. Approve the changes immediately (multi-signoff is disabled).
+        log_action = "Batch deleted"
+        if either_existed and approve_changes:
+            self.approve_changes()
+            log_action = "Deleted"
+
+        logger.info(
+            f"{log_action} record '{recipe.id}' of recipe {recipe.approved_revision.name!r}"
+        )
+
+    def publish_batch(self, publish=(), unpublish=(), approve_changes=True):
+        """
+        Publish and unpublish many recipes at once.
+
+        Records are upserted and deleted using the batch endpoint, in chunks of
+        ``REMOTE_SETTINGS_BATCH_SIZE`` operations, and the changes are approved
+        once at the end. Records are deleted after all of them are upserted, and
+        if a batch of deletions fails, they are retried one at a time, so that
+        only records that weren't published are skipped. If anything else
+        fails, the changes made in the workspace collection are rolled back.
+        """
+        if self.client is None:
+            return  # no-op if disabled.
+
+        publish = list(publish)
+        unpublish = list(unpublish)
+        if not publish and not unpublish:
+            return
 
+        try:
+            for start in range(0, len(publish), rs_settings.BATCH_SIZE):
+                self._send_updates(publish[start : start + rs_settings.BATCH_SIZE])
+            for start in range(0, len(unpublish), rs_settings.BATCH_SIZE):
+                self._send_deletes(unpublish[start : start + rs_settings.BATCH_SIZE])
+        except kinto_http.KintoException:
+            self.client.patch_collection(
+                id=rs_settings.CAPABILITIES_COLLECTION_ID,
+                data=ROLLBACK_CHANGES_FLAG,
+                bucket=rs_settings.WORKSPACE_BUCKET_ID,
+            )
+            raise
+
+        log_action = "Batch published"
+        if approve_changes:
+            self.approve_changes()
+            log_action = "Published"
+
+        logger.info(f"{log_action} {len(publish)} records and deleted {len(unpublish)} records")
+
+    def _send_updates(self, recipes):
+        with self.client.batch() as batch:
+            for recipe in recipes:
+                batch.update_record(
+                    data=recipe_as_record(recipe),
+                    bucket=rs_settings.WORKSPACE_BUCKET_ID,
+                    collection=rs_settings.CAPABILITIES_COLLECTION_ID,
+                )
+
+    def _send_deletes(self, recipes):
+        try:
+            with self.client.batch() as batch:
+                for recipe in recipes:
+                    batch.delete_record(
+                        id=str(recipe.id),
+                        bucket=rs_settings.WORKSPACE_BUCKET_ID,
+                        collection=rs_settings.CAPABILITIES_COLLECTION_ID,
+                    )
+        except kinto_http.KintoException:
+            # A batch fails on the first error, which may only be a record that
+            # wasn't published, and the other responses aren't checked. Delete
+            # the records one at a time, so that only missing records are skipped.
+            for recipe in recipes:
+                self._delete_record(recipe)
+
+    def _delete_record(self, recipe):
+        """
+        Delete the record of `recipe`, if it was published. Returns whether it was.
+        """
         try:
             self.client.delete_record(
                 id=str(recipe.id),
                 bucket=rs_settings.WORKSPACE_BUCKET_ID,
                 collection=rs_settings.CAPABILITIES_COLLECTION_ID,
             )
-            either_existed = True
+            return True
         except kinto_http.KintoException as e:
             if e.response.status_code == 404:
                 logger.warning(
                     f"The recipe '{recipe.id}' was not published in the capabilities collection. Skip."
                 )
-            else:
-                raise
-
-        # 2. Approve the changes immediately (multi-signoff is disabled).
-        log_action = "Batch deleted"
-        if either_existed and approve_changes:
-            self.approve_changes()
-            log_action = "Deleted"
-
-        logger.info(
-            f"{log_action} record '{recipe.id}' of recipe {recipe.approved_revision.name!r}"
-        )
+                return False
+            raise
 
     def approve_changes(self):
         """
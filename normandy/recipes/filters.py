@@ -23,9 +23,11 @@ field, so the final JSON would look something like this:
 import json
 from datetime import datetime
 
-from pyjexl import JEXL
 from rest_framework import serializers
 
+from normandy.recipes import jexl
+from normandy.recipes.utils import bucket_ranges, major_version
+
 
 # If you add a new filter to this file, remember to update the docs too!
 class BaseFilter(serializers.Serializer):
@@ -50,6 +52,14 @@ class BaseFilter(serializers.Serializer):
         """Render this filter to a JEXL expression"""
         raise NotImplementedError
 
+    def targeting_values(self):
+        """
+        The client attributes this filter restricts, mapped to the set of
+        values that can match. Attributes that aren't included can have any
+        value.
+        """
+        return {}
+
 
 class BaseAddonFilter(BaseFilter):
     addons = serializers.ListField(child=serializers.CharField(), min_length=1)
@@ -132,6 +142,9 @@ class ChannelFilter(BaseFilter):
         channels = ",".join(f'"{c}"' for c in self.initial_data["channels"])
         return f"normandy.channel in [{channels}]"
 
+    def targeting_values(self):
+        return {"channel": set(self.initial_data["channels"])}
+
     @property
     def capabilities(self):
         # no special capabilities needed
@@ -169,6 +182,9 @@ class LocaleFilter(BaseFilter):
         locales = ",".join(f'"{l}"' for l in self.initial_data["locales"])
         return f"normandy.locale in [{locales}]"
 
+    def targeting_values(self):
+        return {"locale": set(self.initial_data["locales"])}
+
     @property
     def capabilities(self):
         # no special capabilities needed
@@ -205,6 +221,9 @@ class CountryFilter(BaseFilter):
         countries = ",".join(f'"{c}"' for c in self.initial_data["countries"])
         return f"normandy.country in [{countries}]"
 
+    def targeting_values(self):
+        return {"country": set(self.initial_data["countries"])}
+
     @property
     def capabilities(self):
         # no special capabilities needed
@@ -243,6 +262,9 @@ class PlatformFilter(BaseFilter):
 
         return "||".join((p for p in platforms_jexl))
 
+    def targeting_values(self):
+        return {"platform": set(self.initial_data["platforms"])}
+
     @property
     def capabilities(self):
         return set()
@@ -547,6 +569,11 @@ class NamespaceSampleFilter(BaseFilter):
         - Instead of taking arbitrary inputs, only a namespace is accepted,
           as a string, and the user's client ID is added automatically.
 
+    The buckets of a namespace used by enabled recipes can't overlap. They are
+    listed at ``/api/v3/bucket_allocation/``, and the first free range of a
+    given size can be found at
+    ``/api/v3/bucket_allocation/free/?namespace=<namespace>&count=<count>``.
+
     .. attribute:: type
 
         ``namespaceSample``
@@ -577,12 +604,19 @@ class NamespaceSampleFilter(BaseFilter):
     count = serializers.FloatField(min_value=0)
     namespace = serializers.CharField(min_length=1)
 
+    total = 10_000
+
     def to_jexl(self):
         namespace = self.initial_data["namespace"]
         start = self.initial_data["start"]
         count = self.initial_data["count"]
-        total = 10_000
-        return f'["{namespace}",normandy.userId]|bucketSample({start},{count},{total})'
+        return f'["{namespace}",normandy.userId]|bucketSample({start},{count},{self.total})'
+
+    def bucket_ranges(self):
+        """The ranges of buckets in the namespace included by this filter."""
+        return bucket_ranges(
+            float(self.initial_data["start"]), float(self.initial_data["count"]), self.total
+        )
 
     @property
     def capabilities(self):
@@ -626,6 +660,9 @@ class VersionFilter(BaseFilter):
             for v in self.initial_data["versions"]
         )
 
+    def targeting_values(self):
+        return {"version": {str(v) for v in self.initial_data["versions"]}}
+
     @property
     def capabilities(self):
         # no special capabilities needed
@@ -668,6 +705,15 @@ class VersionRangeFilter(BaseFilter):
             ]
         )
 
+    def targeting_values(self):
+        # Pre-releases of the maximum version sort before it, so the major
+        # version of the maximum is always included.
+        min_major = major_version(self.initial_data["min_version"])
+        max_major = major_version(self.initial_data["max_version"])
+        if min_major is None or max_major is None:
+            return {}
+        return {"version": {str(v) for v in range(min_major, max_major + 1)}}
+
     @property
     def capabilities(self):
         return {"jexl.context.env.version", "jexl.transform.versionCompare"}
@@ -907,19 +953,7 @@ class JexlFilter(BaseFilter):
 
     def to_jexl(self):
         built_expression = "(" + self.initial_data["expression"] + ")"
-        jexl = JEXL()
-
-        # Add mock transforms for validation. See
-        # https://mozilla.github.io/normandy/user/filters.html#transforms
-        # for a list of what transforms we expect to be available.
-        jexl.add_transform("date", lambda x: x)
-        jexl.add_transform("stableSample", lambda x: x)
-        jexl.add_transform("bucketSample", lambda x: x)
-        jexl.add_transform("preferenceValue", lambda x: x)
-        jexl.add_transform("preferenceIsUserSet", lambda x: x)
-        jexl.add_transform("preferenceExists", lambda x: x)
-
-        errors = list(jexl.validate(built_expression))
+        errors = jexl.validate(built_expression)
         if errors:
             raise serializers.ValidationError(errors)
 
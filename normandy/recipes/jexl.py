@@ -0,0 +1,55 @@
+"""
+Validation of JEXL expressions written for recipes.
+
+Building a JEXL instance and parsing an expression are both relatively
+expensive, and the same expressions are validated over and over while
+rendering filter expressions. A single JEXL instance is shared by the whole
+process, and the result of validating each expression is cached.
+"""
+
+import functools
+
+from pyjexl import JEXL
+
+
+# Mock transforms used for validation. See
+# https://mozilla.github.io/normandy/user/filters.html#transforms
+# for a list of what transforms we expect to be available.
+MOCK_TRANSFORMS = [
+    "date",
+    "stableSample",
+    "bucketSample",
+    "preferenceValue",
+    "preferenceIsUserSet",
+    "preferenceExists",
+]
+VALIDATION_CACHE_SIZE = 1024
+
+
+def build_jexl():
+    jexl = JEXL()
+    for name in MOCK_TRANSFORMS:
+        jexl.add_transform(name, lambda x: x)
+    return jexl
+
+
+@functools.lru_cache(maxsize=1)
+def get_jexl():
+    return build_jexl()
+
+
+@functools.lru_cache(maxsize=VALIDATION_CACHE_SIZE)
+def _validate(expression):
+    return tuple(get_jexl().validate(expression))
+
+
+def validate(expression):
+    """
+    Return a list of the errors found in a JEXL expression, which is empty if
+    the expression is valid.
+    """
+    return list(_validate(expression))
+
+
+def clear_cache():
+    _validate.cache_clear()
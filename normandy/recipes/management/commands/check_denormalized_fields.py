@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.template.defaultfilters import pluralize
+
+from normandy.recipes.models import CollectionGeneration, Recipe
+
+
+class Command(BaseCommand):
+    """
+    Check that the fields recipes copy from their revisions are up to date.
+
+    Recipes copy the enabled state of their approved revision and the update
+    time of their latest revision when they are saved. Changes that skip
+    `Recipe.save`, such as queryset updates, leave the copies stale.
+    """
+
+    help = "Checks the fields that recipes copy from their revisions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true", help="Update the recipes whose fields are stale"
+        )
+
+    def handle(self, *args, fix=False, **options):
+        recipes = Recipe.objects.select_related(
+            "latest_revision", "approved_revision__enabled_state"
+        ).order_by("id")
+
+        stale_count = 0
+        for recipe in recipes.iterator():
+            saved = {field: getattr(recipe, field) for field in Recipe.DENORMALIZED_FIELDS}
+            recipe.update_denormalized_fields()
+            current = {field: getattr(recipe, field) for field in Recipe.DENORMALIZED_FIELDS}
+            if saved == current:
+                continue
+
+            stale_count += 1
+            for field in Recipe.DENORMALIZED_FIELDS:
+                if saved[field] != current[field]:
+                    self.stdout.write(
+                        f"Recipe {recipe.id}: {field} is {saved[field]}, "
+                        f"but should be {current[field]}"
+                    )
+            if fix:
+                Recipe.objects.filter(id=recipe.id).update(**current)
+
+        if fix:
+            if stale_count:
+                # Queryset updates don't send the signals that mark listings as changed
+                CollectionGeneration.increment(CollectionGeneration.RECIPES)
+            self.stdout.write(f"{stale_count} recipe{pluralize(stale_count)} updated")
+        elif stale_count:
+            raise CommandError(f"{stale_count} recipe{pluralize(stale_count)} out of date")
+        else:
+            self.stdout.write("All recipes are up to date")
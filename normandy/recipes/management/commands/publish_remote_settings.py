@@ -0,0 +1,57 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from normandy.recipes.models import RemoteSettingsOutbox
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """
+    Publish the pending recipe changes to Remote Settings.
+
+    Enabling or disabling a recipe adds it to an outbox instead of publishing
+    it during the request. This command publishes all of the pending changes
+    at once, and retries them later with a backoff if publishing fails.
+    """
+
+    help = "Publish pending recipe changes to Remote Settings"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            default=False,
+            help="Keep running, and publish new changes as they are made.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5,
+            help="Number of seconds to wait between checks for new changes with --watch.",
+        )
+
+    def handle(self, *args, watch=False, interval=5, **options):
+        if not watch:
+            try:
+                self.publish()
+            except Exception as e:
+                raise CommandError(f"Could not publish changes to Remote Settings: {e}")
+            return
+
+        while True:
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("Could not publish changes to Remote Settings")
+            time.sleep(interval)
+
+    def publish(self):
+        published, unpublished = RemoteSettingsOutbox.process()
+        for recipe in published:
+            self.stdout.write(f"Published recipe {recipe.id}")
+        for recipe in unpublished:
+            self.stdout.write(f"Unpublished recipe {recipe.id}")
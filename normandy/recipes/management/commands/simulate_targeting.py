@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from normandy.recipes.evaluation import simulate_enabled_recipes
+
+
+class Command(BaseCommand):
+    """
+    Estimate the share of clients that each enabled recipe targets.
+
+    The filter expression of every enabled recipe is evaluated against
+    randomly generated clients, and the number of matching clients is
+    reported for each recipe.
+    """
+
+    help = "Estimates the reach of enabled recipes by evaluating them against simulated clients"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--clients", type=int, default=100000, help="Number of clients to simulate."
+        )
+        parser.add_argument(
+            "--seed", type=int, default=None, help="Seed used to generate the clients."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of clients to evaluate at once. "
+            "Defaults to settings.TARGETING_SIMULATION_BATCH_SIZE.",
+        )
+
+    def handle(self, *args, clients, seed, batch_size, **options):
+        if clients < 1:
+            raise CommandError("--clients must be a positive number")
+
+        start = time.monotonic()
+        total, results = simulate_enabled_recipes(clients, seed=seed, batch_size=batch_size)
+        elapsed = time.monotonic() - start
+
+        for result in results:
+            if result["error"]:
+                self.stdout.write(
+                    f"Recipe {result['id']} ({result['name']}): error: {result['error']}"
+                )
+            else:
+                self.stdout.write(
+                    f"Recipe {result['id']} ({result['name']}): "
+                    f"{result['matches']} of {total} clients ({result['rate']:.2%})"
+                )
+
+        self.stdout.write(
+            f"Evaluated {len(results)} recipes against {total} clients in {elapsed:.1f}s"
+        )
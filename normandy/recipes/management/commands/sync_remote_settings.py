@@ -1,12 +1,18 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
 
-from normandy.recipes.models import Recipe
+from normandy.recipes.models import Recipe, RemoteSettingsChange, RemoteSettingsSyncState
 from normandy.recipes.exports import RemoteSettings, recipe_as_record
 
 
 KINTO_INTERNAL_FIELDS = ("last_modified", "schema")
 
 
+def latest_timestamp(records, default=None):
+    return max((r["last_modified"] for r in records if "last_modified" in r), default=default)
+
+
 def compare_remote(recipe, record):
     as_record = recipe_as_record(recipe)
     cleaned_record = {k: v for k, v in record.items() if k not in KINTO_INTERNAL_FIELDS}
@@ -15,6 +21,11 @@ def compare_remote(recipe, record):
 
 class Command(BaseCommand):
     """Check that Remote Settings published content is consistent and up-to-date.
+
+    By default, only the recipes that were journaled as changed and the
+    records that changed remotely since the last successful sync are
+    compared. A full comparison is made with ``--full``, or if there was no
+    successful sync yet.
     """
 
     help = "Sync recipes with Remote Settings"
@@ -23,19 +34,45 @@ class Command(BaseCommand):
         parser.add_argument(
             "--dry-run", action="store_true", default=False, help="Do not sync, just print out."
         )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            default=False,
+            help="Compare all recipes and records, instead of only the changed ones.",
+        )
 
-    def handle(self, *args, dry_run=False, **options):
+    def handle(self, *args, dry_run=False, full=False, **options):
         remote_settings = RemoteSettings()
-
-        local_recipes = Recipe.objects.filter(approved_revision__enabled_state__enabled=True)
-        remote_records = remote_settings.published_recipes()
+        state = RemoteSettingsSyncState.get()
+
+        # Changes journaled while syncing will be picked up by the next sync.
+        # Only the entries read now are cleared afterwards: transactions that
+        # are still in flight can commit entries with lower ids than these.
+        journal = list(RemoteSettingsChange.objects.values_list("id", "recipe_id"))
+        change_ids = [change_id for change_id, _ in journal]
+
+        local_recipes = Recipe.objects.only_enabled()
+        if full or state.last_modified is None:
+            remote_records = remote_settings.published_recipes()
+            last_modified = latest_timestamp(remote_records)
+        else:
+            changed_records = remote_settings.published_recipes(since=state.last_modified)
+            candidate_ids = {str(recipe_id) for _, recipe_id in journal}
+            candidate_ids.update(r["id"] for r in changed_records)
+
+            local_recipes = local_recipes.filter(id__in=candidate_ids)
+            remote_records = (
+                remote_settings.published_recipes(ids=candidate_ids) if candidate_ids else []
+            )
+            # Tombstones of deleted records count towards the timestamp too.
+            last_modified = latest_timestamp(changed_records, default=state.last_modified)
 
         # Compare the two sets: local recipes that are missing remotely will
         # be published, recipes that differ will be updated, and recipes that
         # are only on the remote server will be unpublished.
         to_publish = []
         to_update = []
-        local_by_id = {str(r.id): r for r in local_recipes}
+        local_by_id = {str(r.id): r for r in local_recipes.select_related("approved_revision")}
         remote_by_id = {r["id"]: r for r in remote_records}
         for rid, local_recipe in local_by_id.items():
             if rid in remote_by_id:
@@ -45,16 +82,14 @@ class Command(BaseCommand):
             else:
                 to_publish.append(local_recipe)
         # Lookup locally the recipes that are published but should not.
-        to_unpublish = []
-        for rid in remote_by_id.keys():
-            try:
-                to_unpublish.append(Recipe.objects.get(id=rid))
-            except Recipe.DoesNotExist:
-                to_unpublish.append(Recipe(id=rid))
+        known_recipes = Recipe.objects.in_bulk([int(rid) for rid in remote_by_id.keys()])
+        to_unpublish = [known_recipes.get(int(rid), Recipe(id=rid)) for rid in remote_by_id]
 
         # If there is nothing to do, exit.
         if not to_publish and not to_update and not to_unpublish:
             self.stdout.write(self.style.SUCCESS("Sync OK. Nothing to do."))
+            if not dry_run:
+                self.record_sync(state, change_ids, last_modified)
             return
 
         # Show differences on stdout, and un/publish if not dry-run.
@@ -62,15 +97,11 @@ class Command(BaseCommand):
         self.stdout.write(style(f"{len(to_publish)} recipes to publish:"))
         for r in to_publish:
             self.stdout.write(f" * {r.approved_revision.name!r} (id={r.id!r})")
-            if not dry_run:
-                remote_settings.publish(r)
 
         style = self.style.SUCCESS if not to_update else self.style.MIGRATE_LABEL
         self.stdout.write(style(f"{len(to_update)} recipes to update:"))
         for r in to_update:
             self.stdout.write(f" * {r.approved_revision.name!r} (id={r.id!r})")
-            if not dry_run:
-                remote_settings.publish(r)
 
         style = self.style.SUCCESS if not to_unpublish else self.style.MIGRATE_LABEL
         self.stdout.write(style(f"{len(to_unpublish)} recipes to unpublish:"))
@@ -81,5 +112,20 @@ class Command(BaseCommand):
                 else self.style.WARNING("Unknown locally")
             )
             self.stdout.write(f" * {name!r} (id={r.id!r})")
-            if not dry_run:
-                remote_settings.unpublish(r)
+
+        if not dry_run:
+            # Send all of the changes in batches, and approve them once.
+            remote_settings.publish_batch(publish=to_publish + to_update, unpublish=to_unpublish)
+            self.record_sync(state, change_ids, last_modified)
+
+    @transaction.atomic
+    def record_sync(self, state, change_ids, last_modified):
+        """
+        Clear the journal entries that were synced, and remember the
+        timestamp of the remote changes that were seen.
+        """
+        if change_ids:
+            RemoteSettingsChange.objects.filter(id__in=change_ids).delete()
+        state.last_modified = last_modified
+        state.synced = timezone.now()
+        state.save()
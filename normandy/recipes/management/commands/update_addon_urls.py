@@ -28,9 +28,8 @@ class Command(BaseCommand):
         target_revisions = RecipeRevision.objects.filter(action__name="opt-out-study")
         update_count = 0
         for rev in target_revisions:
-            # Pull into a local variable to modify the arguments since
-            # `rev.arguments` is actually a property that parses JSON, not a
-            # real attribute of the object
+            # `rev.arguments` is a copy of the stored arguments, so changes
+            # to it must be assigned back to the revision
             arguments = rev.arguments
 
             if not arguments.get("addonUrl"):
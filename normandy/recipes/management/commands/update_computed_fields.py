@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.template.defaultfilters import pluralize
+
+from normandy.recipes.models import RecipeRevision
+
+
+class Command(BaseCommand):
+    """
+    Fill in the computed fields of recipe revisions.
+
+    Revisions calculate these fields when they are saved, so this is only
+    needed for revisions that were created before a field existed, or after
+    changing how a field is calculated.
+    """
+
+    help = "Updates the computed fields of recipe revisions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-a",
+            "--all",
+            action="store_true",
+            help="Recompute fields for all revisions, instead of only those missing them",
+        )
+
+    def handle(self, *args, all=False, **options):
+        revisions = RecipeRevision.objects.all()
+        if not all:
+            revisions = revisions.filter(
+                Q(stored_filter_expression=None)
+                | Q(stored_capabilities=None)
+                | Q(stored_argument_key=None)
+                | Q(stored_search_text=None)
+            )
+
+        update_count = 0
+        for revision in revisions.iterator():
+            revision.update_computed_fields()
+            update_count += 1
+
+        self.stdout.write(f"{update_count} revision{pluralize(update_count)} updated")
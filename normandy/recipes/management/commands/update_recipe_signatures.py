@@ -25,8 +25,14 @@ class Command(BaseCommand):
         parser.add_argument(
             "-f", "--force", action="store_true", help="Update signatures for all recipes"
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of recipes to sign per request to Autograph",
+        )
 
-    def handle(self, *args, force=False, **options):
+    def handle(self, *args, force=False, batch_size=None, **options):
         remote_settings = RemoteSettings()
 
         if force:
@@ -39,13 +45,11 @@ class Command(BaseCommand):
             self.stdout.write("No out of date recipes to sign")
         else:
             self.stdout.write(f"Signing {count} recipes:")
-            for recipe in recipes_to_update:
+            signed_recipes = recipes_to_update.update_signatures(batch_size=batch_size)
+            for recipe in signed_recipes:
                 self.stdout.write(" * " + recipe.approved_revision.name)
-                recipe.update_signature()
-                recipe.save()
-                remote_settings.publish(recipe, approve_changes=False)
-            # Approve all Remote Settings changes.
-            remote_settings.approve_changes()
+            # Publish all of the recipes, and approve the changes once.
+            remote_settings.publish_batch(publish=signed_recipes)
 
         metrics.gauge("signed", count, tags=["force"] if force else [])
 
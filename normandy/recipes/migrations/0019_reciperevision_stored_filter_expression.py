@@ -0,0 +1,16 @@
+# Generated by Django 2.2.10 on 2026-10-18 16:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0018_windowsversion")]
+
+    operations = [
+        migrations.AddField(
+            model_name="reciperevision",
+            name="stored_filter_expression",
+            field=models.TextField(editable=False, null=True),
+        )
+    ]
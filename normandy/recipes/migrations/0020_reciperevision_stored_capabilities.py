@@ -0,0 +1,26 @@
+# Generated by Django 2.2.10 on 2026-10-18 16:40
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0019_reciperevision_stored_filter_expression")]
+
+    operations = [
+        migrations.AddField(
+            model_name="reciperevision",
+            name="stored_capabilities",
+            field=django.contrib.postgres.fields.ArrayField(
+                base_field=models.CharField(max_length=255), editable=False, null=True, size=None
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reciperevision",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["stored_capabilities"], name="recipes_rev_stored_caps_gin"
+            ),
+        ),
+    ]
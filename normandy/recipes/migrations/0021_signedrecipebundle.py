@@ -0,0 +1,27 @@
+# Generated by Django 2.2.10 on 2026-10-18 17:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0020_reciperevision_stored_capabilities")]
+
+    operations = [
+        migrations.CreateModel(
+            name="SignedRecipeBundle",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("generation", models.PositiveIntegerField(default=0)),
+                ("built_generation", models.PositiveIntegerField(null=True)),
+                ("settings_key", models.CharField(blank=True, max_length=64)),
+                ("content", models.BinaryField(default=b"")),
+                ("etag", models.CharField(blank=True, max_length=64)),
+            ],
+        )
+    ]
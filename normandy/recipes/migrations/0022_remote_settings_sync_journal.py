@@ -0,0 +1,38 @@
+# Generated by Django 2.2.10 on 2026-10-18 19:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0021_signedrecipebundle")]
+
+    operations = [
+        migrations.CreateModel(
+            name="RemoteSettingsChange",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("recipe_id", models.IntegerField()),
+                ("created", models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RemoteSettingsSyncState",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("last_modified", models.BigIntegerField(null=True)),
+                ("synced", models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.10 on 2026-10-18 19:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0022_remote_settings_sync_journal")]
+
+    operations = [
+        migrations.CreateModel(
+            name="RemoteSettingsOutbox",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("recipe_id", models.IntegerField()),
+                ("created", models.DateTimeField(default=django.utils.timezone.now)),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                (
+                    "next_attempt",
+                    models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+                ),
+                ("last_error", models.TextField(blank=True)),
+            ],
+        )
+    ]
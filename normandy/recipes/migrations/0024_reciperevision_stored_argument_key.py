@@ -0,0 +1,22 @@
+# Generated by Django 2.2.10 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0023_remotesettingsoutbox")]
+
+    operations = [
+        migrations.AddField(
+            model_name="reciperevision",
+            name="stored_argument_key",
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="reciperevision",
+            index=models.Index(
+                fields=["action", "stored_argument_key"], name="recipes_rev_arg_key_idx"
+            ),
+        ),
+    ]
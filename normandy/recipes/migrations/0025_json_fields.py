@@ -0,0 +1,27 @@
+# Generated by Django 2.2.10 on 2026-10-18 20:40
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0024_reciperevision_stored_argument_key")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="action",
+            name="arguments_schema_json",
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name="reciperevision",
+            name="arguments_json",
+            field=django.contrib.postgres.fields.jsonb.JSONField(default=dict),
+        ),
+        migrations.AlterField(
+            model_name="reciperevision",
+            name="filter_object_json",
+            field=django.contrib.postgres.fields.jsonb.JSONField(null=True),
+        ),
+    ]
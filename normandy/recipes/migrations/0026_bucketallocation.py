@@ -0,0 +1,71 @@
+# Generated by Django 2.2.10 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_allocations(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    BucketAllocation = apps.get_model("recipes", "BucketAllocation")
+
+    recipes = Recipe.objects.filter(approved_revision__enabled_state__enabled=True)
+    allocations = []
+    for recipe in recipes.select_related("approved_revision"):
+        revision = recipe.approved_revision
+        for filter_data in revision.filter_object_json or []:
+            if filter_data.get("type") != "namespaceSample":
+                continue
+            allocations.append(
+                BucketAllocation(
+                    recipe_id=recipe.id,
+                    revision_id=revision.id,
+                    namespace=filter_data["namespace"],
+                    start=float(filter_data["start"]),
+                    count=float(filter_data["count"]),
+                )
+            )
+    BucketAllocation.objects.bulk_create(allocations)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0025_json_fields")]
+
+    operations = [
+        migrations.CreateModel(
+            name="BucketAllocation",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("namespace", models.CharField(max_length=255)),
+                ("start", models.FloatField()),
+                ("count", models.FloatField()),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bucket_allocations",
+                        to="recipes.Recipe",
+                    ),
+                ),
+                (
+                    "revision",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="bucket_allocations",
+                        to="recipes.RecipeRevision",
+                    ),
+                ),
+            ],
+            options={"ordering": ("namespace", "start")},
+        ),
+        migrations.AddIndex(
+            model_name="bucketallocation",
+            index=models.Index(fields=["namespace", "start"], name="recipes_bucket_alloc_ns_idx"),
+        ),
+        migrations.RunPython(create_allocations, migrations.RunPython.noop),
+    ]
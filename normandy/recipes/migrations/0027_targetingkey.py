@@ -0,0 +1,111 @@
+# Generated by Django 2.2.10 on 2026-10-18 22:15
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# A frozen copy of `targeting_values` of each filter type, as they were when
+# this migration was written, so that it doesn't change with the filters.
+def major_version(version):
+    match = re.match(r"\s*(\d+)", str(version))
+    return None if match is None else int(match.group(1))
+
+
+def version_range_values(data):
+    min_major = major_version(data["min_version"])
+    max_major = major_version(data["max_version"])
+    if min_major is None or max_major is None:
+        return {}
+    return {"version": {str(v) for v in range(min_major, max_major + 1)}}
+
+
+FILTER_TARGETING_VALUES = {
+    "channel": lambda data: {"channel": set(data["channels"])},
+    "country": lambda data: {"country": set(data["countries"])},
+    "locale": lambda data: {"locale": set(data["locales"])},
+    "platform": lambda data: {"platform": set(data["platforms"])},
+    "version": lambda data: {"version": {str(v) for v in data["versions"]}},
+    "versionRange": version_range_values,
+}
+
+
+def create_targeting_keys(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    TargetingKey = apps.get_model("recipes", "TargetingKey")
+
+    recipes = Recipe.objects.filter(approved_revision__enabled_state__enabled=True)
+    keys = []
+    for recipe in recipes.select_related("approved_revision"):
+        revision = recipe.approved_revision
+        restrictions = [
+            {"channel": {channel.slug for channel in revision.channels.all()}},
+            {"country": {country.code for country in revision.countries.all()}},
+            {"locale": {locale.code for locale in revision.locales.all()}},
+        ]
+        for filter_data in revision.filter_object_json or []:
+            targeting_values = FILTER_TARGETING_VALUES.get(filter_data["type"])
+            if targeting_values is not None:
+                restrictions.append(targeting_values(filter_data))
+
+        values = {}
+        for restriction in restrictions:
+            for attribute, allowed in restriction.items():
+                if allowed:
+                    values[attribute] = values.get(attribute, allowed) & allowed
+
+        for attribute, allowed in values.items():
+            for value in allowed or {""}:
+                keys.append(
+                    TargetingKey(
+                        recipe_id=recipe.id,
+                        revision_id=revision.id,
+                        attribute=attribute,
+                        value=value,
+                    )
+                )
+    TargetingKey.objects.bulk_create(keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0026_bucketallocation")]
+
+    operations = [
+        migrations.CreateModel(
+            name="TargetingKey",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True, primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("attribute", models.CharField(max_length=255)),
+                ("value", models.CharField(blank=True, max_length=255)),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="targeting_keys",
+                        to="recipes.Recipe",
+                    ),
+                ),
+                (
+                    "revision",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="targeting_keys",
+                        to="recipes.RecipeRevision",
+                    ),
+                ),
+            ],
+            options={"ordering": ("attribute", "value")},
+        ),
+        migrations.AddIndex(
+            model_name="targetingkey",
+            index=models.Index(fields=["attribute", "value"], name="recipes_targeting_key_idx"),
+        ),
+        migrations.RunPython(create_targeting_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.10 on 2026-10-18 23:02
+
+from django.db import migrations, models
+
+
+def create_generations(apps, schema_editor):
+    CollectionGeneration = apps.get_model("recipes", "CollectionGeneration")
+    CollectionGeneration.objects.bulk_create(
+        [CollectionGeneration(name="actions"), CollectionGeneration(name="recipes")]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0027_targetingkey")]
+
+    operations = [
+        migrations.CreateModel(
+            name="CollectionGeneration",
+            fields=[
+                ("name", models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ("generation", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_generations, migrations.RunPython.noop),
+    ]
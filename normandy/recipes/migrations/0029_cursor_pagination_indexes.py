@@ -0,0 +1,23 @@
+# Generated by Django 2.2.10 on 2026-10-18 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0028_collectiongeneration")]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reciperevision",
+            index=models.Index(fields=["created", "id"], name="recipes_rev_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reciperevision",
+            index=models.Index(fields=["updated", "id"], name="recipes_rev_updated_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="approvalrequest",
+            index=models.Index(fields=["created", "id"], name="recipes_approval_created_idx"),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 2.2.10 on 2026-10-19 00:12
+
+import json
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def fill_search_text(apps, schema_editor):
+    RecipeRevision = apps.get_model("recipes", "RecipeRevision")
+
+    revisions = []
+    for revision in RecipeRevision.objects.only(
+        "id", "name", "extra_filter_expression", "arguments_json"
+    ).iterator():
+        arguments = json.dumps(revision.arguments_json, ensure_ascii=False)
+        revision.stored_search_text = "\n".join(
+            [revision.name, revision.extra_filter_expression, arguments]
+        ).lower()
+        revisions.append(revision)
+    RecipeRevision.objects.bulk_update(revisions, ["stored_search_text"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0029_cursor_pagination_indexes")]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name="reciperevision",
+            name="stored_search_text",
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="reciperevision",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["stored_search_text"],
+                name="recipes_rev_search_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 2.2.10 on 2026-10-19 01:04
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_denormalized_fields(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeRevision = apps.get_model("recipes", "RecipeRevision")
+
+    Recipe.objects.filter(approved_revision__enabled_state__enabled=True).update(enabled=True)
+    latest_updated = RecipeRevision.objects.filter(id=OuterRef("latest_revision_id")).values(
+        "updated"
+    )
+    Recipe.objects.update(last_updated=Subquery(latest_updated[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0030_reciperevision_stored_search_text")]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="enabled",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="last_updated",
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_denormalized_fields, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name="recipe", options={"ordering": ["-enabled", "-last_updated"]}
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["enabled", "last_updated"], name="recipes_enabled_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(fields=["last_updated"], name="recipes_last_updated_idx"),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 2.2.10 on 2026-10-18 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0031_recipe_denormalized_fields")]
+
+    operations = [
+        migrations.AddField(
+            model_name="remotesettingsoutbox",
+            name="leased_until",
+            field=models.DateTimeField(blank=True, null=True),
+        )
+    ]
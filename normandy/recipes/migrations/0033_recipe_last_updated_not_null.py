@@ -0,0 +1,23 @@
+# Generated by Django 2.2.10 on 2026-10-18 19:50
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def fill_last_updated(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Recipe.objects.filter(last_updated=None).update(last_updated=django.utils.timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0032_remotesettingsoutbox_leased_until")]
+
+    operations = [
+        migrations.RunPython(fill_last_updated, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="recipe",
+            name="last_updated",
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+    ]
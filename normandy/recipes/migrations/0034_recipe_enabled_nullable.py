@@ -0,0 +1,30 @@
+# Generated by Django 2.2.10 on 2026-10-18 19:55
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def clear_enabled_without_state(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Recipe.objects.filter(
+        Q(approved_revision=None) | Q(approved_revision__enabled_state=None)
+    ).update(enabled=None)
+
+
+def set_enabled_without_state(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    Recipe.objects.filter(enabled=None).update(enabled=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("recipes", "0033_recipe_last_updated_not_null")]
+
+    operations = [
+        migrations.AlterField(
+            model_name="recipe",
+            name="enabled",
+            field=models.BooleanField(default=None, editable=False, null=True),
+        ),
+        migrations.RunPython(clear_enabled_without_state, set_enabled_without_state),
+    ]
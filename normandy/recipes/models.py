@@ -1,12 +1,16 @@
+import copy
 import json
 import logging
 from collections import defaultdict
+from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.db import models, transaction
+from django.db.models import Q
 from django.utils import timezone
 from django.utils.functional import cached_property
 
@@ -21,7 +25,8 @@ from normandy.recipes.exports import RemoteSettings
 from normandy.recipes.geolocation import get_country_code
 from normandy.recipes.fields import IdenticonSeedField
 from normandy.recipes.signing import Autographer
-from normandy.recipes.validators import JSONSchemaValidator, validate_json
+from normandy.recipes.utils import bucket_ranges, find_free_range, ranges_overlap
+from normandy.recipes.validators import get_schema_validator
 
 
 INFO_REQUESTING_RECIPE_SIGNATURES = "normandy.recipes.I001"
@@ -86,10 +91,84 @@ class Signature(models.Model):
 
 class RecipeQuerySet(models.QuerySet):
     def only_enabled(self):
-        return self.filter(approved_revision__enabled_state__enabled=True)
+        return self.filter(enabled=True)
 
     def only_disabled(self):
-        return self.exclude(approved_revision__enabled_state__enabled=True)
+        return self.exclude(enabled=True)
+
+    def with_argument_key(self, action_name, value, revision="latest_revision"):
+        """
+        Return the recipes whose latest (or approved) revision uses the named
+        action, and has `value` as its argument key.
+        """
+        stored_key = f"{revision}__stored_argument_key"
+        candidates = self.filter(
+            Q(**{stored_key: value}) | Q(**{f"{stored_key}__isnull": True}),
+            **{f"{revision}__action__name": action_name},
+        ).select_related(revision)
+        # Revisions saved before the key was stored are compared in Python.
+        return [recipe for recipe in candidates if getattr(recipe, revision).argument_key == value]
+
+    def update_signatures(self, batch_size=None):
+        """
+        Sign the enabled recipes in this queryset, requesting the signatures
+        for each batch of recipes from Autograph at once.
+
+        Each batch is saved in its own transaction, so that locks aren't held
+        for the whole signing run. Returns the list of processed recipes. If
+        Autograph isn't configured, their signatures are removed instead.
+        """
+        # Avoid circular import
+        from normandy.recipes.signals import on_commit_once, rebuild_signed_recipe_bundle
+
+        if batch_size is None:
+            batch_size = settings.AUTOGRAPH_SIGNING_BATCH_SIZE
+
+        recipes = list(self.only_enabled().select_related("approved_revision__action"))
+
+        try:
+            autographer = Autographer()
+        except ImproperlyConfigured:
+            recipe_ids = [recipe.id for recipe in recipes]
+            with transaction.atomic():
+                RemoteSettingsChange.record(recipe_ids)
+                Recipe.objects.filter(id__in=recipe_ids).update(signature=None)
+                SignedRecipeBundle.invalidate()
+                # Queryset updates don't send the signals that mark listings as changed
+                CollectionGeneration.increment(
+                    CollectionGeneration.ACTIONS, CollectionGeneration.RECIPES
+                )
+            for recipe in recipes:
+                recipe.signature = None
+            if recipes:
+                on_commit_once(rebuild_signed_recipe_bundle)
+            return recipes
+
+        for start in range(0, len(recipes), batch_size):
+            batch = recipes[start : start + batch_size]
+            recipe_ids = [recipe.id for recipe in batch]
+            logger.info(
+                f"Requesting signatures for {len(batch)} recipes from Autograph",
+                extra={"code": INFO_REQUESTING_RECIPE_SIGNATURES, "recipe_ids": recipe_ids},
+            )
+
+            signature_data = autographer.sign_data([recipe.canonical_json() for recipe in batch])
+            with transaction.atomic():
+                signatures = Signature.objects.bulk_create(
+                    Signature(**data) for data in signature_data
+                )
+                for recipe, signature in zip(batch, signatures):
+                    recipe.signature = signature
+                Recipe.objects.bulk_update(batch, ["signature"])
+                RemoteSettingsChange.record(recipe_ids)
+                SignedRecipeBundle.invalidate()
+                CollectionGeneration.increment(
+                    CollectionGeneration.ACTIONS, CollectionGeneration.RECIPES
+                )
+
+        if recipes:
+            on_commit_once(rebuild_signed_recipe_bundle)
+        return recipes
 
 
 class Recipe(DirtyFieldsMixin, models.Model):
@@ -107,8 +186,26 @@ class Recipe(DirtyFieldsMixin, models.Model):
         Signature, related_name="recipe", null=True, blank=True, on_delete=models.CASCADE
     )
 
+    # Copies of the approved revision's enabled state and of the latest
+    # revision's update time, so that recipes can be filtered and ordered
+    # without joining their revisions. They are set when the recipe or its
+    # revisions are saved. `enabled` is null if the recipe has no approved
+    # revision, or it was never enabled. Recipes that don't have a revision
+    # yet use the time they were created, so that the update time is never
+    # null, and can always be used as a cursor.
+    enabled = models.BooleanField(null=True, default=None, editable=False)
+    last_updated = models.DateTimeField(default=timezone.now, editable=False)
+
+    DENORMALIZED_FIELDS = ["enabled", "last_updated"]
+
     class Meta:
-        ordering = ["-approved_revision__enabled_state__enabled", "-latest_revision__updated"]
+        # Postgres sorts nulls first in descending order, so recipes that were
+        # never enabled come first, then enabled recipes, then disabled ones.
+        ordering = ["-enabled", "-last_updated"]
+        indexes = [
+            models.Index(fields=["enabled", "last_updated"], name="recipes_enabled_updated_idx"),
+            models.Index(fields=["last_updated"], name="recipes_last_updated_idx"),
+        ]
 
     class NotApproved(Exception):
         pass
@@ -137,6 +234,33 @@ class Recipe(DirtyFieldsMixin, models.Model):
         data = MinimalRecipeSerializer(self).data
         return CanonicalJSONRenderer().render(data)
 
+    def update_denormalized_fields(self):
+        """
+        Copy the enabled state and the update time from the revisions. The
+        copies are written to the database when the recipe is saved.
+        """
+        if self.approved_revision and self.approved_revision.enabled_state:
+            self.enabled = self.approved_revision.enabled_state.enabled
+        else:
+            self.enabled = None
+        if self.latest_revision:
+            self.last_updated = self.latest_revision.updated
+
+    @classmethod
+    def update_denormalized_fields_for_revision(cls, revision):
+        """
+        Update the copies kept by the recipes of a revision that was saved on
+        its own, without saving its recipe.
+        """
+        cls.objects.filter(latest_revision_id=revision.id).exclude(
+            last_updated=revision.updated
+        ).update(last_updated=revision.updated)
+
+        enabled = revision.enabled_state.enabled if revision.enabled_state else None
+        cls.objects.filter(approved_revision_id=revision.id).exclude(enabled=enabled).update(
+            enabled=enabled
+        )
+
     def update_signature(self):
         try:
             autographer = Autographer()
@@ -164,12 +288,12 @@ class Recipe(DirtyFieldsMixin, models.Model):
 
         if "arguments" in data:
             arguments = data.pop("arguments")
-            data["arguments_json"] = json.dumps(arguments)
+            data["arguments_json"] = arguments
         else:
             arguments = None
 
         if "filter_object" in data:
-            data["filter_object_json"] = json.dumps(data.pop("filter_object"))
+            data["filter_object_json"] = data.pop("filter_object")
 
         if revision:
             revisions = RecipeRevision.objects.filter(id=revision.id)
@@ -204,7 +328,7 @@ class Recipe(DirtyFieldsMixin, models.Model):
                 schema = revision.action.arguments_schema
 
             if schema is not None:
-                schema_validator = JSONSchemaValidator(schema)
+                schema_validator = get_schema_validator(schema)
                 schema_validator.validate(arguments)
 
         if not is_clean or force:
@@ -229,14 +353,21 @@ class Recipe(DirtyFieldsMixin, models.Model):
             for locale in locales:
                 self.latest_revision.locales.add(locale)
 
+            if channels or countries or locales:
+                self.latest_revision.update_computed_fields()
+
             self.save()
 
     @transaction.atomic
     def save(self, *args, **kwargs):
+        self.update_denormalized_fields()
+
+        # The denormalized fields follow changes to the revisions, and are
+        # saved with them, so they don't count as changes of their own.
         dirty_fields = {
             k: v
             for k, v in self.get_dirty_fields(check_relationship=True, verbose=True).items()
-            if v["saved"] != v["current"]
+            if v["saved"] != v["current"] and k not in self.DENORMALIZED_FIELDS
         }
 
         if dirty_fields:
@@ -279,9 +410,9 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
     # Recipe fields
     name = models.CharField(max_length=255)
     action = models.ForeignKey("Action", related_name="recipe_revisions", on_delete=models.CASCADE)
-    arguments_json = models.TextField(default="{}", validators=[validate_json])
+    arguments_json = JSONField(default=dict)
     extra_filter_expression = models.TextField(blank=False)
-    filter_object_json = models.TextField(validators=[validate_json], null=True)
+    filter_object_json = JSONField(null=True)
     channels = models.ManyToManyField(Channel)
     countries = models.ManyToManyField(Country)
     locales = models.ManyToManyField(Locale)
@@ -293,8 +424,39 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
     experimenter_slug = models.CharField(null=True, max_length=255, blank=True)
     extra_capabilities = ArrayField(models.CharField(max_length=255), default=list)
 
+    # Computed fields, refreshed whenever the revision is saved. A null value
+    # means the field has not been computed yet, and it will be calculated on
+    # access instead.
+    stored_filter_expression = models.TextField(null=True, editable=False)
+    stored_capabilities = ArrayField(models.CharField(max_length=255), null=True, editable=False)
+    stored_argument_key = models.TextField(null=True, editable=False)
+    stored_search_text = models.TextField(null=True, editable=False)
+
+    # The argument that identifies the recipes of each action, such as the
+    # slug of an experiment. It is stored so that it can be checked for
+    # uniqueness in the database.
+    ARGUMENT_KEYS = {
+        "preference-experiment": "slug",
+        "preference-rollout": "slug",
+        "preference-rollback": "rolloutSlug",
+        "show-heartbeat": "surveyId",
+        "opt-out-study": "name",
+    }
+
     class Meta:
         ordering = ("-created",)
+        indexes = [
+            GinIndex(fields=["stored_capabilities"], name="recipes_rev_stored_caps_gin"),
+            models.Index(fields=["action", "stored_argument_key"], name="recipes_rev_arg_key_idx"),
+            GinIndex(
+                fields=["stored_search_text"],
+                name="recipes_rev_search_trgm",
+                opclasses=["gin_trgm_ops"],
+            ),
+            # For cursor pagination
+            models.Index(fields=["created", "id"], name="recipes_rev_created_idx"),
+            models.Index(fields=["updated", "id"], name="recipes_rev_updated_idx"),
+        ]
 
     @property
     def data(self):
@@ -315,18 +477,31 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
 
     @property
     def filter_expression(self):
+        if self.stored_filter_expression is None:
+            return self.compute_filter_expression()
+        return self.stored_filter_expression
+
+    def compute_filter_expression(self):
         parts = []
 
-        if self.locales.count():
-            locales = ", ".join(["'{}'".format(l.code) for l in self.locales.all()])
+        # Many-to-many relations can't be used until the revision has been saved.
+        if self.id:
+            locales = list(self.locales.all())
+            countries = list(self.countries.all())
+            channels = list(self.channels.all())
+        else:
+            locales = countries = channels = []
+
+        if locales:
+            locales = ", ".join(["'{}'".format(l.code) for l in locales])
             parts.append("normandy.locale in [{}]".format(locales))
 
-        if self.countries.count():
-            countries = ", ".join(["'{}'".format(c.code) for c in self.countries.all()])
+        if countries:
+            countries = ", ".join(["'{}'".format(c.code) for c in countries])
             parts.append("normandy.country in [{}]".format(countries))
 
-        if self.channels.count():
-            channels = ", ".join(["'{}'".format(c.slug) for c in self.channels.all()])
+        if channels:
+            channels = ", ".join(["'{}'".format(c.slug) for c in channels])
             parts.append("normandy.channel in [{}]".format(channels))
 
         parts.extend(filter.to_jexl() for filter in self.filter_object)
@@ -338,27 +513,80 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
 
         return "({})".format(expression) if len(parts) > 1 else expression
 
+    def update_computed_fields(self):
+        """
+        Recalculate the computed fields and write them to the database.
+
+        This is needed after changing many-to-many relations, which doesn't
+        go through `save`.
+        """
+        self.stored_filter_expression = self.compute_filter_expression()
+        self.stored_capabilities = sorted(self.compute_capabilities())
+        self.stored_argument_key = self.compute_argument_key()
+        self.stored_search_text = self.compute_search_text()
+        RecipeRevision.objects.filter(id=self.id).update(
+            stored_filter_expression=self.stored_filter_expression,
+            stored_capabilities=self.stored_capabilities,
+            stored_argument_key=self.stored_argument_key,
+            stored_search_text=self.stored_search_text,
+        )
+
     @property
     def filter_object(self):
-        if self.filter_object_json is not None:
-            return [filters.from_data(obj) for obj in json.loads(self.filter_object_json)]
-        else:
-            return []
+        # The filters are memoized, since they are used several times while
+        # serializing a revision. Assigning new filter data invalidates them.
+        source, filter_object = self.__dict__.get("_filter_object", (None, None))
+        if filter_object is None or source is not self.filter_object_json:
+            source = self.filter_object_json
+            if source is not None:
+                filter_object = [filters.from_data(obj) for obj in source]
+            else:
+                filter_object = []
+            self.__dict__["_filter_object"] = (source, filter_object)
+        return filter_object
 
     @filter_object.setter
     def filter_object(self, value):
+        self.stored_filter_expression = None
+        self.stored_capabilities = None
         if value is None:
             self.filter_object_json = None
         else:
-            self.filter_object_json = json.dumps([filter.initial_data for filter in value])
+            self.filter_object_json = [filter.initial_data for filter in value]
 
     @property
     def arguments(self):
-        return json.loads(self.arguments_json)
+        # A copy, so that changing it doesn't change the revision behind its back
+        return copy.deepcopy(self.arguments_json)
 
     @arguments.setter
     def arguments(self, value):
-        self.arguments_json = json.dumps(value)
+        self.stored_argument_key = None
+        self.arguments_json = value
+
+    @property
+    def argument_key(self):
+        if self.stored_argument_key is None:
+            return self.compute_argument_key()
+        return self.stored_argument_key
+
+    def compute_argument_key(self):
+        """
+        Find the value of the argument that identifies this revision's recipe
+        for its action, or an empty string if the action has no such argument.
+        """
+        key = self.ARGUMENT_KEYS.get(self.action.name)
+        value = self.arguments.get(key) if key else None
+        return value if isinstance(value, str) else ""
+
+    def compute_search_text(self):
+        """
+        Build the text that is searched by the API: the name, the extra filter
+        expression and the arguments as JSON, one per line, in lower case.
+        It is indexed by trigrams, so that substrings of it are found quickly.
+        """
+        arguments = json.dumps(self.arguments_json, ensure_ascii=False)
+        return "\n".join([self.name, self.extra_filter_expression, arguments]).lower()
 
     @property
     def serializable_recipe(self):
@@ -387,9 +615,10 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
     @property
     def capabilities(self):
         """Calculates the set of capabilities required for this recipe."""
-        capabilities = set(self.extra_capabilities) | self.action.capabilities
-        for filter in self.filter_object:
-            capabilities.update(filter.capabilities)
+        if self.stored_capabilities is None:
+            capabilities = self.compute_capabilities()
+        else:
+            capabilities = set(self.stored_capabilities)
 
         # "capabilities-v1" is not a baseline capability. If all of the other
         # capabilities are baseline capabilities, don't add it to the recipe.
@@ -399,6 +628,19 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
 
         return capabilities
 
+    def compute_capabilities(self):
+        """
+        Calculates the capabilities required by the action and filters of this
+        revision.
+
+        This doesn't include "capabilities-v1", since whether that is needed
+        depends on the current baseline capabilities.
+        """
+        capabilities = set(self.extra_capabilities) | self.action.capabilities
+        for filter in self.filter_object:
+            capabilities.update(filter.capabilities)
+        return capabilities
+
     def uses_only_baseline_capabilities(self):
         return self.capabilities <= settings.BASELINE_CAPABILITIES
 
@@ -408,6 +650,10 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
         if not self.created:
             self.created = timezone.now()
         self.updated = timezone.now()
+        self.stored_filter_expression = self.compute_filter_expression()
+        self.stored_capabilities = sorted(self.compute_capabilities())
+        self.stored_argument_key = self.compute_argument_key()
+        self.stored_search_text = self.compute_search_text()
         super().save(*args, **kwargs)
 
     def request_approval(self, creator):
@@ -428,6 +674,9 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
         self.save()
 
         self.recipe.approved_revision.refresh_from_db()
+        if self.recipe.latest_revision_id == self.id:
+            # Saving bumped the update time, which the recipe keeps a copy of.
+            self.recipe.latest_revision.refresh_from_db()
         self.recipe.update_signature()
         self.recipe.save()
 
@@ -437,10 +686,11 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
             raise EnabledState.NotActionable("This revision is already enabled.")
 
         self._validate_preference_rollout_rollback_enabled_invariance()
+        BucketAllocation.validate_filters(self.filter_object, recipe=self.recipe)
 
         self._create_new_enabled_state(creator=user, enabled=True, carryover_from=carryover_from)
 
-        RemoteSettings().publish(self.recipe)
+        RemoteSettingsOutbox.enqueue([self.recipe.id])
 
     @transaction.atomic
     def disable(self, user):
@@ -449,7 +699,7 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
 
         self._create_new_enabled_state(creator=user, enabled=False)
 
-        RemoteSettings().unpublish(self.recipe)
+        RemoteSettingsOutbox.enqueue([self.recipe.id])
 
     def _validate_preference_rollout_rollback_enabled_invariance(self):
         """Raise ValidationError if you're trying to enable a preference-rollback
@@ -460,26 +710,20 @@ class RecipeRevision(DirtyFieldsMixin, models.Model):
         """
         if self.action.name == "preference-rollback":
             slug = self.arguments["rolloutSlug"]
-            rollout_recipes = Recipe.objects.filter(
-                approved_revision__action__name="preference-rollout",
-                approved_revision__enabled_state__enabled=True,
+            rollout_recipes = Recipe.objects.only_enabled().with_argument_key(
+                "preference-rollout", slug, revision="approved_revision"
             )
-            for recipe in rollout_recipes:
-                if recipe.approved_revision.arguments["slug"] == slug:
-                    raise ValidationError(
-                        f"Rollout recipe {recipe.approved_revision.name!r} is currently enabled"
-                    )
+            if rollout_recipes:
+                name = rollout_recipes[0].approved_revision.name
+                raise ValidationError(f"Rollout recipe {name!r} is currently enabled")
         elif self.action.name == "preference-rollout":
             slug = self.arguments["slug"]
-            rollback_recipes = Recipe.objects.filter(
-                approved_revision__action__name="preference-rollback",
-                approved_revision__enabled_state__enabled=True,
+            rollback_recipes = Recipe.objects.only_enabled().with_argument_key(
+                "preference-rollback", slug, revision="approved_revision"
             )
-            for recipe in rollback_recipes:
-                if recipe.approved_revision.arguments["rolloutSlug"] == slug:
-                    raise ValidationError(
-                        f"Rollback recipe {recipe.approved_revision.name!r} is currently enabled"
-                    )
+            if rollback_recipes:
+                name = rollback_recipes[0].approved_revision.name
+                raise ValidationError(f"Rollback recipe {name!r} is currently enabled")
 
 
 class EnabledState(models.Model):
@@ -518,6 +762,8 @@ class ApprovalRequest(models.Model):
 
     class Meta:
         ordering = ("id",)
+        # For cursor pagination
+        indexes = [models.Index(fields=["created", "id"], name="recipes_approval_created_idx")]
 
     class NotActionable(Exception):
         pass
@@ -596,7 +842,7 @@ class Action(DirtyFieldsMixin, models.Model):
     name = models.SlugField(max_length=255, unique=True)
     implementation = models.TextField(null=True)
     implementation_hash = models.CharField(max_length=71, editable=False, null=True)
-    arguments_schema_json = models.TextField(default="{}", validators=[validate_json])
+    arguments_schema_json = JSONField(default=dict)
     signature = models.OneToOneField(
         Signature, related_name="action", null=True, blank=True, on_delete=models.CASCADE
     )
@@ -616,11 +862,11 @@ class Action(DirtyFieldsMixin, models.Model):
 
     @property
     def arguments_schema(self):
-        return json.loads(self.arguments_schema_json)
+        return self.arguments_schema_json
 
     @arguments_schema.setter
     def arguments_schema(self, value):
-        self.arguments_schema_json = json.dumps(value)
+        self.arguments_schema_json = value
 
     @property
     def recipes_used_by(self):
@@ -713,7 +959,7 @@ class Action(DirtyFieldsMixin, models.Model):
         errors = default()
 
         # Check for any JSON Schema violations
-        schemaValidator = JSONSchemaValidator(self.arguments_schema)
+        schemaValidator = get_schema_validator(self.arguments_schema)
         for error in schemaValidator.iter_errors(arguments):
             current_level = errors
             path = list(error.path)
@@ -741,36 +987,33 @@ class Action(DirtyFieldsMixin, models.Model):
                 branch_values.add(branch["value"])
 
             # Experiment slugs should be unique.
-            experiment_recipes = Recipe.objects.filter(latest_revision__action=self)
+            experiment_recipes = Recipe.objects.all()
             if revision.recipe and revision.recipe.id:
                 experiment_recipes = experiment_recipes.exclude(id=revision.recipe.id)
-            existing_slugs = set(
-                r.latest_revision.arguments.get("slug") for r in experiment_recipes
-            )
-            if arguments.get("slug") in existing_slugs:
+            if experiment_recipes.with_argument_key(self.name, arguments.get("slug")):
                 msg = self.errors["duplicate_experiment_slug"]
                 errors["slug"] = msg
 
         elif self.name == "preference-rollout":
             # Rollout slugs should be unique
-            rollout_recipes = Recipe.objects.filter(latest_revision__action=self)
+            rollout_recipes = Recipe.objects.all()
             if revision.recipe and revision.recipe.id:
                 rollout_recipes = rollout_recipes.exclude(id=revision.recipe.id)
-            existing_slugs = set(r.latest_revision.arguments.get("slug") for r in rollout_recipes)
-            if arguments.get("slug") in existing_slugs:
+            if rollout_recipes.with_argument_key(self.name, arguments.get("slug")):
                 msg = self.errors["duplicate_rollout_slug"]
                 errors["slug"] = msg
 
         elif self.name == "preference-rollback":
             # Rollback slugs should match rollouts
-            rollouts = Recipe.objects.filter(latest_revision__action__name="preference-rollout")
-            rollout_slugs = set(r.latest_revision.arguments["slug"] for r in rollouts)
-            if arguments["rolloutSlug"] not in rollout_slugs:
+            rollouts = Recipe.objects.with_argument_key(
+                "preference-rollout", arguments["rolloutSlug"]
+            )
+            if not rollouts:
                 errors["slug"] = self.errors["rollout_slug_not_found"]
 
         elif self.name == "show-heartbeat":
             # Survey ID should be unique across all recipes
-            other_recipes = Recipe.objects.filter(latest_revision__action=self)
+            other_recipes = Recipe.objects.all()
             if revision.recipe and revision.recipe.id:
                 other_recipes = other_recipes.exclude(id=revision.recipe.id)
             # So it *could* be that a different recipe's *latest_revision*'s argument
@@ -778,24 +1021,409 @@ class Action(DirtyFieldsMixin, models.Model):
             # It's unlikely in the real-world that different revisions, within a recipe,
             # has different surveyIds *and* that any of these clash with an entirely
             # different recipe.
-            for recipe in other_recipes:
-                if recipe.latest_revision.arguments["surveyId"] == arguments["surveyId"]:
-                    errors["surveyId"] = self.errors["duplicate_survey_id"]
+            if other_recipes.with_argument_key(self.name, arguments["surveyId"]):
+                errors["surveyId"] = self.errors["duplicate_survey_id"]
 
         elif self.name == "opt-out-study":
             # Name should be unique across all recipes
-            other_recipes = Recipe.objects.filter(latest_revision__action=self)
+            other_recipes = Recipe.objects.all()
             if revision.recipe and revision.recipe.id:
                 other_recipes = other_recipes.exclude(id=revision.recipe.id)
-            for recipe in other_recipes:
-                if recipe.latest_revision.arguments["name"] == arguments["name"]:
-                    errors["name"] = self.errors["duplicate_study_name"]
+            if other_recipes.with_argument_key(self.name, arguments["name"]):
+                errors["name"] = self.errors["duplicate_study_name"]
 
         # Raise errors, if any
         if errors:
             raise serializers.ValidationError({"arguments": errors})
 
 
+class SignedRecipeBundle(models.Model):
+    """
+    The pre-rendered response of the signed recipe listing.
+
+    There is only ever one bundle. Its generation is incremented whenever a
+    recipe changes, and the rendered content is only current if it was built
+    from the latest generation with the current settings.
+    """
+
+    SINGLETON_ID = 1
+
+    generation = models.PositiveIntegerField(default=0)
+    built_generation = models.PositiveIntegerField(null=True)
+    settings_key = models.CharField(max_length=64, blank=True)
+    content = models.BinaryField(default=b"")
+    etag = models.CharField(max_length=64, blank=True)
+
+    @classmethod
+    def invalidate(cls, only_if_current=False):
+        """
+        Mark the bundle as stale. With `only_if_current`, a bundle that is
+        already stale isn't updated.
+        """
+        bundles = cls.objects.filter(id=cls.SINGLETON_ID)
+        if only_if_current:
+            bundles = bundles.filter(built_generation=models.F("generation"))
+        bundles.update(generation=models.F("generation") + 1)
+
+    def is_current(self, settings_key):
+        return self.built_generation == self.generation and self.settings_key == settings_key
+
+
+class CollectionGeneration(models.Model):
+    """
+    A counter for a collection of objects served by the API, incremented
+    whenever any of them changes.
+
+    It is a cheap version of the collection, used to validate cached
+    responses without rendering them again.
+    """
+
+    ACTIONS = "actions"
+    RECIPES = "recipes"
+
+    name = models.CharField(max_length=255, primary_key=True)
+    generation = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def get(cls, name):
+        generation = cls.objects.filter(name=name).values_list("generation", flat=True).first()
+        return generation or 0
+
+    @classmethod
+    def increment(cls, *names):
+        for name in names:
+            updated = cls.objects.filter(name=name).update(generation=models.F("generation") + 1)
+            if not updated:
+                cls.objects.get_or_create(name=name, defaults={"generation": 1})
+
+
+class RemoteSettingsChange(models.Model):
+    """
+    An entry in the journal of recipes that have changed since the last
+    successful sync with Remote Settings.
+
+    The recipe is not a foreign key, so that deleted recipes stay journaled
+    until their records are removed from Remote Settings.
+    """
+
+    recipe_id = models.IntegerField()
+    created = models.DateTimeField(default=timezone.now)
+
+    @classmethod
+    def record(cls, recipe_ids):
+        if not settings.REMOTE_SETTINGS_URL:
+            return  # no-op if Remote Settings is disabled.
+        cls.objects.bulk_create(cls(recipe_id=recipe_id) for recipe_id in recipe_ids)
+
+
+class RemoteSettingsSyncState(models.Model):
+    """
+    The state of Remote Settings as of the last successful sync.
+
+    There is only ever one sync state. ``last_modified`` is the timestamp of
+    the most recent change seen in the published collection, and is used to
+    only fetch records that changed since.
+    """
+
+    SINGLETON_ID = 1
+
+    last_modified = models.BigIntegerField(null=True)
+    synced = models.DateTimeField(null=True)
+
+    @classmethod
+    def get(cls):
+        state, _ = cls.objects.get_or_create(id=cls.SINGLETON_ID)
+        return state
+
+
+class RemoteSettingsOutbox(models.Model):
+    """
+    A recipe that must be published to or unpublished from Remote Settings.
+
+    Entries are written in the same transaction as the change that requires
+    them, and are processed later by the ``publish_remote_settings`` command,
+    so that enabling or disabling a recipe doesn't wait on Remote Settings.
+    """
+
+    recipe_id = models.IntegerField()
+    created = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True)
+    # Set while a worker is publishing the entry. If the worker dies, the
+    # entry is processed again once this has passed.
+    leased_until = models.DateTimeField(null=True, blank=True)
+
+    @classmethod
+    def enqueue(cls, recipe_ids):
+        if not settings.REMOTE_SETTINGS_URL:
+            return  # no-op if Remote Settings is disabled.
+        cls.objects.bulk_create(cls(recipe_id=recipe_id) for recipe_id in recipe_ids)
+
+    @classmethod
+    def claim(cls, now):
+        """
+        Lease the due entries that no other worker is processing, and return
+        them. The lease is taken in a short transaction of its own, so that
+        no locks are held while Remote Settings is contacted.
+        """
+        lease = now + timedelta(seconds=settings.REMOTE_SETTINGS_OUTBOX_LEASE)
+        with transaction.atomic():
+            entries = list(
+                cls.objects.filter(next_attempt__lte=now)
+                .filter(Q(leased_until=None) | Q(leased_until__lte=now))
+                .order_by("id")
+                .select_for_update(skip_locked=True)
+            )
+            for entry in entries:
+                entry.leased_until = lease
+            cls.objects.bulk_update(entries, ["leased_until"])
+        return entries
+
+    @classmethod
+    def process(cls, now=None):
+        """
+        Publish the changes of all of the due entries, and approve them once.
+
+        Several entries for the same recipe are coalesced, and the current
+        state of the recipe decides whether it is published or unpublished.
+        If publishing fails, the entries are retried later with an
+        exponential backoff. Returns the published and unpublished recipes.
+        """
+        if now is None:
+            now = timezone.now()
+
+        entries = cls.claim(now)
+        if not entries:
+            return [], []
+
+        recipe_ids = sorted({entry.recipe_id for entry in entries})
+        recipes = Recipe.objects.select_related("approved_revision").in_bulk(recipe_ids)
+        to_publish = []
+        to_unpublish = []
+        for recipe_id in recipe_ids:
+            recipe = recipes.get(recipe_id)
+            if recipe and recipe.approved_revision and recipe.approved_revision.enabled:
+                to_publish.append(recipe)
+            else:
+                to_unpublish.append(recipe or Recipe(id=recipe_id))
+
+        try:
+            RemoteSettings().publish_batch(publish=to_publish, unpublish=to_unpublish)
+        except Exception as e:
+            for entry in entries:
+                entry.attempts += 1
+                entry.next_attempt = now + cls.retry_backoff(entry.attempts)
+                entry.last_error = str(e)
+                entry.leased_until = None
+            cls.objects.bulk_update(
+                entries, ["attempts", "next_attempt", "last_error", "leased_until"]
+            )
+            raise
+
+        cls.objects.filter(id__in=[entry.id for entry in entries]).delete()
+        return to_publish, to_unpublish
+
+    @staticmethod
+    def retry_backoff(attempts):
+        backoff = settings.REMOTE_SETTINGS_OUTBOX_BACKOFF * 2 ** (attempts - 1)
+        return timedelta(seconds=min(backoff, settings.REMOTE_SETTINGS_OUTBOX_MAX_BACKOFF))
+
+
+class BucketAllocation(models.Model):
+    """
+    A range of buckets in a namespace used by a ``namespaceSample`` filter of
+    an enabled recipe.
+
+    Allocations are updated from the approved revision of a recipe whenever
+    the recipe is saved, so that finding free or overlapping ranges in a
+    namespace doesn't require parsing the filters of every revision.
+    """
+
+    recipe = models.ForeignKey(Recipe, related_name="bucket_allocations", on_delete=models.CASCADE)
+    revision = models.ForeignKey(
+        RecipeRevision, related_name="bucket_allocations", on_delete=models.CASCADE
+    )
+    namespace = models.CharField(max_length=255)
+    start = models.FloatField()
+    count = models.FloatField()
+
+    TOTAL_BUCKETS = filters.NamespaceSampleFilter.total
+
+    class Meta:
+        ordering = ("namespace", "start")
+        indexes = [models.Index(fields=["namespace", "start"], name="recipes_bucket_alloc_ns_idx")]
+
+    @property
+    def end(self):
+        return (self.start + self.count) % self.TOTAL_BUCKETS
+
+    def bucket_ranges(self):
+        return bucket_ranges(self.start, self.count, self.TOTAL_BUCKETS)
+
+    @staticmethod
+    def namespace_filters(filter_object):
+        return [f for f in filter_object if isinstance(f, filters.NamespaceSampleFilter)]
+
+    @classmethod
+    def update_for_recipe(cls, recipe):
+        """Update the allocations of a recipe to match its approved revision."""
+        revision = recipe.approved_revision
+        wanted = []
+        if revision is not None and revision.enabled:
+            wanted = [
+                (
+                    revision.id,
+                    f.initial_data["namespace"],
+                    float(f.initial_data["start"]),
+                    float(f.initial_data["count"]),
+                )
+                for f in cls.namespace_filters(revision.filter_object)
+            ]
+
+        existing = cls.objects.filter(recipe_id=recipe.id)
+        current = [(a.revision_id, a.namespace, a.start, a.count) for a in existing]
+        if sorted(wanted) == sorted(current):
+            return
+
+        existing.delete()
+        cls.objects.bulk_create(
+            cls(recipe_id=recipe.id, revision_id=rev_id, namespace=ns, start=start, count=count)
+            for rev_id, ns, start, count in wanted
+        )
+
+    @classmethod
+    def overlapping(cls, namespace, ranges, exclude_recipe=None):
+        """Find the allocations in a namespace that overlap any of `ranges`."""
+        allocations = cls.objects.filter(namespace=namespace).select_related("revision")
+        if exclude_recipe is not None and exclude_recipe.id is not None:
+            allocations = allocations.exclude(recipe_id=exclude_recipe.id)
+        return [a for a in allocations if ranges_overlap(ranges, a.bucket_ranges())]
+
+    @classmethod
+    def first_free_range(cls, namespace, count):
+        """
+        Find the first bucket of a free range of `count` buckets in a
+        namespace, or None if there is no such range.
+        """
+        ranges = [r for a in cls.objects.filter(namespace=namespace) for r in a.bucket_ranges()]
+        return find_free_range(ranges, count, cls.TOTAL_BUCKETS)
+
+    @classmethod
+    def validate_filters(cls, filter_object, recipe=None):
+        """
+        Raise ValidationError if any ``namespaceSample`` filter in
+        `filter_object` overlaps an allocation of another enabled recipe.
+        """
+        errors = []
+        for f in cls.namespace_filters(filter_object):
+            namespace = f.initial_data["namespace"]
+            for allocation in cls.overlapping(namespace, f.bucket_ranges(), recipe):
+                errors.append(
+                    f"Buckets {allocation.start:g} to {allocation.end:g} of namespace "
+                    f"{namespace!r} are already used by recipe {allocation.revision.name!r}"
+                )
+        if errors:
+            raise ValidationError(errors)
+
+
+class TargetingKey(models.Model):
+    """
+    A value of a client attribute that the approved revision of an enabled
+    recipe can match.
+
+    A recipe with no keys for an attribute can match any value of it. Keys
+    are updated from the approved revision of a recipe whenever the recipe
+    is saved, and are used to select the recipes that could match a client
+    without evaluating their filter expressions.
+    """
+
+    CHANNEL = "channel"
+    COUNTRY = "country"
+    LOCALE = "locale"
+    PLATFORM = "platform"
+    VERSION = "version"
+    ATTRIBUTES = (CHANNEL, COUNTRY, LOCALE, PLATFORM, VERSION)
+
+    # Stored when the filters of a revision can't be satisfied by any value
+    # of an attribute. Clients never send an empty value, so it never matches.
+    NO_MATCH = ""
+
+    recipe = models.ForeignKey(Recipe, related_name="targeting_keys", on_delete=models.CASCADE)
+    revision = models.ForeignKey(
+        RecipeRevision, related_name="targeting_keys", on_delete=models.CASCADE
+    )
+    attribute = models.CharField(max_length=255)
+    value = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ("attribute", "value")
+        indexes = [models.Index(fields=["attribute", "value"], name="recipes_targeting_key_idx")]
+
+    @classmethod
+    def values_for_revision(cls, revision):
+        """
+        Map each attribute restricted by a revision to the set of values that
+        can match it. Filters on the same attribute are combined, since all
+        of them must match.
+        """
+        restrictions = [
+            {cls.CHANNEL: {c.slug for c in revision.channels.all()}},
+            {cls.COUNTRY: {c.code for c in revision.countries.all()}},
+            {cls.LOCALE: {locale.code for locale in revision.locales.all()}},
+        ]
+        restrictions.extend(f.targeting_values() for f in revision.filter_object)
+
+        values = {}
+        for restriction in restrictions:
+            for attribute, allowed in restriction.items():
+                if not allowed:
+                    continue
+                if attribute in values:
+                    values[attribute] &= allowed
+                else:
+                    values[attribute] = set(allowed)
+        return values
+
+    @classmethod
+    def update_for_recipe(cls, recipe):
+        """Update the keys of a recipe to match its approved revision."""
+        revision = recipe.approved_revision
+        wanted = []
+        if revision is not None and revision.enabled:
+            for attribute, values in cls.values_for_revision(revision).items():
+                for value in values or {cls.NO_MATCH}:
+                    wanted.append((revision.id, attribute, value))
+
+        existing = cls.objects.filter(recipe_id=recipe.id)
+        current = [(k.revision_id, k.attribute, k.value) for k in existing]
+        if sorted(wanted) == sorted(current):
+            return
+
+        existing.delete()
+        cls.objects.bulk_create(
+            cls(recipe_id=recipe.id, revision_id=rev_id, attribute=attribute, value=value)
+            for rev_id, attribute, value in wanted
+        )
+
+    @classmethod
+    def filter_recipes(cls, recipes, client_values):
+        """
+        Exclude the recipes from a queryset that can't match a client.
+
+        :param recipes: A queryset of recipes
+        :param client_values: A dict mapping attributes to the client's value
+            for them. Attributes that are missing or empty aren't checked.
+        """
+        for attribute, value in client_values.items():
+            if not value:
+                continue
+            restricted = cls.objects.filter(attribute=attribute).values("recipe_id")
+            matching = cls.objects.filter(attribute=attribute, value=value).values("recipe_id")
+            recipes = recipes.filter(~Q(id__in=restricted) | Q(id__in=matching))
+        return recipes
+
+
 class Client(object):
     """A client attempting to fetch a set of recipes."""
 
@@ -1,3 +1,5 @@
+import json
+
 import graphene
 
 from graphene_django.types import DjangoObjectType
@@ -15,7 +17,22 @@ from normandy.recipes.models import (
 )
 
 
+def json_text_field(name):
+    """
+    A field that serves a JSON model field as JSON text. These fields used to
+    be stored as text, and are still served as strings to keep the schema.
+    """
+
+    def resolve(instance, info):
+        value = getattr(instance, name)
+        return None if value is None else json.dumps(value)
+
+    return graphene.Field(graphene.String, resolver=resolve)
+
+
 class ActionType(DjangoObjectType):
+    arguments_schema_json = json_text_field("arguments_schema_json")
+
     class Meta:
         model = Action
 
@@ -51,6 +68,9 @@ class RecipeType(DjangoObjectType):
 
 
 class RecipeRevisionType(DjangoObjectType):
+    arguments_json = json_text_field("arguments_json")
+    filter_object_json = json_text_field("filter_object_json")
+
     class Meta:
         model = RecipeRevision
 
@@ -0,0 +1,129 @@
+import logging
+import weakref
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from normandy.recipes.bundles import build_signed_recipe_bundle
+from normandy.recipes.models import (
+    Action,
+    ApprovalRequest,
+    BucketAllocation,
+    Channel,
+    CollectionGeneration,
+    Country,
+    EnabledState,
+    Locale,
+    Recipe,
+    RecipeRevision,
+    RemoteSettingsChange,
+    Signature,
+    SignedRecipeBundle,
+    TargetingKey,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed_handler(sender, instance, **kwargs):
+    RemoteSettingsChange.record([instance.id])
+    invalidate_signed_recipe_bundle()
+
+
+# Recipes are signed and listed with the name and implementation of their action
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+def action_changed_handler(sender, instance, **kwargs):
+    invalidate_signed_recipe_bundle()
+
+
+@receiver(post_save, sender=RecipeRevision)
+def revision_saved_handler(sender, instance, **kwargs):
+    # Revisions can be saved without their recipe, which keeps copies of them
+    Recipe.update_denormalized_fields_for_revision(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def update_bucket_allocations_handler(sender, instance, **kwargs):
+    BucketAllocation.update_for_recipe(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def update_targeting_keys_handler(sender, instance, **kwargs):
+    TargetingKey.update_for_recipe(instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeRevision)
+@receiver(post_delete, sender=RecipeRevision)
+@receiver(post_save, sender=EnabledState)
+@receiver(post_save, sender=ApprovalRequest)
+@receiver(post_delete, sender=ApprovalRequest)
+@receiver(post_save, sender=Channel)
+@receiver(post_save, sender=Country)
+@receiver(post_save, sender=Locale)
+@receiver(m2m_changed, sender=RecipeRevision.channels.through)
+@receiver(m2m_changed, sender=RecipeRevision.countries.through)
+@receiver(m2m_changed, sender=RecipeRevision.locales.through)
+def recipes_generation_handler(sender, **kwargs):
+    CollectionGeneration.increment(CollectionGeneration.RECIPES)
+
+
+# Recipes are rendered with their action, and both are rendered with their signature
+@receiver(post_save, sender=Action)
+@receiver(post_delete, sender=Action)
+@receiver(post_save, sender=Signature)
+@receiver(post_delete, sender=Signature)
+def actions_generation_handler(sender, **kwargs):
+    CollectionGeneration.increment(CollectionGeneration.ACTIONS, CollectionGeneration.RECIPES)
+
+
+def invalidate_signed_recipe_bundle():
+    # Recipes are often saved several times in one transaction. The bundle is
+    # invalidated, and rebuilt after the commit, once for all of them, unless
+    # it was rebuilt in between.
+    if on_commit_once(rebuild_signed_recipe_bundle):
+        SignedRecipeBundle.invalidate()
+    else:
+        SignedRecipeBundle.invalidate(only_if_current=True)
+
+
+def on_commit_once(func):
+    """
+    Register `func` to be called when the current transaction is committed,
+    unless it already is. Returns whether it was registered.
+
+    Only a weak reference to each registered callback is kept on the
+    connection. Callbacks are dropped, and so freed, when their transaction
+    is rolled back, so `func` is registered again by the next transaction.
+    """
+    connection = transaction.get_connection()
+    if not hasattr(connection, "pending_on_commit"):
+        connection.pending_on_commit = {}
+    pending = connection.pending_on_commit
+
+    registered = pending.get(func)
+    if registered is not None and registered() is not None:
+        return False
+
+    def callback():
+        pending.pop(func, None)
+        func()
+
+    pending[func] = weakref.ref(callback)
+    transaction.on_commit(callback)
+    return True
+
+
+def rebuild_signed_recipe_bundle():
+    # The change that triggered this has already been committed, so a failure
+    # here shouldn't fail the request. The bundle will be rebuilt on demand.
+    try:
+        build_signed_recipe_bundle()
+    except Exception:
+        logger.exception("Failed to rebuild the signed recipe bundle")
@@ -2,9 +2,16 @@ import base64
 import binascii
 import hashlib
 import logging
+import os
 import re
-from datetime import datetime
-
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import markus
 import pytz
 import requests
 import ecdsa.util
@@ -19,14 +26,20 @@ from requests_hawk import HawkAuth
 from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
 from django.utils import timezone
 from django.utils.functional import cached_property
 
 
 INFO_RECEIVED_SIGNATURES = "normandy.autograph.I001"
+INFO_VERIFIED_SIGNATURES = "normandy.autograph.I002"
+
+# Below this many signatures, starting worker processes costs more than it saves.
+MIN_PARALLEL_VERIFICATIONS = 50
 
 
 logger = logging.getLogger(__name__)
+metrics = markus.get_metrics("normandy.signing.verify")
 
 
 class Autographer(object):
@@ -104,10 +117,17 @@ def verify_signature_x5u(data, signature, x5u):
     If the signature is valid, returns True. If the signature is invalid, raise
     an exception explaining why.
     """
+    return verify_signature_pubkey(data, signature, get_x5u_public_key(x5u))
+
+
+def get_x5u_public_key(x5u):
+    """
+    Verify the certificate chain at a URL, and return the base64 encoded
+    public key of the certificate that signs content.
+    """
     cert = verify_x5u(x5u)
     encoded = der_encode(cert["tbsCertificate"]["subjectPublicKeyInfo"])
-    cert_b64 = base64.b64encode(encoded).decode()
-    return verify_signature_pubkey(data, signature, cert_b64)
+    return base64.b64encode(encoded).decode()
 
 
 def verify_signature_pubkey(data, signature, pubkey):
@@ -153,6 +173,100 @@ def verify_signature_pubkey(data, signature, pubkey):
     return True
 
 
+def _check_signature(args):
+    """
+    Verify a single signature, returning the problem instead of raising it.
+    This runs in worker processes, so it must be a module level function.
+    """
+    data, signature, pubkey = args
+    try:
+        verify_signature_pubkey(data, signature, pubkey)
+    except BadSignature as exc:
+        return exc
+    return None
+
+
+class SignatureVerifier(object):
+    """
+    Verifies many signatures at once.
+
+    Each distinct x5u certificate chain is fetched and validated only once.
+    The signatures are checked in the current process, unless more than one
+    process is requested, in which case large batches are checked across a
+    pool of processes. The time spent in each phase is recorded in `timings`.
+    """
+
+    def __init__(self, processes=None):
+        if processes is None:
+            processes = settings.SIGNATURE_VERIFICATION_PROCESSES
+        self.processes = processes or os.cpu_count() or 1
+        self.timings = {}
+
+    @contextmanager
+    def timed(self, phase):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[phase] = self.timings.get(phase, 0) + time.monotonic() - start
+
+    def verify(self, items):
+        """
+        Verify a list of `(data, signature, x5u, public_key)` tuples. If `x5u`
+        is set it is used to find the public key, otherwise `public_key` is.
+
+        Returns a list with an entry for each item: None if the signature is
+        valid, or an exception explaining why it could not be verified.
+        """
+        results = [None] * len(items)
+
+        with self.timed("certificates"):
+            pubkeys = {}
+            for x5u in {item[2] for item in items if item[2]}:
+                try:
+                    pubkeys[x5u] = get_x5u_public_key(x5u)
+                except (BadCertificate, requests.RequestException) as exc:
+                    pubkeys[x5u] = exc
+
+        indexes = []
+        checks = []
+        for index, (data, signature, x5u, pubkey) in enumerate(items):
+            if x5u:
+                pubkey = pubkeys[x5u]
+            if isinstance(pubkey, Exception):
+                results[index] = pubkey
+            else:
+                indexes.append(index)
+                checks.append((data, signature, pubkey))
+
+        with self.timed("signatures"):
+            if self.processes > 1 and len(checks) >= MIN_PARALLEL_VERIFICATIONS:
+                chunksize = max(1, len(checks) // (self.processes * 4))
+                # Forked workers must not share the database connections
+                connections.close_all()
+                with ProcessPoolExecutor(max_workers=self.processes) as executor:
+                    outcomes = list(executor.map(_check_signature, checks, chunksize=chunksize))
+            else:
+                outcomes = [_check_signature(check) for check in checks]
+
+        for index, outcome in zip(indexes, outcomes):
+            results[index] = outcome
+
+        return results
+
+    def report(self, kind, count):
+        """Log and send metrics for the time spent in each phase."""
+        for phase, seconds in self.timings.items():
+            metrics.timing(phase, value=seconds * 1000, tags=[f"kind:{kind}"])
+        logger.info(
+            f"Verified {count} {kind} signatures",
+            extra={
+                "code": INFO_VERIFIED_SIGNATURES,
+                "timings": {phase: round(seconds, 3) for phase, seconds in self.timings.items()},
+            },
+        )
+
+
 class BadSignature(Exception):
     detail = "Unknown signature problem"
 
@@ -215,8 +329,23 @@ def verify_x5u(url, expire_early=None):
         if settings.X5U_CACHE_TIME:
             cache.set(cache_key, pem, settings.X5U_CACHE_TIME)
 
+    # Validation depends on these settings as well as the chain itself.
+    chain_key = (
+        url,
+        sha256(pem.encode()).hexdigest(),
+        expire_early,
+        settings.CERTIFICATES_CHECK_VALIDITY,
+        settings.CERTIFICATES_EXPECTED_ROOT_HASH,
+        settings.CERTIFICATES_EXPECTED_SUBJECT_CN,
+    )
+    if settings.X5U_CACHE_TIME:
+        signing_cert = validated_chains.get(chain_key)
+        if signing_cert is not None:
+            return signing_cert
+
     der_encoded_certs = extract_certs_from_pem(pem)
     decoded_certs = [parse_cert_from_der(der) for der in der_encoded_certs]
+    not_afters = []
 
     if settings.CERTIFICATES_CHECK_VALIDITY:
         for cert in decoded_certs:
@@ -229,6 +358,7 @@ def verify_x5u(url, expire_early=None):
             except KeyError as e:
                 raise BadCertificate(f"Certificate does not have expected shape: KeyError {e}")
             check_validity(not_before, not_after, expire_early)
+            not_afters.append(not_after)
 
     # If an root hash has been configured, check that the root certificate in
     # the chain matches the expected value.
@@ -264,9 +394,61 @@ def verify_x5u(url, expire_early=None):
         if common_name != expected:
             raise CertificateHasWrongSubject(expected=expected, actual=common_name)
 
+    if settings.X5U_CACHE_TIME:
+        # Don't keep the result past the point where the chain would stop
+        # passing validation.
+        expires = utcnow() + timedelta(seconds=settings.X5U_CACHE_TIME)
+        if not_afters:
+            expires = min(expires, min(not_afters) - (expire_early or timedelta(0)))
+        validated_chains.set(chain_key, decoded_certs[0], expires)
+
     return decoded_certs[0]
 
 
+def utcnow():
+    return datetime.utcnow().replace(tzinfo=pytz.utc)
+
+
+class ValidatedChainCache(object):
+    """
+    An in-process LRU cache of certificate chains that passed validation, so
+    that verifying against the same chain again doesn't need to parse it.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= utcnow():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires):
+        if expires <= utcnow():
+            return
+        with self.lock:
+            self.entries[key] = (expires, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+validated_chains = ValidatedChainCache(max_size=64)
+
+
 def check_validity(not_before, not_after, expire_early):
     """
     Check validity dates.
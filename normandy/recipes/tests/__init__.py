@@ -296,7 +296,7 @@ class RecipeRevisionFactory(factory.DjangoModelFactory):
             StableSampleFilterFactory(),
             BucketSampleFilterFactory(),
         ]
-        return json.dumps(filters)
+        return filters
 
     @factory.post_generation
     def arguments(revision, create, extracted=None, **kwargs):
@@ -1,17 +1,24 @@
 import hashlib
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.db import connection
 from django.test.utils import CaptureQueriesContext
 
 import pytest
+from markus import INCR
+from markus.testing import MetricsMock
 from rest_framework.reverse import reverse
 
 from normandy.base.tests import UserFactory, Whatever
 from normandy.base.utils import aware_datetime
+from normandy.recipes.api.v1.views import RecipeViewSet
+from normandy.recipes.models import RecipeRevision
 from normandy.recipes.tests import (
     ActionFactory,
     ApprovalRequestFactory,
+    ChannelFactory,
+    CountryFactory,
     RecipeFactory,
     RecipeRevisionFactory,
 )
@@ -85,6 +92,23 @@ class TestActionAPI(object):
         assert res.status_code == 200
         assert "Cookies" not in res
 
+    def test_list_view_answers_conditional_requests(self, api_client):
+        action = ActionFactory()
+        res = api_client.get("/api/v1/action/")
+        assert res.status_code == 200
+        etag = res["ETag"]
+
+        res = api_client.get("/api/v1/action/", HTTP_IF_NONE_MATCH=etag)
+        assert res.status_code == 304
+        assert res["ETag"] == etag
+        assert "max-age=" in res["Cache-Control"]
+
+        action.arguments_schema = {"type": "object", "required": []}
+        action.save()
+        res = api_client.get("/api/v1/action/", HTTP_IF_NONE_MATCH=etag)
+        assert res.status_code == 200
+        assert res["ETag"] != etag
+
     def test_detail_sets_no_cookies(self, api_client):
         action = ActionFactory()
         res = api_client.get("/api/v1/action/{name}/".format(name=action.name))
@@ -208,6 +232,62 @@ class TestRecipeAPI(object):
             assert res.status_code == 200
             assert "Cookies" not in res
 
+        def test_list_is_streamed(self, api_client, mocker):
+            mocker.patch.object(RecipeViewSet, "stream_chunk_size", 2)
+            recipes = RecipeFactory.create_batch(5)
+
+            res = api_client.get("/api/v1/recipe/")
+            assert res.status_code == 200
+            assert res.streaming
+            assert sorted(r["id"] for r in res.data) == sorted(r.id for r in recipes)
+
+            res = api_client.get("/api/v1/recipe/", HTTP_ACCEPT="text/html")
+            assert res.status_code == 200
+            assert not res.streaming
+
+        def test_list_view_answers_conditional_requests(self, api_client):
+            recipe = RecipeFactory()
+            res = api_client.get("/api/v1/recipe/")
+            assert res.status_code == 200
+            etag = res["ETag"]
+
+            res = api_client.get("/api/v1/recipe/", HTTP_IF_NONE_MATCH=etag)
+            assert res.status_code == 304
+            assert res["ETag"] == etag
+
+            res = api_client.get("/api/v1/recipe/?enabled=1", HTTP_IF_NONE_MATCH=etag)
+            assert res.status_code == 200
+
+            recipe.revise(name="changed")
+            res = api_client.get("/api/v1/recipe/", HTTP_IF_NONE_MATCH=etag)
+            assert res.status_code == 200
+            assert res["ETag"] != etag
+
+        def test_list_is_cached_on_the_server(self, api_client, settings):
+            settings.API_RESPONSE_CACHE_ENABLED = True
+            cache.clear()
+            recipe = RecipeFactory(name="original")
+
+            with MetricsMock() as mm:
+                res = api_client.get("/api/v1/recipe/")
+                assert res.status_code == 200
+                # Streamed responses are stored once they have been sent
+                assert res.data[0]["name"] == "original"
+                assert mm.has_record(INCR, stat="normandy.api_response_cache.miss")
+
+                queries = CaptureQueriesContext(connection)
+                with queries:
+                    res = api_client.get("/api/v1/recipe/")
+                assert res.status_code == 200
+                assert res.data[0]["name"] == "original"
+                assert mm.has_record(INCR, stat="normandy.api_response_cache.hit")
+                # Only the generation of the recipes is read
+                assert len(queries) == 1
+
+            recipe.revise(name="changed")
+            res = api_client.get("/api/v1/recipe/")
+            assert res.data[0]["name"] == "changed"
+
     @pytest.mark.django_db
     class TestDetail(object):
         def test_it_works(self, api_client):
@@ -368,6 +448,27 @@ class TestRecipeAPI(object):
             assert "max-age=" in res["Cache-Control"]
             assert "public" in res["Cache-Control"]
 
+        def test_signed_listing_is_served_from_bundle(self, api_client, settings):
+            r1 = RecipeFactory(approver=UserFactory(), signed=True)
+            settings.BASELINE_CAPABILITIES |= r1.latest_revision.capabilities
+
+            res = api_client.get("/api/v1/recipe/signed/")
+            assert res.status_code == 200
+            assert res["Content-Type"] == "application/json"
+            etag = res["ETag"]
+
+            res = api_client.get("/api/v1/recipe/signed/")
+            assert res["ETag"] == etag
+
+            res = api_client.get("/api/v1/recipe/signed/", HTTP_IF_NONE_MATCH=etag)
+            assert res.status_code == 304
+
+            r2 = RecipeFactory(approver=UserFactory(), signed=True)
+            settings.BASELINE_CAPABILITIES |= r2.latest_revision.capabilities
+            res = api_client.get("/api/v1/recipe/signed/")
+            assert res["ETag"] != etag
+            assert len(res.data) == 2
+
         def test_signed_only_lists_signed_recipes(self, api_client, settings):
             r1 = RecipeFactory(approver=UserFactory(), signed=True)
             r2 = RecipeFactory(approver=UserFactory(), signed=True)
@@ -463,6 +564,91 @@ class TestRecipeAPI(object):
             assert len(res.data) == 1
             assert res.data[0]["recipe"]["id"] == baseline_recipe.id
 
+        def test_baseline_filter_handles_unstored_capabilities(self, settings, api_client):
+            settings.BASELINE_CAPABILITIES = {"a"}
+            baseline_recipe = RecipeFactory(
+                signed=True,
+                approver=UserFactory(),
+                enabler=UserFactory(),
+                extra_capabilities=["a"],
+            )
+            RecipeFactory(
+                signed=True,
+                approver=UserFactory(),
+                enabler=UserFactory(),
+                extra_capabilities=["a", "b"],
+            )
+            settings.BASELINE_CAPABILITIES |= baseline_recipe.approved_revision.capabilities
+            RecipeRevision.objects.update(stored_capabilities=None)
+
+            res = api_client.get("/api/v1/recipe/signed/?only_baseline_capabilities=true")
+            assert res.status_code == 200
+            assert len(res.data) == 1
+            assert res.data[0]["recipe"]["id"] == baseline_recipe.id
+
+    @pytest.mark.django_db
+    class TestSignedTargeted(object):
+        def create_recipe(self, settings, filter_object_json):
+            recipe = RecipeFactory(
+                filter_object_json=filter_object_json,
+                approver=UserFactory(),
+                enabler=UserFactory(),
+                signed=True,
+            )
+            settings.BASELINE_CAPABILITIES |= recipe.approved_revision.capabilities
+            return recipe
+
+        def test_it_only_lists_recipes_that_could_match(self, api_client, settings):
+            ChannelFactory(slug="beta")
+            ChannelFactory(slug="release")
+            everyone = self.create_recipe(settings, [])
+            beta = self.create_recipe(settings, [{"type": "channel", "channels": ["beta"]}])
+            release_72 = self.create_recipe(
+                settings,
+                [
+                    {"type": "channel", "channels": ["release"]},
+                    {"type": "version", "versions": [72]},
+                ],
+            )
+
+            res = api_client.get("/api/v1/recipe/signed/targeted/?channel=release&country=")
+            assert res.status_code == 200
+            assert {r["recipe"]["id"] for r in res.data} == {everyone.id, release_72.id}
+
+            res = api_client.get(
+                "/api/v1/recipe/signed/targeted/?channel=release&version=73.0.1&country="
+            )
+            assert res.status_code == 200
+            assert [r["recipe"]["id"] for r in res.data] == [everyone.id]
+
+            res = api_client.get("/api/v1/recipe/signed/targeted/?country=")
+            assert res.status_code == 200
+            assert {r["recipe"]["id"] for r in res.data} == {everyone.id, beta.id, release_72.id}
+
+        def test_it_is_cacheable_with_a_country(self, api_client, settings):
+            CountryFactory(code="US")
+            us = self.create_recipe(settings, [{"type": "country", "countries": ["US"]}])
+
+            res = api_client.get("/api/v1/recipe/signed/targeted/?country=US")
+            assert res.status_code == 200
+            assert [r["recipe"]["id"] for r in res.data] == [us.id]
+            assert "max-age=" in res["Cache-Control"]
+            assert "public" in res["Cache-Control"]
+
+        def test_it_uses_the_geolocated_country(self, api_client, settings):
+            CountryFactory(code="US")
+            self.create_recipe(settings, [{"type": "country", "countries": ["US"]}])
+
+            with patch("normandy.recipes.models.get_country_code") as get_country_code:
+                get_country_code.return_value = "DE"
+                res = api_client.get("/api/v1/recipe/signed/targeted/")
+
+            assert res.status_code == 200
+            assert res.data == []
+            assert "no-cache" in res["Cache-Control"]
+            assert "no-store" in res["Cache-Control"]
+            assert "public" not in res["Cache-Control"]
+
 
 @pytest.mark.django_db
 class TestRecipeRevisionAPI(object):
@@ -528,6 +714,7 @@ class TestClassifyClient(object):
         ("/api/v1/action/signed/", ActionFactory),
         ("/api/v1/recipe/", RecipeFactory),
         ("/api/v1/recipe/signed/", RecipeFactory),
+        ("/api/v1/recipe/signed/targeted/?channel=release&country=US", RecipeFactory),
         ("/api/v1/recipe_revision/", RecipeRevisionFactory),
         ("/api/v1/approval_request/", ApprovalRequestFactory),
     ],
@@ -542,5 +729,27 @@ def test_apis_make_a_reasonable_number_of_db_queries(client, endpoint, Factory):
     with queries:
         res = client.get(endpoint)
         assert res.status_code == 200
+        # Read the content, so that queries made while it is sent are counted
+        res.content
     # Anything under 100 isn't doing one query per recipe.
     assert len(queries) < 100
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "endpoint,max_queries",
+    [
+        ("/api/v1/recipe/", 7),
+        ("/api/v1/recipe/signed/", 11),
+        ("/api/v1/recipe/signed/?enabled=1", 7),
+    ],
+)
+def test_recipe_apis_stay_within_their_query_budget(client, query_budget, endpoint, max_queries):
+    for _ in range(20):
+        RecipeFactory(approver=UserFactory(), enabler=UserFactory(), signed=True)
+
+    with query_budget(max_queries=max_queries):
+        res = client.get(endpoint)
+        assert res.status_code == 200
+        # Read the content, so that queries made while it is sent are counted
+        res.content
@@ -12,6 +12,7 @@ from pathlib import Path
 from normandy.base.api.permissions import AdminEnabledOrReadOnly
 from normandy.base.tests import UserFactory, Whatever
 from normandy.base.utils import canonical_json_dumps
+from normandy.recipes.api.v3.views import CreatedCursorPagination, RecipeCursorPagination
 from normandy.recipes.models import ApprovalRequest, Recipe, RecipeRevision
 from normandy.recipes.tests import (
     ActionFactory,
@@ -25,6 +26,18 @@ from normandy.recipes.tests import (
 )
 
 
+def get_cursor_pages(client, url):
+    """Follow the cursors from `url`, and return the IDs in each page."""
+    pages = []
+    while url:
+        res = client.get(url)
+        assert res.status_code == 200
+        assert "count" not in res.data
+        pages.append([obj["id"] for obj in res.data["results"]])
+        url = res.data["next"]
+    return pages
+
+
 @pytest.mark.django_db
 class TestActionAPI(object):
     def test_it_works(self, api_client):
@@ -172,6 +185,27 @@ class TestRecipeAPI(object):
             assert res.data["count"] == 1
             assert res.data["results"][0]["id"] == recipe1.id
 
+        def test_cursor_pagination(self, api_client, mocker):
+            mocker.patch.object(RecipeCursorPagination, "page_size", 2)
+            recipes = RecipeFactory.create_batch(5)
+            # The oldest recipe was updated most recently
+            recipes[0].revise(name="changed")
+
+            pages = get_cursor_pages(api_client, "/api/v3/recipe/?pagination=cursor")
+            expected = [recipes[0].id] + [r.id for r in reversed(recipes[1:])]
+            assert pages == [expected[0:2], expected[2:4], expected[4:]]
+
+            res = api_client.get("/api/v3/recipe/")
+            assert res.data["count"] == 5
+
+        def test_cursor_pagination_includes_recipes_without_revisions(self, api_client, mocker):
+            mocker.patch.object(RecipeCursorPagination, "page_size", 1)
+            recipes = RecipeFactory.create_batch(2)
+            recipes.append(Recipe.objects.create())
+
+            pages = get_cursor_pages(api_client, "/api/v3/recipe/?pagination=cursor")
+            assert sorted(page[0] for page in pages) == sorted(r.id for r in recipes)
+
     @pytest.mark.django_db
     class TestCreation(object):
         def test_it_can_create_recipes(self, api_client):
@@ -565,7 +599,7 @@ class TestRecipeAPI(object):
             assert recipe.latest_revision.action == action
 
         def test_it_can_change_arguments_for_recipes(self, api_client):
-            recipe = RecipeFactory(arguments_json="{}")
+            recipe = RecipeFactory(arguments_json={})
             action = ActionFactory(
                 name="foobarbaz",
                 arguments_schema={
@@ -975,6 +1009,19 @@ class TestRecipeAPI(object):
             assert res.data[1]["name"] == "version 2"
             assert res.data[2]["name"] == "version 1"
 
+        def test_history_answers_conditional_requests(self, api_client):
+            recipe = RecipeFactory(name="version 1")
+            url = f"/api/v3/recipe/{recipe.id}/history/"
+            etag = api_client.get(url)["ETag"]
+
+            res = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert res.status_code == 304
+
+            recipe.revise(name="version 2")
+            res = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert res.status_code == 200
+            assert res.data[0]["name"] == "version 2"
+
         def test_it_can_enable_recipes(self, api_client):
             recipe = RecipeFactory(approver=UserFactory())
 
@@ -1128,6 +1175,26 @@ class TestRecipeAPI(object):
             assert res.status_code == 200
             assert [r["id"] for r in res.data["results"]] == [r1.id]
 
+        def test_search_is_case_insensitive(self, api_client):
+            r1 = RecipeFactory(name="Apple Banana", extra_filter_expression="'CHERRY' == 'CHERRY'")
+
+            res = api_client.get("/api/v3/recipe/?text=aPPle cherry")
+            assert res.status_code == 200
+            assert [r["id"] for r in res.data["results"]] == [r1.id]
+
+        def test_search_ranks_name_matches_first(self, api_client):
+            r1 = RecipeFactory(name="other", extra_filter_expression="'apple' == 'apple'")
+            r2 = RecipeFactory(name="apple", extra_filter_expression="true")
+
+            res = api_client.get("/api/v3/recipe/?text=apple")
+            assert res.status_code == 200
+            assert [r["id"] for r in res.data["results"]] == [r2.id, r1.id]
+
+            # An explicit ordering is used instead
+            res = api_client.get("/api/v3/recipe/?text=apple&ordering=-name")
+            assert res.status_code == 200
+            assert [r["id"] for r in res.data["results"]] == [r1.id, r2.id]
+
         def test_list_filter_action_legacy(self, api_client):
             a1 = ActionFactory()
             a2 = ActionFactory()
@@ -1282,6 +1349,16 @@ class TestRecipeRevisionAPI(object):
         res = api_client.get(f"/api/v3/recipe_revision/{recipe.latest_revision.id}/")
         assert res.data["identicon_seed"] == recipe.latest_revision.identicon_seed
 
+    def test_cursor_pagination(self, api_client, mocker):
+        mocker.patch.object(CreatedCursorPagination, "page_size", 2)
+        RecipeRevisionFactory.create_batch(3)
+        revisions = RecipeRevision.objects.order_by("-created", "-id")
+        expected = list(revisions.values_list("id", flat=True))
+
+        pages = get_cursor_pages(api_client, "/api/v3/recipe_revision/?pagination=cursor")
+        assert [len(page) for page in pages[:-1]] == [2] * (len(pages) - 1)
+        assert [revision_id for page in pages for revision_id in page] == expected
+
 
 @pytest.mark.django_db
 class TestApprovalRequestAPI(object):
@@ -1290,6 +1367,13 @@ class TestApprovalRequestAPI(object):
         assert res.status_code == 200
         assert res.data == {"count": 0, "next": None, "previous": None, "results": []}
 
+    def test_cursor_pagination(self, api_client, mocker):
+        mocker.patch.object(CreatedCursorPagination, "page_size", 2)
+        first, second, third = ApprovalRequestFactory.create_batch(3)
+
+        pages = get_cursor_pages(api_client, "/api/v3/approval_request/?pagination=cursor")
+        assert pages == [[third.id, second.id], [first.id]]
+
     def test_approve(self, api_client):
         r = RecipeFactory()
         a = ApprovalRequestFactory(revision=r.latest_revision)
@@ -1631,6 +1715,29 @@ def test_apis_makes_a_reasonable_number_of_db_queries(endpoint, Factory, client,
     assert len(queries) < page_size * 2, queries
 
 
+@pytest.mark.django_db
+def test_recipe_api_stays_within_its_query_budget(client, query_budget):
+    for _ in range(20):
+        RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+
+    with query_budget(max_queries=15):
+        res = client.get("/api/v3/recipe/")
+        assert res.status_code == 200
+        # Read the content, so that queries made while it is sent are counted
+        res.content
+
+
+@pytest.mark.django_db
+def test_recipe_revision_api_stays_within_its_query_budget(client, query_budget):
+    RecipeRevisionFactory.create_batch(20)
+
+    with query_budget(max_queries=10):
+        res = client.get("/api/v3/recipe_revision/")
+        assert res.status_code == 200
+        # Read the content, so that queries made while it is sent are counted
+        res.content
+
+
 class TestIdenticonAPI(object):
     def test_it_works(self, client):
         res = client.get("/api/v3/identicon/v1:foobar.svg")
@@ -1847,6 +1954,120 @@ class TestFilterObjects(object):
             "filter_object": {"0": {"type": ['Unknown filter object type "invalid".']}}
         }
 
+    def test_namespace_sample_can_overlap_enabled_recipes_until_enabled(self, api_client):
+        RecipeFactory(
+            name="existing",
+            filter_object_json=[
+                {"type": "namespaceSample", "namespace": "global-v1", "start": 0, "count": 100}
+            ],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+
+        # Drafts may overlap, only enabling them is checked
+        filter_object = {"type": "namespaceSample", "namespace": "global-v1", "count": 100}
+        res = self.make_recipe(api_client, filter_object=[{**filter_object, "start": 50}])
+        assert res.status_code == 201, res.json()
+
+        recipe = Recipe.objects.get(id=res.json()["id"])
+        approval_request = recipe.latest_revision.request_approval(UserFactory())
+        approval_request.approve(UserFactory(), "r+")
+        res = api_client.post(f"/api/v3/recipe/{recipe.id}/enable/")
+        assert res.status_code == 400
+        assert res.json() == {
+            "messages": [
+                "Buckets 0 to 100 of namespace 'global-v1' are already used by "
+                "recipe 'existing'"
+            ]
+        }
+
+
+@pytest.mark.django_db
+class TestBucketAllocationAPI(object):
+    def make_recipe(self, start, count, namespace="global-v1"):
+        filter_object = {
+            "type": "namespaceSample",
+            "namespace": namespace,
+            "start": start,
+            "count": count,
+        }
+        return RecipeFactory(
+            filter_object_json=[filter_object], approver=UserFactory(), enabler=UserFactory()
+        )
+
+    def test_it_works(self, api_client):
+        res = api_client.get("/api/v3/bucket_allocation/")
+        assert res.status_code == 200
+        assert res.data == {"count": 0, "next": None, "previous": None, "results": []}
+
+    def test_it_lists_allocations(self, api_client):
+        recipe = self.make_recipe(100, 50)
+        self.make_recipe(0, 10, namespace="other")
+
+        res = api_client.get("/api/v3/bucket_allocation/?namespace=global-v1")
+        assert res.status_code == 200
+        assert res.data["results"] == [
+            {
+                "id": Whatever(),
+                "recipe_id": recipe.id,
+                "revision_id": recipe.approved_revision.id,
+                "namespace": "global-v1",
+                "start": 100,
+                "count": 50,
+            }
+        ]
+
+    def test_it_finds_free_ranges(self, api_client):
+        self.make_recipe(0, 100)
+
+        res = api_client.get("/api/v3/bucket_allocation/free/?namespace=global-v1&count=50")
+        assert res.status_code == 200
+        assert res.data == {"namespace": "global-v1", "start": 100, "count": 50}
+
+        res = api_client.get("/api/v3/bucket_allocation/free/?namespace=global-v1&count=9901")
+        assert res.status_code == 404
+
+    def test_free_ranges_require_parameters(self, api_client):
+        res = api_client.get("/api/v3/bucket_allocation/free/?count=50")
+        assert res.status_code == 400
+
+        res = api_client.get("/api/v3/bucket_allocation/free/?namespace=global-v1&count=-1")
+        assert res.status_code == 400
+
+
+@pytest.mark.django_db
+class TestTargetingSimulation(object):
+    def test_it_works(self, api_client):
+        recipe = RecipeFactory(
+            name="everyone",
+            extra_filter_expression="true",
+            filter_object_json=[],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+
+        res = api_client.get("/api/v3/targeting_simulation/?clients=100&seed=1")
+        assert res.status_code == 200, res.json()
+        assert res.json() == {
+            "clients": 100,
+            "results": [
+                {"id": recipe.id, "name": "everyone", "matches": 100, "rate": 1.0, "error": None}
+            ],
+        }
+
+    def test_it_requires_authentication(self, client):
+        res = client.get("/api/v3/targeting_simulation/")
+        assert res.status_code == 401
+
+    def test_it_limits_the_number_of_clients(self, api_client, settings):
+        settings.TARGETING_SIMULATION_MAX_CLIENTS = 10
+        res = api_client.get("/api/v3/targeting_simulation/?clients=11")
+        assert res.status_code == 400
+
+    def test_it_validates_parameters(self, api_client):
+        res = api_client.get("/api/v3/targeting_simulation/?clients=lots")
+        assert res.status_code == 400
+
 
 @pytest.mark.django_db
 class TestFilters(object):
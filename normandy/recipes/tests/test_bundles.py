@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from django.db import transaction
+
+from normandy.base.tests import UserFactory
+from normandy.recipes.bundles import (
+    build_signed_recipe_bundle,
+    get_signed_recipe_bundle,
+    render_signed_recipes,
+)
+from normandy.recipes.models import SignedRecipeBundle
+from normandy.recipes.tests import ActionFactory, RecipeFactory
+
+
+@pytest.mark.django_db
+class TestSignedRecipeBundle(object):
+    def test_it_works(self):
+        bundle = get_signed_recipe_bundle()
+        assert json.loads(bytes(bundle.content)) == []
+        assert bundle.etag
+
+    def test_it_matches_live_rendering(self, settings):
+        recipe = RecipeFactory(approver=UserFactory(), signed=True)
+        settings.BASELINE_CAPABILITIES |= recipe.approved_revision.capabilities
+
+        bundle = get_signed_recipe_bundle()
+        assert bytes(bundle.content) == render_signed_recipes()
+        assert json.loads(bytes(bundle.content))[0]["recipe"]["id"] == recipe.id
+
+    def test_it_is_reused_while_current(self, mocker):
+        build_signed_recipe_bundle()
+        render = mocker.patch("normandy.recipes.bundles.render_signed_recipes")
+
+        bundle = get_signed_recipe_bundle()
+        assert not render.called
+        assert bundle.built_generation == bundle.generation
+
+    def test_recipe_changes_make_it_stale(self, settings):
+        bundle = build_signed_recipe_bundle()
+
+        recipe = RecipeFactory(approver=UserFactory(), signed=True)
+        settings.BASELINE_CAPABILITIES |= recipe.approved_revision.capabilities
+        bundle.refresh_from_db()
+        assert bundle.built_generation != bundle.generation
+
+        new_bundle = get_signed_recipe_bundle()
+        assert new_bundle.etag != bundle.etag
+        assert json.loads(bytes(new_bundle.content))[0]["recipe"]["id"] == recipe.id
+
+    def test_it_is_invalidated_and_rebuilt_once_per_transaction(self, mocker):
+        bundle = build_signed_recipe_bundle()
+        on_commit = mocker.spy(transaction, "on_commit")
+
+        # Approving and enabling saves the recipe several times
+        RecipeFactory(approver=UserFactory(), enabler=UserFactory(), signed=True)
+        bundle.refresh_from_db()
+        assert bundle.generation == bundle.built_generation + 1
+
+        # The tests run in a transaction, so the rebuild is still waiting
+        assert on_commit.call_count == 1
+
+    def test_it_is_rebuilt_again_after_a_rollback(self, mocker):
+        on_commit = mocker.spy(transaction, "on_commit")
+
+        with transaction.atomic():
+            RecipeFactory()
+            transaction.set_rollback(True)
+        assert on_commit.call_count == 1
+
+        RecipeFactory()
+        assert on_commit.call_count == 2
+
+    def test_action_changes_make_it_stale(self):
+        action = ActionFactory()
+        RecipeFactory(approver=UserFactory(), signed=True, action=action)
+        bundle = build_signed_recipe_bundle()
+
+        action.name = "renamed"
+        action.save()
+        bundle.refresh_from_db()
+        assert not bundle.is_current(bundle.settings_key)
+
+    def test_changes_after_a_rebuild_in_the_transaction_make_it_stale(self):
+        recipe = RecipeFactory(approver=UserFactory(), signed=True)
+        bundle = build_signed_recipe_bundle()
+        assert bundle.is_current(bundle.settings_key)
+
+        recipe.revise(name="changed")
+        bundle.refresh_from_db()
+        assert not bundle.is_current(bundle.settings_key)
+
+    def test_settings_changes_make_it_stale(self, settings):
+        recipe = RecipeFactory(approver=UserFactory(), signed=True)
+        bundle = get_signed_recipe_bundle()
+        assert json.loads(bytes(bundle.content)) == []
+
+        settings.BASELINE_CAPABILITIES |= recipe.approved_revision.capabilities
+        bundle = get_signed_recipe_bundle()
+        assert json.loads(bytes(bundle.content))[0]["recipe"]["id"] == recipe.id
+
+    def test_it_is_not_stored_if_recipes_change_while_rendering(self, mocker):
+        def render_and_change():
+            SignedRecipeBundle.invalidate()
+            return b"[]"
+
+        SignedRecipeBundle.objects.create(id=SignedRecipeBundle.SINGLETON_ID)
+        mocker.patch(
+            "normandy.recipes.bundles.render_signed_recipes", side_effect=render_and_change
+        )
+
+        build_signed_recipe_bundle()
+        stored = SignedRecipeBundle.objects.get()
+        assert stored.built_generation is None
@@ -73,6 +73,29 @@ class TestSignaturesUseGoodCertificates(object):
 
 @pytest.mark.django_db
 class TestRecipeSignatureAreCorrect:
+    def test_it_works(self):
+        assert checks.recipe_signatures_are_correct(None) == []
+
+    def test_it_reports_bad_signatures(self, mocker):
+        recipe = RecipeFactory(approver=UserFactory(), signed=True)
+        mock_verifier = mocker.patch("normandy.recipes.checks.signing.SignatureVerifier")
+        mock_verifier.return_value.verify.return_value = [signing.SignatureDoesNotMatch()]
+
+        errors = checks.recipe_signatures_are_correct(None)
+        assert len(errors) == 1
+        assert errors[0].id == checks.ERROR_INVALID_RECIPE_SIGNATURE
+        assert str(recipe.id) in errors[0].msg
+
+    def test_it_reports_bad_certificates(self, mocker):
+        RecipeFactory(approver=UserFactory(), signed=True)
+        mock_verifier = mocker.patch("normandy.recipes.checks.signing.SignatureVerifier")
+        problem = signing.CertificateExpired("a while ago")
+        mock_verifier.return_value.verify.return_value = [problem]
+
+        errors = checks.recipe_signatures_are_correct(None)
+        assert len(errors) == 1
+        assert errors[0].id == checks.ERROR_BAD_SIGNING_CERTIFICATE
+
     def test_it_warns_if_a_field_isnt_available(self, mocker):
         """This is to allow for un-applied to migrations to not break running migrations."""
         RecipeFactory(approver=UserFactory(), signed=True)
@@ -1,8 +1,8 @@
 import hashlib
 import json
+from io import StringIO
 from unittest.mock import patch
 from datetime import timedelta
-import requests_mock
 
 from django.conf import settings
 from django.core.management import call_command, CommandError
@@ -15,7 +15,14 @@ from markus import GAUGE
 
 from normandy.base.tests import UserFactory, Whatever
 from normandy.recipes import exports
-from normandy.recipes.models import Action, Recipe
+from normandy.recipes.models import (
+    Action,
+    Recipe,
+    RecipeRevision,
+    RemoteSettingsChange,
+    RemoteSettingsOutbox,
+    RemoteSettingsSyncState,
+)
 from normandy.recipes.tests import ActionFactory, RecipeFactory
 from normandy.studies.tests import ExtensionFactory
 
@@ -220,6 +227,37 @@ class TestUpdateRecipeSignatures(object):
         r.refresh_from_db()
         assert r.signature.signature != "old signature"
 
+    def test_it_changes_the_signed_listing_etag(self, api_client, settings, mocked_autograph):
+        r = RecipeFactory(approver=UserFactory(), enabler=UserFactory(), signed=True)
+        settings.BASELINE_CAPABILITIES |= r.latest_revision.capabilities
+        r.signature.signature = "old signature"
+        r.signature.save()
+        res = api_client.get("/api/v1/recipe/signed/")
+        assert res.status_code == 200
+        etag = res["ETag"]
+
+        call_command("update_recipe_signatures", "--force")
+
+        res = api_client.get("/api/v1/recipe/signed/", HTTP_IF_NONE_MATCH=etag)
+        assert res.status_code == 200
+        assert res["ETag"] != etag
+        assert res.data[0]["signature"]["signature"] != "old signature"
+
+    def test_it_signs_recipes_in_batches(self, mocked_autograph):
+        recipes = RecipeFactory.create_batch(
+            5, approver=UserFactory(), enabler=UserFactory(), signed=False
+        )
+        mocked_autograph.return_value.sign_data.reset_mock()
+
+        call_command("update_recipe_signatures", "--batch-size", "2")
+
+        sign_data = mocked_autograph.return_value.sign_data
+        assert [len(c[0][0]) for c in sign_data.call_args_list] == [2, 2, 1]
+        for recipe in recipes:
+            recipe.refresh_from_db()
+            expected = hashlib.sha256(recipe.canonical_json()).hexdigest()
+            assert recipe.signature.signature == expected
+
     def test_it_updates_remote_settings_if_enabled(self, mocker, mocked_autograph):
         mocked_remotesettings = mocker.patch(
             "normandy.recipes.management.commands.update_recipe_signatures.RemoteSettings"
@@ -232,8 +270,24 @@ class TestUpdateRecipeSignatures(object):
 
         call_command("update_recipe_signatures", "--force")
 
-        assert mocked_remotesettings.return_value.publish.call_count == 3
-        assert mocked_remotesettings.return_value.approve_changes.call_count == 1
+        publish_batch = mocked_remotesettings.return_value.publish_batch
+        assert publish_batch.call_count == 1
+        assert len(publish_batch.call_args[1]["publish"]) == 3
+
+    def test_it_updates_remote_settings_if_autograph_unavailable(self, mocker):
+        mocked_remotesettings = mocker.patch(
+            "normandy.recipes.management.commands.update_recipe_signatures.RemoteSettings"
+        )
+        mocker.patch("normandy.recipes.models.Autographer", side_effect=ImproperlyConfigured)
+        recipes = RecipeFactory.create_batch(2, approver=UserFactory(), enabler=UserFactory())
+
+        call_command("update_recipe_signatures", "--force")
+
+        publish_batch = mocked_remotesettings.return_value.publish_batch
+        assert publish_batch.call_count == 1
+        published = publish_batch.call_args[1]["publish"]
+        assert {r.id for r in published} == {r.id for r in recipes}
+        assert all(r.signature is None for r in published)
 
     def test_it_does_not_resign_up_to_date_recipes(self, settings, mocked_autograph):
         r = RecipeFactory(approver=UserFactory(), enabler=UserFactory(), signed=True)
@@ -294,18 +348,21 @@ class TestUpdateRecipeSignatures(object):
             )
         ]
 
-        # one publish to the capabilities collection per recipe
+        # one publish to the capabilities collection per recipe, all sent in one batch
+        batch_mock = client_mock.batch.return_value.__enter__.return_value
         expected_calls = []
         for recipe in recipes:
             expected_calls.append(
                 mocker.call(
-                    data=Whatever(lambda r: r["id"] == recipe.id, name=f"Recipe {recipe.id}"),
+                    data=Whatever(lambda r: r["id"] == str(recipe.id), name=f"Recipe {recipe.id}"),
                     bucket=settings.REMOTE_SETTINGS_WORKSPACE_BUCKET_ID,
                     collection=settings.REMOTE_SETTINGS_CAPABILITIES_COLLECTION_ID,
                 )
             )
-        client_mock.update_record.has_calls(expected_calls, any_order=True)  # all expected calls
-        assert client_mock.update_record.call_count == len(expected_calls)  # no extra calls
+        batch_mock.update_record.assert_has_calls(expected_calls, any_order=True)
+        assert batch_mock.update_record.call_count == len(expected_calls)  # no extra calls
+        assert client_mock.batch.call_count == 1
+        assert not client_mock.update_record.called
 
 
 @pytest.mark.django_db
@@ -428,6 +485,99 @@ class TestUpdateAddonUrls(object):
         assert recipe2.latest_revision.arguments[addonUrl] == extension2.xpi.url
 
 
+@pytest.mark.django_db
+class TestUpdateComputedFields(object):
+    def test_it_works(self):
+        call_command("update_computed_fields")
+
+    def test_it_fills_in_missing_fields(self):
+        recipe = RecipeFactory(extra_filter_expression="2 + 2 == 4", filter_object_json=None)
+        RecipeRevision.objects.update(stored_filter_expression=None)
+
+        call_command("update_computed_fields")
+
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert revision.stored_filter_expression == "2 + 2 == 4"
+
+    def test_it_fills_in_missing_capabilities(self):
+        recipe = RecipeFactory(extra_capabilities=["test.one"])
+        RecipeRevision.objects.update(stored_capabilities=None)
+
+        call_command("update_computed_fields")
+
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert set(revision.stored_capabilities) == revision.compute_capabilities()
+
+    def test_it_fills_in_missing_argument_keys(self):
+        recipe = RecipeFactory(
+            action=ActionFactory(name="opt-out-study"), arguments={"name": "foo"}
+        )
+        RecipeRevision.objects.update(stored_argument_key=None)
+
+        call_command("update_computed_fields")
+
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert revision.stored_argument_key == "foo"
+        assert "test.one" in revision.stored_capabilities
+
+    def test_it_fills_in_missing_search_text(self):
+        recipe = RecipeFactory(name="Apple")
+        RecipeRevision.objects.update(stored_search_text=None)
+
+        call_command("update_computed_fields")
+
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert revision.stored_search_text.startswith("apple\n")
+
+    def test_it_only_updates_missing_fields_by_default(self):
+        recipe = RecipeFactory(extra_filter_expression="2 + 2 == 4", filter_object_json=None)
+        RecipeRevision.objects.update(stored_filter_expression="stale")
+
+        call_command("update_computed_fields")
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert revision.stored_filter_expression == "stale"
+
+        call_command("update_computed_fields", "--all")
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert revision.stored_filter_expression == "2 + 2 == 4"
+
+
+@pytest.mark.django_db
+class TestCheckDenormalizedFields(object):
+    def test_it_works(self):
+        RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+        stdout = StringIO()
+        call_command("check_denormalized_fields", stdout=stdout)
+        assert stdout.getvalue() == "All recipes are up to date\n"
+
+    def test_it_reports_stale_fields(self):
+        recipe = RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+        Recipe.objects.update(enabled=False)
+
+        stdout = StringIO()
+        with pytest.raises(CommandError) as err:
+            call_command("check_denormalized_fields", stdout=stdout)
+        assert str(err.value) == "1 recipe out of date"
+        assert stdout.getvalue() == f"Recipe {recipe.id}: enabled is False, but should be True\n"
+
+        recipe.refresh_from_db()
+        assert recipe.enabled is False
+
+    def test_it_fixes_stale_fields(self):
+        recipe = RecipeFactory()
+        Recipe.objects.update(
+            enabled=True, last_updated=recipe.latest_revision.updated - timedelta(days=1)
+        )
+
+        stdout = StringIO()
+        call_command("check_denormalized_fields", "--fix", stdout=stdout)
+        assert stdout.getvalue().endswith("1 recipe updated\n")
+
+        recipe.refresh_from_db()
+        assert recipe.enabled is None
+        assert recipe.last_updated == recipe.latest_revision.updated
+
+
 @pytest.mark.django_db
 class TestSyncRemoteSettings(object):
     capabilities_workspace_collection_url = (
@@ -439,6 +589,26 @@ class TestSyncRemoteSettings(object):
         f"/{settings.REMOTE_SETTINGS_CAPABILITIES_COLLECTION_ID}/records"
     )
 
+    def mock_batch_endpoint(self, rs_settings, requestsmock):
+        requestsmock.get(
+            f"{rs_settings.REMOTE_SETTINGS_URL}/", json={"settings": {"batch_max_requests": 25}}
+        )
+
+        def batch_responses(request, context):
+            return {
+                "responses": [
+                    {"status": 200, "path": r["path"], "body": {"data": {}}, "headers": {}}
+                    for r in request.json()["requests"]
+                ]
+            }
+
+        requestsmock.post(f"{rs_settings.REMOTE_SETTINGS_URL}/batch", json=batch_responses)
+
+    def batched_requests(self, requestsmock):
+        batches = [r for r in requestsmock.request_history if r.method == "POST"]
+        assert len(batches) == 1
+        return batches[0].json()["requests"]
+
     @pytest.mark.django_db
     def test_it_works(self, rs_settings, requestsmock):
         """
@@ -472,8 +642,7 @@ class TestSyncRemoteSettings(object):
         assert not mocked_remotesettings.unpublish.called
 
     def test_publishes_missing_recipes(self, rs_settings, requestsmock):
-        # Some records will be created with PUT.
-        requestsmock.put(requests_mock.ANY, json={})
+        self.mock_batch_endpoint(rs_settings, requestsmock)
         # A signature request will be sent.
         requestsmock.patch(self.capabilities_workspace_collection_url, json={})
         # Instantiate local recipes.
@@ -485,9 +654,6 @@ class TestSyncRemoteSettings(object):
         requestsmock.get(
             self.capabilities_published_records_url, json={"data": [exports.recipe_as_record(r1)]}
         )
-        # It will be created.
-        r2_capabilities_url = self.capabilities_workspace_collection_url + f"/records/{r2.id}"
-        requestsmock.put(r2_capabilities_url, json={})
 
         # Ignore any requests before this point
         requestsmock._adapter.request_history = []
@@ -498,18 +664,18 @@ class TestSyncRemoteSettings(object):
         # First request should be to get the existing records
         assert requests[0].method == "GET"
         assert requests[0].url.endswith(self.capabilities_published_records_url)
-        # The next should be to PUT the missing recipe2
-        assert requests[1].method == "PUT"
-        assert requests[1].url.endswith(r2_capabilities_url)
+        # The missing recipe2 should be PUT in a single batch
+        batched = self.batched_requests(requestsmock)
+        assert [r["method"] for r in batched] == ["PUT"]
+        assert batched[0]["path"].endswith(f"/records/{r2.id}")
         # The final one should be to approve the changes
-        assert requests[2].method == "PATCH"
-        assert requests[2].url.endswith(self.capabilities_workspace_collection_url)
-        # And there are no extra requests
-        assert len(requests) == 3
+        assert requests[-1].method == "PATCH"
+        assert requests[-1].url.endswith(self.capabilities_workspace_collection_url)
+        # And there are no requests for individual records
+        assert not [r for r in requests if r.method in ["PUT", "DELETE"]]
 
     def test_republishes_outdated_recipes(self, rs_settings, requestsmock):
-        # Some records will be created with PUT.
-        requestsmock.put(requests_mock.ANY, json={})
+        self.mock_batch_endpoint(rs_settings, requestsmock)
         # A signature request will be sent.
         requestsmock.patch(self.capabilities_workspace_collection_url, json={})
         # Instantiate local recipes.
@@ -522,9 +688,6 @@ class TestSyncRemoteSettings(object):
             self.capabilities_published_records_url,
             json={"data": [exports.recipe_as_record(r1), to_update]},
         )
-        # It will be updated.
-        r2_capabilities_url = self.capabilities_workspace_collection_url + f"/records/{r2.id}"
-        requestsmock.put(r2_capabilities_url, json={})
 
         # Ignore any requests before this point
         requestsmock._adapter.request_history = []
@@ -534,18 +697,18 @@ class TestSyncRemoteSettings(object):
         # The first request should be to get the existing records
         assert requests[0].method == "GET"
         assert requests[0].url.endswith(self.capabilities_published_records_url)
-        # The next one should be to PUT the outdated recipe2
-        assert requests[1].method == "PUT"
-        assert requests[1].url.endswith(r2_capabilities_url)
+        # The outdated recipe2 should be PUT in a single batch
+        batched = self.batched_requests(requestsmock)
+        assert [r["method"] for r in batched] == ["PUT"]
+        assert batched[0]["path"].endswith(f"/records/{r2.id}")
         # The final one should be to approve the changes
-        assert requests[2].method == "PATCH"
-        assert requests[2].url.endswith(self.capabilities_workspace_collection_url)
-        # And there are no extra requests
-        assert len(requests) == 3
+        assert requests[-1].method == "PATCH"
+        assert requests[-1].url.endswith(self.capabilities_workspace_collection_url)
+        # And there are no requests for individual records
+        assert not [r for r in requests if r.method in ["PUT", "DELETE"]]
 
     def test_unpublishes_extra_recipes(self, rs_settings, requestsmock):
-        # Some records will be created with PUT.
-        requestsmock.put(requests_mock.ANY, json={})
+        self.mock_batch_endpoint(rs_settings, requestsmock)
         # A signature request will be sent.
         requestsmock.patch(self.capabilities_workspace_collection_url, json={})
         # Instantiate local recipes.
@@ -557,9 +720,6 @@ class TestSyncRemoteSettings(object):
             self.capabilities_published_records_url,
             json={"data": [exports.recipe_as_record(r1), exports.recipe_as_record(r2)]},
         )
-        # It will be deleted.
-        r2_capabilities_url = self.capabilities_workspace_collection_url + f"/records/{r2.id}"
-        requestsmock.delete(r2_capabilities_url, json={"data": ""})
 
         # Ignore any requests before this point
         requestsmock._adapter.request_history = []
@@ -569,11 +729,169 @@ class TestSyncRemoteSettings(object):
         # The first request should be to get the existing records
         assert requests[0].method == "GET"
         assert requests[0].url.endswith(self.capabilities_published_records_url)
-        # The next one should be to PUT the outdated recipe2
-        assert requests[1].method == "DELETE"
-        assert requests[1].url.endswith(r2_capabilities_url)
+        # The extra recipe2 should be DELETEd in a single batch
+        batched = self.batched_requests(requestsmock)
+        assert [r["method"] for r in batched] == ["DELETE"]
+        assert batched[0]["path"].endswith(f"/records/{r2.id}")
         # The final one should be to approve the changes
-        assert requests[2].method == "PATCH"
-        assert requests[2].url.endswith(self.capabilities_workspace_collection_url)
-        # And there are no extra requests
-        assert len(requests) == 3
+        assert requests[-1].method == "PATCH"
+        assert requests[-1].url.endswith(self.capabilities_workspace_collection_url)
+        # And there are no requests for individual records
+        assert not [r for r in requests if r.method in ["PUT", "DELETE"]]
+
+    def test_it_records_a_successful_sync(self, rs_settings, requestsmock):
+        r1 = RecipeFactory(name="Test 1", enabler=UserFactory(), approver=UserFactory())
+        requestsmock.get(
+            self.capabilities_published_records_url,
+            json={"data": [{**exports.recipe_as_record(r1), "last_modified": 42}]},
+        )
+        assert RemoteSettingsChange.objects.exists()
+
+        call_command("sync_remote_settings")
+
+        assert not RemoteSettingsChange.objects.exists()
+        state = RemoteSettingsSyncState.get()
+        assert state.last_modified == 42
+        assert state.synced is not None
+
+    def test_dry_run_does_not_record_a_sync(self, rs_settings, requestsmock):
+        r1 = RecipeFactory(name="Test 1", enabler=UserFactory(), approver=UserFactory())
+        requestsmock.get(
+            self.capabilities_published_records_url,
+            json={"data": [{**exports.recipe_as_record(r1), "last_modified": 42}]},
+        )
+
+        call_command("sync_remote_settings", "--dry-run")
+
+        assert RemoteSettingsChange.objects.filter(recipe_id=r1.id).exists()
+        assert RemoteSettingsSyncState.get().last_modified is None
+
+    def test_incremental_sync_only_compares_journaled_recipes(self, rs_settings, requestsmock):
+        self.mock_batch_endpoint(rs_settings, requestsmock)
+        requestsmock.patch(self.capabilities_workspace_collection_url, json={})
+        RecipeFactory(name="Test 1", enabler=UserFactory(), approver=UserFactory())
+        r2 = RecipeFactory(name="Test 2", enabler=UserFactory(), approver=UserFactory())
+        RemoteSettingsChange.objects.all().delete()
+        RemoteSettingsSyncState.objects.create(
+            id=RemoteSettingsSyncState.SINGLETON_ID, last_modified=42
+        )
+        RemoteSettingsChange.record([r2.id])
+
+        # Nothing changed remotely, and `r2` is outdated.
+        to_update = {**exports.recipe_as_record(r2), "name": "Outdated name", "last_modified": 40}
+        requestsmock.get(f"{self.capabilities_published_records_url}?_since=42", json={"data": []})
+        requestsmock.get(
+            f"{self.capabilities_published_records_url}?in_id={r2.id}", json={"data": [to_update]}
+        )
+
+        requestsmock._adapter.request_history = []
+        with patch(
+            "normandy.recipes.management.commands.sync_remote_settings.recipe_as_record",
+            wraps=exports.recipe_as_record,
+        ) as recipe_as_record:
+            call_command("sync_remote_settings")
+
+        # Only `r2` was serialized
+        recipe_as_record.assert_called_once_with(r2)
+        requests = requestsmock.request_history
+        assert requests[0].qs == {"_since": ["42"]}
+        assert requests[1].qs == {"in_id": [str(r2.id)]}
+        batched = self.batched_requests(requestsmock)
+        assert [r["method"] for r in batched] == ["PUT"]
+        assert batched[0]["path"].endswith(f"/records/{r2.id}")
+        assert not RemoteSettingsChange.objects.exists()
+        assert RemoteSettingsSyncState.get().last_modified == 42
+
+    def test_incremental_sync_compares_remote_changes(self, rs_settings, requestsmock):
+        self.mock_batch_endpoint(rs_settings, requestsmock)
+        requestsmock.patch(self.capabilities_workspace_collection_url, json={})
+        r1 = RecipeFactory(name="Test 1", enabler=UserFactory(), approver=UserFactory())
+        RemoteSettingsChange.objects.all().delete()
+        RemoteSettingsSyncState.objects.create(
+            id=RemoteSettingsSyncState.SINGLETON_ID, last_modified=42
+        )
+
+        # The record of `r1` was deleted remotely.
+        tombstone = {"id": str(r1.id), "deleted": True, "last_modified": 50}
+        requestsmock.get(
+            f"{self.capabilities_published_records_url}?_since=42", json={"data": [tombstone]}
+        )
+        requestsmock.get(
+            f"{self.capabilities_published_records_url}?in_id={r1.id}", json={"data": []}
+        )
+
+        call_command("sync_remote_settings")
+
+        batched = self.batched_requests(requestsmock)
+        assert [r["method"] for r in batched] == ["PUT"]
+        assert batched[0]["path"].endswith(f"/records/{r1.id}")
+        assert RemoteSettingsSyncState.get().last_modified == 50
+
+    def test_full_sync_ignores_the_journal(self, rs_settings, requestsmock):
+        r1 = RecipeFactory(name="Test 1", enabler=UserFactory(), approver=UserFactory())
+        RemoteSettingsSyncState.objects.create(
+            id=RemoteSettingsSyncState.SINGLETON_ID, last_modified=42
+        )
+        requestsmock.get(
+            self.capabilities_published_records_url,
+            json={"data": [{**exports.recipe_as_record(r1), "last_modified": 42}]},
+        )
+
+        requestsmock._adapter.request_history = []
+        call_command("sync_remote_settings", "--full")
+
+        requests = requestsmock.request_history
+        assert len(requests) == 1
+        assert requests[0].qs == {}
+        assert not RemoteSettingsChange.objects.exists()
+
+
+@pytest.mark.django_db
+class TestPublishRemoteSettings(object):
+    def test_it_works(self):
+        call_command("publish_remote_settings")
+
+    def test_it_publishes_pending_changes(self, rs_settings, mocked_remotesettings):
+        recipe = RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+        assert RemoteSettingsOutbox.objects.exists()
+
+        call_command("publish_remote_settings")
+
+        mocked_remotesettings.return_value.publish_batch.assert_called_once_with(
+            publish=[recipe], unpublish=[]
+        )
+        assert not RemoteSettingsOutbox.objects.exists()
+
+    def test_it_reports_errors(self, rs_settings, mocked_remotesettings):
+        RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+        publish_batch = mocked_remotesettings.return_value.publish_batch
+        publish_batch.side_effect = requests.exceptions.ConnectionError("Nope")
+
+        with pytest.raises(CommandError):
+            call_command("publish_remote_settings")
+
+        assert RemoteSettingsOutbox.objects.get().attempts == 1
+
+
+@pytest.mark.django_db
+class TestSimulateTargeting(object):
+    def test_it_works(self):
+        call_command("simulate_targeting", "--clients", "10")
+
+    def test_it_reports_match_rates(self):
+        recipe = RecipeFactory(
+            name="Test",
+            extra_filter_expression="true",
+            filter_object_json=[],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        stdout = StringIO()
+
+        call_command("simulate_targeting", "--clients", "100", stdout=stdout)
+
+        assert f"Recipe {recipe.id} (Test): 100 of 100 clients (100.00%)" in stdout.getvalue()
+
+    def test_it_requires_clients(self):
+        with pytest.raises(CommandError):
+            call_command("simulate_targeting", "--clients", "0")
@@ -0,0 +1,181 @@
+from datetime import datetime, timezone
+
+import pytest
+from pyjexl import JEXL
+from pyjexl.exceptions import ParseError
+
+from normandy.base.tests import UserFactory
+from normandy.recipes import evaluation
+from normandy.recipes.models import RecipeRevision
+from normandy.recipes.tests import (
+    ChannelFactory,
+    CountryFactory,
+    LocaleFactory,
+    RecipeFactory,
+    StableSampleFilterFactory,
+)
+from normandy.recipes.utils import bucket_sample, deterministic_sample
+
+
+def make_clients(count=200, seed=42):
+    return list(
+        evaluation.generate_clients(
+            count,
+            channels=["release", "beta"],
+            locales=["en-US", "de"],
+            countries=["US", "DE"],
+            seed=seed,
+        )
+    )
+
+
+class TestEvaluate(object):
+    @pytest.mark.parametrize(
+        "expression",
+        [
+            "normandy.channel in ['release'] && normandy.locale == 'de'",
+            "normandy.country == 'US' || normandy.os.isMac",
+            "normandy.country == 'US' ? normandy.locale : normandy.channel",
+            "!(normandy.channel == 'beta')",
+            "[{a: 1}, {a: 2}, {a: 3}][.a >= 2]",
+            "{a: normandy.channel, b: 2}['a']",
+            "normandy.version >= '75' && normandy.version < '76'",
+        ],
+    )
+    def test_it_matches_pyjexl(self, expression):
+        clients = make_clients()
+        jexl = JEXL()
+        expected = [jexl.evaluate(expression, client) for client in clients]
+        assert evaluation.evaluate(expression, clients) == expected
+
+    def test_mismatched_types_are_not_errors(self):
+        clients = [{"normandy": {"version": None}}, {"normandy": {"version": "80.0"}}]
+        assert evaluation.evaluate("normandy.version > '70'", clients) == [False, True]
+        assert evaluation.evaluate("'foo' in normandy.missing", clients) == [False, False]
+        assert evaluation.evaluate("normandy.missing.field", clients) == [None, None]
+
+    def test_right_side_is_only_evaluated_when_needed(self):
+        # Evaluating the right side would fail because the rate is invalid.
+        clients = [{"normandy": {"userId": "a"}}]
+        expression = "false && [normandy.userId]|stableSample(2)"
+        assert evaluation.evaluate(expression, clients) == [False]
+
+    def test_stable_sample(self):
+        clients = make_clients()
+        result = evaluation.evaluate("[normandy.userId, 42]|stableSample(0.5)", clients)
+        expected = [deterministic_sample(0.5, [c["normandy"]["userId"], 42]) for c in clients]
+        assert result == expected
+        assert 0 < sum(result) < len(clients)
+
+    def test_bucket_sample(self):
+        clients = make_clients()
+        expression = '["ns", normandy.userId]|bucketSample(900, 200, 1000)'
+        result = evaluation.evaluate(expression, clients)
+        expected = [
+            bucket_sample(["ns", c["normandy"]["userId"]], 900, 200, 1000) for c in clients
+        ]
+        assert result == expected
+
+    def test_samples_are_grouped_by_unhashable_arguments(self):
+        def sample_many(key, inputs_list):
+            return [(key, inputs) for inputs in inputs_list]
+
+        keys = [[1, 2], {"a": 1}, [1, 2]]
+        result = evaluation._sample_grouped(["x", "y", "z"], keys, sample_many)
+        assert result == [([1, 2], ["x"]), ({"a": 1}, ["y"]), ([1, 2], ["z"])]
+
+    def test_date(self):
+        clients = [{"normandy": {"request_time": datetime(2020, 2, 15, tzinfo=timezone.utc)}}]
+        expression = (
+            '(normandy.request_time>="2020-02-01T00:00:00Z"|date)'
+            '&&(normandy.request_time<"2020-03-01T00:00:00Z"|date)'
+        )
+        assert evaluation.evaluate(expression, clients) == [True]
+
+    def test_preferences(self):
+        clients = [
+            {"preferences": {"foo.bar": 3}, "userSetPreferences": ["foo.bar"]},
+            {"preferences": {}, "userSetPreferences": []},
+        ]
+        assert evaluation.evaluate("'foo.bar'|preferenceValue(1)", clients) == [3, 1]
+        assert evaluation.evaluate("'foo.bar'|preferenceExists", clients) == [True, False]
+        assert evaluation.evaluate("'foo.bar'|preferenceIsUserSet", clients) == [True, False]
+
+    def test_version_compare(self):
+        clients = [{"env": {"version": v}} for v in ["72.0a1", "72.0", "72.0.1", "73.0"]]
+        result = evaluation.evaluate('env.version|versionCompare("72.0")', clients)
+        assert result == [-1, 0, 1, 1]
+
+    def test_intersect(self):
+        clients = [{"normandy": {"addons": ["a", "b"]}}, {"normandy": {}}]
+        expression = "normandy.addons intersect ['b', 'c']"
+        assert evaluation.evaluate(expression, clients) == [["b"], []]
+
+    def test_unknown_transforms_are_errors(self):
+        with pytest.raises(ValueError):
+            evaluation.compile_expression("normandy.userId|notATransform")
+
+    def test_syntax_errors_are_errors(self):
+        with pytest.raises(ParseError):
+            evaluation.compile_expression("1 +")
+
+    def test_constant_parts_are_evaluated_once(self, mocker):
+        evaluation.compile_expression.cache_clear()
+        to_datetime = mocker.spy(evaluation, "_to_datetime")
+        clients = [{"normandy": {"request_time": datetime(2020, 2, 15, tzinfo=timezone.utc)}}]
+        expression = 'normandy.request_time >= "2020-02-01"|date'
+        assert evaluation.evaluate(expression, clients * 10) == [True] * 10
+        assert to_datetime.call_count == 1
+
+
+@pytest.mark.django_db
+class TestSimulateEnabledRecipes(object):
+    def test_it_reports_match_rates(self):
+        ChannelFactory(slug="release")
+        LocaleFactory(code="en-US")
+        CountryFactory(code="US")
+        everyone = RecipeFactory(
+            name="everyone",
+            extra_filter_expression="true",
+            filter_object_json=[],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        sampled = RecipeFactory(
+            name="sampled",
+            extra_filter_expression="normandy.channel == 'release'",
+            filter_object_json=[
+                StableSampleFilterFactory(
+                    input=["normandy.userId", "normandy.recipe.id"], rate=0.5
+                )
+            ],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        RecipeFactory(name="disabled", extra_filter_expression="true", filter_object_json=[])
+
+        total, results = evaluation.simulate_enabled_recipes(1000, seed=1, batch_size=300)
+
+        assert total == 1000
+        assert [r["id"] for r in results] == [everyone.id, sampled.id]
+        assert results[0] == {
+            "id": everyone.id,
+            "name": "everyone",
+            "matches": 1000,
+            "rate": 1.0,
+            "error": None,
+        }
+        assert 0.4 < results[1]["rate"] < 0.6
+
+    def test_it_reports_errors(self):
+        recipe = RecipeFactory(
+            extra_filter_expression="true", approver=UserFactory(), enabler=UserFactory()
+        )
+        RecipeRevision.objects.filter(id=recipe.approved_revision.id).update(
+            stored_filter_expression="normandy.userId|notATransform"
+        )
+
+        total, results = evaluation.simulate_enabled_recipes(10)
+
+        assert results[0]["error"] == "No transform found with the name 'notATransform'"
+        assert results[0]["matches"] is None
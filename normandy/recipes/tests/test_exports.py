@@ -427,3 +427,126 @@ class TestRemoteSettings:
         # so it rollsback collection
         assert requests[2].method == "PATCH"
         assert requests[2].url == rs_urls["workspace"]["collection"]
+
+    def test_publish_batch_is_noop_if_not_enabled(self, requestsmock):
+        recipe = RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+        remotesettings = exports.RemoteSettings()
+
+        remotesettings.publish_batch(publish=[recipe], unpublish=[recipe])
+
+        assert len(requestsmock.request_history) == 0
+
+    def test_publish_batch_sends_chunks_and_approves_once(self, mocker, rs_settings, mock_logger):
+        rs_settings.REMOTE_SETTINGS_BATCH_SIZE = 2
+        to_publish = RecipeFactory.create_batch(3, approver=UserFactory(), enabler=UserFactory())
+        to_unpublish = RecipeFactory(approver=UserFactory())
+
+        remotesettings = exports.RemoteSettings()
+        client_mock = remotesettings.client = mocker.MagicMock()
+        batch_mock = client_mock.batch.return_value.__enter__.return_value
+
+        remotesettings.publish_batch(publish=to_publish, unpublish=[to_unpublish])
+
+        # Three upserts are sent in batches of two, then the deletion
+        assert client_mock.batch.call_count == 3
+        assert batch_mock.update_record.call_count == 3
+        batch_mock.delete_record.assert_called_once_with(
+            id=str(to_unpublish.id),
+            bucket=rs_settings.REMOTE_SETTINGS_WORKSPACE_BUCKET_ID,
+            collection=rs_settings.REMOTE_SETTINGS_CAPABILITIES_COLLECTION_ID,
+        )
+        # and the changes are approved only once.
+        assert client_mock.patch_collection.mock_calls == [
+            call(
+                id=rs_settings.REMOTE_SETTINGS_CAPABILITIES_COLLECTION_ID,
+                data=exports.APPROVE_CHANGES_FLAG,
+                bucket=rs_settings.REMOTE_SETTINGS_WORKSPACE_BUCKET_ID,
+            )
+        ]
+        mock_logger.info.assert_called_with("Published 3 records and deleted 1 records")
+
+    @pytest.fixture
+    def batch_endpoint(self, rs_settings, requestsmock):
+        """
+        Mock the batch endpoint, answering each request with the status
+        returned by `get_status(method)`.
+        """
+        requestsmock.get(
+            f"{rs_settings.REMOTE_SETTINGS_URL}/", json={"settings": {"batch_max_requests": 25}},
+        )
+
+        def mock_batch(get_status):
+            def respond(request, context):
+                return {
+                    "responses": [
+                        {
+                            "status": get_status(sub["method"]),
+                            "path": sub["path"],
+                            "body": {"data": {}},
+                            "headers": {},
+                        }
+                        for sub in request.json()["requests"]
+                    ]
+                }
+
+            requestsmock.post(f"{rs_settings.REMOTE_SETTINGS_URL}/batch", json=respond)
+
+        return mock_batch
+
+    def test_publish_batch_skips_records_that_were_not_published(
+        self, rs_urls, requestsmock, batch_endpoint, mock_logger
+    ):
+        published = RecipeFactory(approver=UserFactory())
+        missing = RecipeFactory(approver=UserFactory())
+        batch_endpoint(lambda method: 404 if method == "DELETE" else 200)
+        requestsmock.delete(rs_urls["workspace"]["record"].format(published.id), json={})
+        requestsmock.delete(rs_urls["workspace"]["record"].format(missing.id), status_code=404)
+        requestsmock.patch(rs_urls["workspace"]["collection"], json={"data": {}})
+
+        remotesettings = exports.RemoteSettings()
+        remotesettings.publish_batch(unpublish=[published, missing])
+
+        mock_logger.warning.assert_called_once_with(
+            f"The recipe '{missing.id}' was not published in the capabilities collection. Skip."
+        )
+        # The changes are approved
+        last_request = requestsmock.request_history[-1]
+        assert last_request.method == "PATCH"
+        assert last_request.json()["data"] == exports.APPROVE_CHANGES_FLAG
+
+    def test_publish_batch_fails_if_an_upsert_fails_with_missing_deletes(
+        self, rs_urls, requestsmock, batch_endpoint
+    ):
+        to_publish = RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+        to_unpublish = RecipeFactory(approver=UserFactory())
+        batch_endpoint(lambda method: 404 if method == "DELETE" else 403)
+        requestsmock.patch(rs_urls["workspace"]["collection"], json={"data": {}})
+
+        remotesettings = exports.RemoteSettings()
+        with pytest.raises(kinto_http.KintoException):
+            remotesettings.publish_batch(publish=[to_publish], unpublish=[to_unpublish])
+
+        # The changes are rolled back instead of approved.
+        patches = [r for r in requestsmock.request_history if r.method == "PATCH"]
+        assert [r.json()["data"] for r in patches] == [exports.ROLLBACK_CHANGES_FLAG]
+
+    def test_publish_batch_reverts_changes_if_a_batch_fails(self, mocker, rs_settings):
+        recipe = RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+
+        remotesettings = exports.RemoteSettings()
+        client_mock = remotesettings.client = mocker.MagicMock()
+        client_mock.batch.return_value.__exit__.side_effect = kinto_http.KintoException(
+            "Batch failed"
+        )
+
+        with pytest.raises(kinto_http.KintoException):
+            remotesettings.publish_batch(publish=[recipe])
+
+        # The changes are rolled back instead of approved.
+        assert client_mock.patch_collection.mock_calls == [
+            call(
+                id=rs_settings.REMOTE_SETTINGS_CAPABILITIES_COLLECTION_ID,
+                data=exports.ROLLBACK_CHANGES_FLAG,
+                bucket=rs_settings.REMOTE_SETTINGS_WORKSPACE_BUCKET_ID,
+            )
+        ]
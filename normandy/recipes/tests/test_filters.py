@@ -42,6 +42,10 @@ class FilterTestsBase:
         else:
             assert capabilities - settings.BASELINE_CAPABILITIES
 
+    def test_has_targeting_values(self):
+        filter = self.create_basic_filter()
+        assert all(isinstance(values, set) for values in filter.targeting_values().values())
+
     def test_it_is_in_the_by_type_list(self):
         filter_instance = self.create_basic_filter()
         filter_class = filter_instance.__class__
@@ -94,6 +98,10 @@ class TestVersionFilter(FilterTestsBase):
             '(normandy.version>="74"&&normandy.version<"75")',
         }
 
+    def test_targeting_values(self):
+        filter = self.create_basic_filter(versions=[72, 74])
+        assert filter.targeting_values() == {"version": {"72", "74"}}
+
 
 class TestVersionRangeFilter(FilterTestsBase):
     should_be_baseline = False
@@ -108,6 +116,14 @@ class TestVersionRangeFilter(FilterTestsBase):
             '(env.version|versionCompare("75.0a1")<0)',
         }
 
+    def test_targeting_values_include_the_maximum_major_version(self):
+        filter = self.create_basic_filter(min_version="72.0b2", max_version="75.0")
+        assert filter.targeting_values() == {"version": {"72", "73", "74", "75"}}
+
+    def test_unparseable_versions_are_not_targeted(self):
+        filter = self.create_basic_filter(min_version="nightly", max_version="75.0")
+        assert filter.targeting_values() == {}
+
 
 class TestDateRangeFilter(FilterTestsBase):
     def create_basic_filter(
@@ -217,6 +233,10 @@ class TestPlatformFilter(FilterTestsBase):
         filter = self.create_basic_filter(platforms=["all_linux"])
         assert set(filter.to_jexl().split("||")) == {"normandy.os.isLinux"}
 
+    def test_targeting_values(self):
+        filter = self.create_basic_filter()
+        assert filter.targeting_values() == {"platform": {"all_mac", "all_windows"}}
+
     def test_throws_error_on_bad_platform(self):
         filter = self.create_basic_filter(platforms=["all_linu"])
         with pytest.raises(serializers.ValidationError):
@@ -0,0 +1,33 @@
+from unittest.mock import patch
+
+from normandy.recipes import jexl
+
+
+class TestValidate(object):
+    def setup_method(self):
+        jexl.clear_cache()
+
+    def test_valid_expressions_have_no_errors(self):
+        assert jexl.validate('"app.normandy.enabled"|preferenceValue == true') == []
+
+    def test_it_reports_syntax_errors(self):
+        assert jexl.validate("1 +") == ["Could not parse expression: 1 +"]
+
+    def test_it_reports_unknown_transforms(self):
+        assert jexl.validate("normandy.userId|notATransform") == [
+            "The `notATransform` transform is undefined."
+        ]
+
+    def test_it_caches_results(self):
+        with patch.object(jexl, "get_jexl", wraps=jexl.get_jexl) as get_jexl:
+            jexl.validate("1 + 1")
+            jexl.validate("1 + 1")
+            assert get_jexl.call_count == 1
+
+            jexl.validate("2 + 2")
+            assert get_jexl.call_count == 2
+
+    def test_returned_errors_can_be_modified(self):
+        errors = jexl.validate("1 +")
+        errors.append("extra")
+        assert jexl.validate("1 +") == ["Could not parse expression: 1 +"]
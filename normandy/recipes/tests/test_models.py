@@ -1,7 +1,11 @@
 import json
+from datetime import timedelta
 from unittest.mock import patch
 
 from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 
 import pytest
 from rest_framework import serializers
@@ -10,24 +14,33 @@ from kinto_http import exceptions as remote_settings_exceptions
 from normandy.base.tests import UserFactory, Whatever
 from normandy.recipes.models import (
     ApprovalRequest,
+    BucketAllocation,
     Client,
+    CollectionGeneration,
     EnabledState,
     INFO_CREATE_REVISION,
     INFO_REQUESTING_RECIPE_SIGNATURES,
     INFO_REQUESTING_ACTION_SIGNATURES,
     Recipe,
     RecipeRevision,
+    RemoteSettingsChange,
+    RemoteSettingsOutbox,
+    TargetingKey,
     WARNING_BYPASSING_PEER_APPROVAL,
 )
 from normandy.recipes.tests import (
     ActionFactory,
     ApprovalRequestFactory,
+    ChannelFactory,
+    ChannelFilterFactory,
+    CountryFactory,
     fake_sign,
     OptOutStudyArgumentsFactory,
     PreferenceExperimentArgumentsFactory,
     RecipeFactory,
     RecipeRevisionFactory,
     SignatureFactory,
+    StableSampleFilterFactory,
 )
 from normandy.recipes.filters import StableSampleFilter
 
@@ -284,6 +297,17 @@ class TestArgumentValidation(object):
             error = action.errors["duplicate_study_name"]
             assert exc_info1.value.detail == {"arguments": {"name": error}}
 
+        def test_unique_name_collision_with_unstored_key(self):
+            action = ActionFactory(name="opt-out-study")
+            arguments = {"name": "foo"}
+            RecipeFactory(action=action, arguments=arguments)
+            RecipeRevision.objects.update(stored_argument_key=None)
+
+            with pytest.raises(serializers.ValidationError) as exc_info1:
+                RecipeFactory(action=action, arguments=arguments)
+            error = action.errors["duplicate_study_name"]
+            assert exc_info1.value.detail == {"arguments": {"name": error}}
+
 
 @pytest.mark.django_db
 class TestValidateArgumentShowHeartbeat(object):
@@ -378,6 +402,60 @@ class TestRecipe(object):
         r3 = RecipeFactory(approver=UserFactory(), enabler=UserFactory())
         assert r3.approved_revision.enabled is True
 
+    def test_recipes_without_revisions_have_an_update_time(self):
+        recipe = Recipe.objects.create()
+        recipe.refresh_from_db()
+        assert recipe.last_updated is not None
+
+    def test_denormalized_fields_follow_revisions(self):
+        recipe = RecipeFactory(approver=UserFactory())
+        recipe.refresh_from_db()
+        assert recipe.enabled is None
+        assert recipe.last_updated == recipe.latest_revision.updated
+
+        recipe.approved_revision.enable(UserFactory())
+        recipe.refresh_from_db()
+        assert recipe.enabled is True
+        assert recipe.last_updated == recipe.latest_revision.updated
+
+        recipe.revise(name="changed")
+        recipe.refresh_from_db()
+        assert recipe.enabled is True
+        assert recipe.last_updated == recipe.latest_revision.updated
+
+        recipe.approved_revision.disable(UserFactory())
+        recipe.refresh_from_db()
+        assert recipe.enabled is False
+
+    def test_denormalized_fields_follow_revisions_saved_alone(self):
+        recipe = RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        revision.enabled_state = None
+        revision.updated = revision.updated - timedelta(days=1)
+        # Skip `RecipeRevision.save`, which would change the update time
+        super(RecipeRevision, revision).save()
+
+        recipe.refresh_from_db()
+        assert recipe.enabled is None
+        assert recipe.last_updated == revision.updated
+
+    def test_only_enabled_and_only_disabled(self):
+        enabled = RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+        disabled = RecipeFactory(approver=UserFactory())
+        unapproved = RecipeFactory()
+
+        assert list(Recipe.objects.only_enabled()) == [enabled]
+        assert set(Recipe.objects.only_disabled()) == {disabled, unapproved}
+
+    def test_ordering_puts_recipes_that_were_never_enabled_first(self):
+        disabled = RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+        disabled.approved_revision.disable(UserFactory())
+        enabled = RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+        older = RecipeFactory()
+        newer = RecipeFactory(approver=UserFactory())
+
+        assert list(Recipe.objects.all()) == [newer, older, enabled, disabled]
+
     def test_latest_revision_not_created_if_no_changes(self):
         """
         latest_revision should remain fixed if a recipe is saved with no
@@ -401,7 +479,7 @@ class TestRecipe(object):
     def test_canonical_json(self):
         recipe = RecipeFactory(
             action=ActionFactory(name="action"),
-            arguments_json='{"foo": 1, "bar": 2}',
+            arguments_json={"foo": 1, "bar": 2},
             extra_filter_expression="2 + 2 == 4",
             name="canonical",
             approver=UserFactory(),
@@ -486,6 +564,31 @@ class TestRecipe(object):
         )
         assert recipe.signature is not None
 
+    def test_update_signatures(self, mock_logger, mocked_autograph):
+        enabled = RecipeFactory(enabler=UserFactory(), approver=UserFactory(), signed=False)
+        disabled = RecipeFactory(approver=UserFactory(), signed=False)
+
+        signed = Recipe.objects.filter(id__in=[enabled.id, disabled.id]).update_signatures()
+
+        assert signed == [enabled]
+        mock_logger.info.assert_called_with(
+            Whatever.contains("1 recipes"),
+            extra={"code": INFO_REQUESTING_RECIPE_SIGNATURES, "recipe_ids": [enabled.id]},
+        )
+        enabled.refresh_from_db()
+        disabled.refresh_from_db()
+        assert enabled.signature is not None
+        assert disabled.signature is None
+
+    def test_update_signatures_clears_signatures_if_autograph_unavailable(self, mocker):
+        recipe = RecipeFactory(enabler=UserFactory(), approver=UserFactory(), signed=True)
+        mock_autograph = mocker.patch("normandy.recipes.models.Autographer")
+        mock_autograph.side_effect = ImproperlyConfigured
+
+        assert Recipe.objects.filter(id=recipe.id).update_signatures() == [recipe]
+        recipe.refresh_from_db()
+        assert recipe.signature is None
+
     def test_signatures_update_correctly_on_enable(self, mocked_autograph):
         recipe = RecipeFactory(signed=False, approver=UserFactory())
         recipe.approved_revision.enable(user=UserFactory())
@@ -552,9 +655,9 @@ class TestRecipe(object):
         assert last_updated == recipe.latest_revision.updated
 
     def test_recipe_revise_arguments(self):
-        recipe = RecipeFactory(arguments_json="{}")
+        recipe = RecipeFactory(arguments_json={})
         recipe.revise(arguments={"something": "value"})
-        assert recipe.latest_revision.arguments_json == '{"something": "value"}'
+        assert recipe.latest_revision.arguments_json == {"something": "value"}
 
     def test_recipe_force_revise(self):
         recipe = RecipeFactory(name="my name")
@@ -612,9 +715,9 @@ class TestRecipe(object):
         assert recipe.approval_request is None
 
     def test_revise_arguments(self):
-        recipe = RecipeFactory(arguments_json="[]")
+        recipe = RecipeFactory(arguments_json=[])
         recipe.revise(arguments=[{"id": 1}])
-        assert recipe.latest_revision.arguments_json == '[{"id": 1}]'
+        assert recipe.latest_revision.arguments_json == [{"id": 1}]
 
     def test_enabled_updates_signatures(self, mocked_autograph):
         recipe = RecipeFactory(name="first")
@@ -651,6 +754,29 @@ class TestRecipeRevision(object):
         revision = RecipeRevision.objects.get(pk=revision.pk)
         assert revision.approval_status == revision.REJECTED
 
+    def test_arguments_are_a_copy(self):
+        recipe = RecipeFactory(arguments={"message": "original"})
+        revision = recipe.latest_revision
+
+        arguments = revision.arguments
+        arguments["message"] = "changed"
+        assert revision.arguments_json == {"message": "original"}
+
+        revision.arguments = arguments
+        assert revision.arguments == {"message": "changed"}
+
+    def test_filter_object_is_memoized(self):
+        recipe = RecipeFactory()
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert revision.filter_object is revision.filter_object
+
+        filter_object = StableSampleFilter.create(input=["A"], rate=0.1)
+        revision.filter_object = [filter_object]
+        assert [f.initial_data for f in revision.filter_object] == [filter_object.initial_data]
+
+        revision.filter_object_json = None
+        assert revision.filter_object == []
+
     def test_enable(self):
         recipe = RecipeFactory(name="Test")
         with pytest.raises(EnabledState.NotActionable):
@@ -673,6 +799,29 @@ class TestRecipeRevision(object):
         approval_request.approve(approver=UserFactory(), comment="r+")
         assert recipe.approved_revision.enabled
 
+    def test_filter_expression_is_stored_on_save(self):
+        recipe = RecipeFactory(extra_filter_expression="2 + 2 == 4", filter_object_json=None)
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert revision.stored_filter_expression == "2 + 2 == 4"
+        assert revision.filter_expression == "2 + 2 == 4"
+
+    def test_stored_filter_expression_includes_many_to_many_filters(self):
+        channel = ChannelFactory(slug="beta")
+        recipe = RecipeFactory(extra_filter_expression="2 + 2 == 4", filter_object_json=None)
+        recipe.revise(channels=[channel])
+
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        expected = "(normandy.channel in ['beta']) && (2 + 2 == 4)"
+        assert revision.stored_filter_expression == expected
+        assert revision.filter_expression == expected
+
+    def test_filter_expression_is_computed_if_not_stored(self):
+        recipe = RecipeFactory(extra_filter_expression="2 + 2 == 4", filter_object_json=None)
+        RecipeRevision.objects.update(stored_filter_expression=None)
+
+        revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+        assert revision.filter_expression == "2 + 2 == 4"
+
     def test_disable(self):
         recipe = RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
         assert recipe.approved_revision.enabled
@@ -690,85 +839,170 @@ class TestRecipeRevision(object):
 
     @pytest.mark.django_db
     class TestRemoteSettings:
-        def test_it_publishes_when_enabled(self, mocked_remotesettings):
+        def test_it_enqueues_when_enabled(self, rs_settings, mocked_remotesettings):
             recipe = RecipeFactory(name="Test")
 
             approval_request = recipe.latest_revision.request_approval(creator=UserFactory())
             approval_request.approve(approver=UserFactory(), comment="r+")
             recipe.approved_revision.enable(user=UserFactory())
 
-            mocked_remotesettings.return_value.publish.assert_called_with(recipe)
+            assert list(RemoteSettingsOutbox.objects.values_list("recipe_id", flat=True)) == [
+                recipe.id
+            ]
+            # Nothing is sent to Remote Settings during the transaction.
+            assert not mocked_remotesettings.called
 
-            # Publishes once when enabled twice.
+            # Enqueues once when enabled twice.
             with pytest.raises(EnabledState.NotActionable):
                 recipe.approved_revision.enable(user=UserFactory())
 
-            assert mocked_remotesettings.return_value.publish.call_count == 1
+            assert RemoteSettingsOutbox.objects.count() == 1
 
-        def test_it_publishes_new_revisions_if_enabled(self, mocked_remotesettings):
+        def test_it_enqueues_new_revisions_if_enabled(self, rs_settings):
             recipe = RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
-            assert mocked_remotesettings.return_value.publish.call_count == 1
+            assert RemoteSettingsOutbox.objects.count() == 1
 
             recipe.revise(name="Modified")
             approval_request = recipe.latest_revision.request_approval(creator=UserFactory())
             approval_request.approve(approver=UserFactory(), comment="r+")
 
-            assert mocked_remotesettings.return_value.publish.call_count == 2
-            second_call_args, _ = mocked_remotesettings.return_value.publish.call_args_list[1]
-            (modified_recipe,) = second_call_args
-            assert modified_recipe.latest_revision.name == "Modified"
+            assert RemoteSettingsOutbox.objects.filter(recipe_id=recipe.id).count() == 2
 
-        def test_it_does_not_publish_when_approved_if_not_enabled(self, mocked_remotesettings):
+        def test_it_does_not_enqueue_when_approved_if_not_enabled(self, rs_settings):
             recipe = RecipeFactory(name="Test")
 
             approval_request = recipe.latest_revision.request_approval(creator=UserFactory())
             approval_request.approve(approver=UserFactory(), comment="r+")
 
-            assert not mocked_remotesettings.return_value.publish.called
+            assert not RemoteSettingsOutbox.objects.exists()
 
-        def test_it_unpublishes_when_disabled(self, mocked_remotesettings):
+        def test_it_enqueues_when_disabled(self, rs_settings):
             recipe = RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
 
             recipe.approved_revision.disable(user=UserFactory())
 
-            mocked_remotesettings.return_value.unpublish.assert_called_with(recipe)
+            assert RemoteSettingsOutbox.objects.filter(recipe_id=recipe.id).count() == 2
 
-            # Unpublishes once when disabled twice.
+            # Enqueues once when disabled twice.
             with pytest.raises(EnabledState.NotActionable):
                 recipe.approved_revision.disable(user=UserFactory())
 
-            assert mocked_remotesettings.return_value.publish.call_count == 1
-
-        def test_it_publishes_several_times_when_reenabled(self, mocked_remotesettings):
-            recipe = RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+            assert RemoteSettingsOutbox.objects.filter(recipe_id=recipe.id).count() == 2
 
-            recipe.approved_revision.disable(user=UserFactory())
-            recipe.approved_revision.enable(user=UserFactory())
+        def test_it_does_not_enqueue_if_not_enabled(self, settings):
+            settings.REMOTE_SETTINGS_URL = None
+            RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
 
-            assert mocked_remotesettings.return_value.unpublish.call_count == 1
-            assert mocked_remotesettings.return_value.publish.call_count == 2
+            assert not RemoteSettingsOutbox.objects.exists()
 
-        def test_it_rollbacks_changes_if_error_happens_on_publish(self, mocked_remotesettings):
-            recipe = RecipeFactory(name="Test", approver=UserFactory())
-            error = remote_settings_exceptions.KintoException
-            mocked_remotesettings.return_value.publish.side_effect = error
+        def test_it_journals_changes(self, rs_settings):
+            recipe = RecipeFactory(name="Test")
+            assert RemoteSettingsChange.objects.filter(recipe_id=recipe.id).exists()
 
-            with pytest.raises(error):
-                recipe.approved_revision.enable(user=UserFactory())
+        def test_it_does_not_journal_changes_if_not_enabled(self, settings):
+            settings.REMOTE_SETTINGS_URL = None
+            RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
 
-            saved = Recipe.objects.get(id=recipe.id)
-            assert not saved.approved_revision.enabled
+            assert not RemoteSettingsChange.objects.exists()
 
-        def test_it_rollbacks_changes_if_error_happens_on_unpublish(self, mocked_remotesettings):
+        def test_process_coalesces_changes(self, rs_settings, mocked_remotesettings):
             recipe = RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
-            error = remote_settings_exceptions.KintoException
-            mocked_remotesettings.return_value.unpublish.side_effect = error
+            recipe.approved_revision.disable(user=UserFactory())
+            recipe.approved_revision.enable(user=UserFactory())
+            assert RemoteSettingsOutbox.objects.count() == 3
 
-            with pytest.raises(error):
-                recipe.approved_revision.disable(user=UserFactory())
+            published, unpublished = RemoteSettingsOutbox.process()
 
-            saved = Recipe.objects.get(id=recipe.id)
-            assert saved.approved_revision.enabled
+            assert published == [recipe]
+            assert unpublished == []
+            mocked_remotesettings.return_value.publish_batch.assert_called_once_with(
+                publish=[recipe], unpublish=[]
+            )
+            assert not RemoteSettingsOutbox.objects.exists()
+
+        def test_process_unpublishes_disabled_and_deleted_recipes(
+            self, rs_settings, mocked_remotesettings
+        ):
+            disabled = RecipeFactory(approver=UserFactory(), enabler=UserFactory())
+            disabled.approved_revision.disable(user=UserFactory())
+            RemoteSettingsOutbox.enqueue([disabled.id + 1000])
+
+            published, unpublished = RemoteSettingsOutbox.process()
+
+            assert published == []
+            assert [r.id for r in unpublished] == [disabled.id, disabled.id + 1000]
+
+        def test_process_retries_with_a_backoff(self, rs_settings, mocked_remotesettings):
+            rs_settings.REMOTE_SETTINGS_OUTBOX_BACKOFF = 10
+            RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+            publish_batch = mocked_remotesettings.return_value.publish_batch
+            publish_batch.side_effect = remote_settings_exceptions.KintoException("Nope")
+            now = timezone.now()
+
+            with pytest.raises(remote_settings_exceptions.KintoException):
+                RemoteSettingsOutbox.process(now=now)
+
+            entry = RemoteSettingsOutbox.objects.get()
+            assert entry.attempts == 1
+            assert entry.next_attempt == now + timedelta(seconds=10)
+            assert entry.last_error == "Nope"
+
+            # The entry isn't retried before its backoff expires
+            assert RemoteSettingsOutbox.process(now=now) == ([], [])
+            assert publish_batch.call_count == 1
+
+            # and the backoff doubles after each attempt.
+            with pytest.raises(remote_settings_exceptions.KintoException):
+                RemoteSettingsOutbox.process(now=entry.next_attempt)
+            entry.refresh_from_db()
+            assert entry.attempts == 2
+            assert entry.next_attempt == now + timedelta(seconds=10 + 20)
+
+        def test_process_skips_entries_locked_by_other_workers(
+            self, rs_settings, mocked_remotesettings
+        ):
+            RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+
+            queries = CaptureQueriesContext(connection)
+            with queries:
+                RemoteSettingsOutbox.process()
+
+            outbox_table = RemoteSettingsOutbox._meta.db_table
+            selects = [
+                q["sql"]
+                for q in queries.captured_queries
+                if q["sql"].startswith("SELECT") and outbox_table in q["sql"]
+            ]
+            assert len(selects) == 1
+            assert selects[0].endswith("FOR UPDATE SKIP LOCKED")
+
+        def test_process_leases_entries_while_publishing(self, rs_settings, mocked_remotesettings):
+            rs_settings.REMOTE_SETTINGS_OUTBOX_LEASE = 300
+            RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+            now = timezone.now()
+            claimed_meanwhile = []
+
+            def publish_batch(**kwargs):
+                entry = RemoteSettingsOutbox.objects.get()
+                assert entry.leased_until == now + timedelta(seconds=300)
+                claimed_meanwhile.extend(RemoteSettingsOutbox.claim(now))
+
+            mocked_remotesettings.return_value.publish_batch.side_effect = publish_batch
+            RemoteSettingsOutbox.process(now=now)
+
+            assert claimed_meanwhile == []
+            assert not RemoteSettingsOutbox.objects.exists()
+
+        def test_process_retries_entries_whose_lease_expired(
+            self, rs_settings, mocked_remotesettings
+        ):
+            RecipeFactory(name="Test", approver=UserFactory(), enabler=UserFactory())
+            now = timezone.now()
+            RemoteSettingsOutbox.objects.update(leased_until=now + timedelta(seconds=1))
+
+            assert RemoteSettingsOutbox.process(now=now) == ([], [])
+            published, _ = RemoteSettingsOutbox.process(now=now + timedelta(seconds=1))
+            assert len(published) == 1
 
         def test_enable_rollback_enable_rollout_invariance(self):
             rollout_recipe = RecipeFactory(
@@ -836,6 +1070,46 @@ class TestRecipeRevision(object):
             assert filter_object.capabilities
             assert filter_object.capabilities <= recipe.latest_revision.capabilities
 
+        def test_capabilities_are_stored_on_save(self):
+            recipe = RecipeFactory(extra_capabilities=["test.foo"])
+            revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+            assert "test.foo" in revision.stored_capabilities
+            assert "capabilities-v1" not in revision.stored_capabilities
+
+        def test_capabilities_are_computed_if_not_stored(self):
+            recipe = RecipeFactory(extra_capabilities=["test.foo"])
+            RecipeRevision.objects.update(stored_capabilities=None)
+
+            revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+            assert "test.foo" in revision.capabilities
+            assert "capabilities-v1" in revision.capabilities
+
+        def test_argument_key_is_stored_on_save(self):
+            action = ActionFactory(name="opt-out-study")
+            recipe = RecipeFactory(action=action, arguments={"name": "foo"})
+            revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+            assert revision.stored_argument_key == "foo"
+
+        def test_argument_key_is_empty_for_other_actions(self):
+            recipe = RecipeFactory()
+            revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+            assert revision.stored_argument_key == ""
+
+        def test_argument_key_is_computed_if_not_stored(self):
+            action = ActionFactory(name="opt-out-study")
+            recipe = RecipeFactory(action=action, arguments={"name": "foo"})
+            RecipeRevision.objects.update(stored_argument_key=None)
+
+            revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+            assert revision.argument_key == "foo"
+
+        def test_search_text_is_stored_on_save(self):
+            recipe = RecipeFactory(
+                name="Apple Banana", extra_filter_expression="Cherry", arguments={"Daikon": 1}
+            )
+            revision = RecipeRevision.objects.get(id=recipe.latest_revision.id)
+            assert revision.stored_search_text == 'apple banana\ncherry\n{"daikon": 1}'
+
 
 @pytest.mark.django_db
 class TestApprovalRequest(object):
@@ -953,6 +1227,216 @@ class TestApprovalRequest(object):
         assert recipe.approved_revision.enabled
 
 
+def namespace_filter(start, count, namespace="global-v1"):
+    return {"type": "namespaceSample", "namespace": namespace, "start": start, "count": count}
+
+
+@pytest.mark.django_db
+class TestCollectionGeneration(object):
+    def test_increment(self):
+        generation = CollectionGeneration.get("foo")
+        CollectionGeneration.increment("foo")
+        assert CollectionGeneration.get("foo") == generation + 1
+        CollectionGeneration.increment("foo")
+        assert CollectionGeneration.get("foo") == generation + 2
+
+    def test_changing_a_recipe_increments_recipes(self):
+        recipe = RecipeFactory()
+        generation = CollectionGeneration.get(CollectionGeneration.RECIPES)
+
+        recipe.revise(name="changed")
+        assert CollectionGeneration.get(CollectionGeneration.RECIPES) > generation
+
+        generation = CollectionGeneration.get(CollectionGeneration.RECIPES)
+        ApprovalRequestFactory(revision=recipe.latest_revision).approve(UserFactory(), "r+")
+        assert CollectionGeneration.get(CollectionGeneration.RECIPES) > generation
+
+        generation = CollectionGeneration.get(CollectionGeneration.RECIPES)
+        recipe.approved_revision.enable(UserFactory())
+        assert CollectionGeneration.get(CollectionGeneration.RECIPES) > generation
+
+    def test_changing_an_action_increments_actions_and_recipes(self):
+        action = ActionFactory()
+        actions = CollectionGeneration.get(CollectionGeneration.ACTIONS)
+        recipes = CollectionGeneration.get(CollectionGeneration.RECIPES)
+
+        action.implementation = "changed"
+        action.save()
+        assert CollectionGeneration.get(CollectionGeneration.ACTIONS) > actions
+        assert CollectionGeneration.get(CollectionGeneration.RECIPES) > recipes
+
+
+@pytest.mark.django_db
+class TestBucketAllocation(object):
+    def test_enabling_a_recipe_allocates_its_buckets(self):
+        recipe = RecipeFactory(
+            filter_object_json=[namespace_filter(100, 50)], approver=UserFactory()
+        )
+        assert not BucketAllocation.objects.exists()
+
+        recipe.approved_revision.enable(UserFactory())
+
+        allocation = BucketAllocation.objects.get()
+        assert allocation.recipe == recipe
+        assert allocation.revision == recipe.approved_revision
+        assert (allocation.namespace, allocation.start, allocation.count) == ("global-v1", 100, 50)
+
+    def test_disabling_a_recipe_frees_its_buckets(self):
+        recipe = RecipeFactory(
+            filter_object_json=[namespace_filter(100, 50)],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        assert BucketAllocation.objects.exists()
+
+        recipe.approved_revision.disable(UserFactory())
+
+        assert not BucketAllocation.objects.exists()
+
+    def test_approving_a_new_revision_moves_the_allocation(self):
+        recipe = RecipeFactory(
+            filter_object_json=[namespace_filter(100, 50)],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        recipe.revise(filter_object=[namespace_filter(200, 50)])
+        approval_request = recipe.latest_revision.request_approval(UserFactory())
+        approval_request.approve(UserFactory(), "r+")
+
+        allocation = BucketAllocation.objects.get()
+        assert allocation.revision == recipe.latest_revision
+        assert allocation.start == 200
+
+    def test_overlapping_recipes_cannot_be_enabled(self):
+        RecipeFactory(
+            name="first",
+            filter_object_json=[namespace_filter(9990, 20)],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        recipe = RecipeFactory(
+            filter_object_json=[namespace_filter(5, 10)], approver=UserFactory()
+        )
+
+        with pytest.raises(ValidationError) as exc:
+            recipe.approved_revision.enable(UserFactory())
+
+        assert exc.value.messages == [
+            "Buckets 9990 to 10 of namespace 'global-v1' are already used by recipe 'first'"
+        ]
+        assert not recipe.approved_revision.enabled
+
+    def test_other_namespaces_do_not_overlap(self):
+        RecipeFactory(
+            filter_object_json=[namespace_filter(0, 100)],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        recipe = RecipeFactory(
+            filter_object_json=[namespace_filter(0, 100, namespace="other")],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        assert recipe.approved_revision.enabled
+
+    def test_first_free_range(self):
+        for start, count in [(0, 100), (150, 100), (9900, 100)]:
+            RecipeFactory(
+                filter_object_json=[namespace_filter(start, count)],
+                approver=UserFactory(),
+                enabler=UserFactory(),
+            )
+
+        assert BucketAllocation.first_free_range("global-v1", 50) == 100
+        assert BucketAllocation.first_free_range("global-v1", 51) == 250
+        assert BucketAllocation.first_free_range("global-v1", 9700) is None
+        assert BucketAllocation.first_free_range("other", 10000) == 0
+
+
+@pytest.mark.django_db
+class TestTargetingKey(object):
+    def keys(self, recipe):
+        return {(k.attribute, k.value) for k in TargetingKey.objects.filter(recipe=recipe)}
+
+    def test_enabling_a_recipe_indexes_its_filters(self):
+        channel = ChannelFactory(slug="beta")
+        recipe = RecipeFactory(
+            filter_object_json=[
+                ChannelFilterFactory(channel_objects=[channel]),
+                {"type": "version", "versions": [72]},
+                {"type": "platform", "platforms": ["all_linux"]},
+                StableSampleFilterFactory(),
+            ],
+            approver=UserFactory(),
+        )
+        assert not TargetingKey.objects.exists()
+
+        recipe.approved_revision.enable(UserFactory())
+
+        assert self.keys(recipe) == {
+            ("channel", "beta"),
+            ("platform", "all_linux"),
+            ("version", "72"),
+        }
+        assert TargetingKey.objects.filter(revision=recipe.approved_revision).count() == 3
+
+    def test_disabling_a_recipe_removes_its_keys(self):
+        recipe = RecipeFactory(
+            filter_object_json=[{"type": "version", "versions": [72]}],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        assert TargetingKey.objects.exists()
+
+        recipe.approved_revision.disable(UserFactory())
+
+        assert not TargetingKey.objects.exists()
+
+    def test_filters_on_the_same_attribute_are_combined(self):
+        recipe = RecipeFactory(
+            filter_object_json=[
+                {"type": "version", "versions": [72, 73]},
+                {"type": "versionRange", "min_version": "73.0", "max_version": "75.0"},
+                {"type": "platform", "platforms": ["all_mac"]},
+                {"type": "platform", "platforms": ["all_linux"]},
+            ],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        assert self.keys(recipe) == {("version", "73"), ("platform", TargetingKey.NO_MATCH)}
+
+    def test_filter_recipes(self):
+        ChannelFactory(slug="beta")
+        ChannelFactory(slug="release")
+        CountryFactory(code="US")
+        everyone = RecipeFactory(
+            filter_object_json=[], approver=UserFactory(), enabler=UserFactory()
+        )
+        beta = RecipeFactory(
+            filter_object_json=[{"type": "channel", "channels": ["beta"]}],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+        beta_in_us = RecipeFactory(
+            filter_object_json=[
+                {"type": "channel", "channels": ["beta"]},
+                {"type": "country", "countries": ["US"]},
+            ],
+            approver=UserFactory(),
+            enabler=UserFactory(),
+        )
+
+        def matching(**client_values):
+            recipes = TargetingKey.filter_recipes(Recipe.objects.all(), client_values)
+            return set(recipes)
+
+        assert matching(channel="release") == {everyone}
+        assert matching(channel="beta") == {everyone, beta, beta_in_us}
+        assert matching(channel="beta", country="DE") == {everyone, beta}
+        assert matching(channel="beta", country=None) == {everyone, beta, beta_in_us}
+        assert matching() == {everyone, beta, beta_in_us}
+
+
 class TestClient(object):
     def test_geolocation(self, rf, settings):
         settings.NUM_PROXIES = 1
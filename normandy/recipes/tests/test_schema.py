@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 from normandy.base.tests import GQ
@@ -54,3 +56,16 @@ class TestQuery(object):
         r = RecipeFactory()
         res = gql_client.execute(GQ().query.recipeRevision(id=r.latest_revision.id).fields("id"))
         assert res == {"data": {"recipeRevision": {"id": str(r.latest_revision.id)}}}
+
+    def test_json_fields_are_strings(self, gql_client):
+        r = RecipeFactory(arguments={"message": "hi"}, filter_object_json=None)
+        res = gql_client.execute(
+            GQ()
+            .query.recipeRevision(id=r.latest_revision.id)
+            .fields("argumentsJson", "filterObjectJson", GQ().action.fields("argumentsSchemaJson"))
+        )
+        revision = res["data"]["recipeRevision"]
+        assert json.loads(revision["argumentsJson"]) == {"message": "hi"}
+        assert revision["filterObjectJson"] is None
+        schema = json.loads(revision["action"]["argumentsSchemaJson"])
+        assert schema == r.latest_revision.action.arguments_schema
@@ -186,6 +186,65 @@ class TestVerifySignatureX5U(object):
         assert ret == mock_verify_signature_pubkey.return_value
 
 
+class TestSignatureVerifier(object):
+    data = TestVerifySignaturePubkey.data
+    signature = TestVerifySignaturePubkey.signature
+    pubkey = TestVerifySignaturePubkey.pubkey
+
+    def test_it_verifies_signatures(self):
+        bad_signature = self.signature.replace("s", "S")
+        verifier = signing.SignatureVerifier(processes=1)
+        results = verifier.verify(
+            [
+                (self.data, self.signature, None, self.pubkey),
+                (self.data, bad_signature, None, self.pubkey),
+            ]
+        )
+        assert results[0] is None
+        assert isinstance(results[1], signing.SignatureDoesNotMatch)
+        assert set(verifier.timings.keys()) == {"certificates", "signatures"}
+
+    def test_it_verifies_signatures_in_parallel(self, mocker):
+        mock_connections = mocker.patch("normandy.recipes.signing.connections")
+        count = signing.MIN_PARALLEL_VERIFICATIONS
+        verifier = signing.SignatureVerifier(processes=2)
+        items = [(self.data, self.signature, None, self.pubkey)] * count
+        items.append((self.data, "aa==", None, self.pubkey))
+
+        results = verifier.verify(items)
+        assert results[:count] == [None] * count
+        assert isinstance(results[count], signing.WrongSignatureSize)
+        assert mock_connections.close_all.called
+
+    def test_it_verifies_in_process_by_default(self, mocker):
+        mock_executor = mocker.patch("normandy.recipes.signing.ProcessPoolExecutor")
+        verifier = signing.SignatureVerifier()
+        assert verifier.processes == 1
+
+        items = [(self.data, self.signature, None, self.pubkey)]
+        results = verifier.verify(items * signing.MIN_PARALLEL_VERIFICATIONS)
+        assert results == [None] * signing.MIN_PARALLEL_VERIFICATIONS
+        assert not mock_executor.called
+
+    def test_it_checks_each_certificate_chain_once(self, mocker):
+        mock_get_public_key = mocker.patch("normandy.recipes.signing.get_x5u_public_key")
+        mock_get_public_key.return_value = self.pubkey
+        x5u = "https://example.com/cert"
+
+        verifier = signing.SignatureVerifier(processes=1)
+        results = verifier.verify([(self.data, self.signature, x5u, None)] * 3)
+        assert results == [None] * 3
+        mock_get_public_key.assert_called_once_with(x5u)
+
+    def test_it_reports_certificate_problems(self, mocker):
+        mock_get_public_key = mocker.patch("normandy.recipes.signing.get_x5u_public_key")
+        mock_get_public_key.side_effect = signing.BadCertificate("testing exception")
+
+        verifier = signing.SignatureVerifier(processes=1)
+        results = verifier.verify([(self.data, self.signature, "https://example.com/cert", None)])
+        assert isinstance(results[0], signing.BadCertificate)
+
+
 class TestExtractCertsFromPem(object):
     def test_empty(self):
         assert signing.extract_certs_from_pem("") == []
@@ -405,6 +464,60 @@ class TestVerifyX5u(object):
         with pytest.raises(signing.CertificateHasWrongSubject):
             signing.verify_x5u("https://example.com/cert.pem")
 
+    def test_it_caches_validated_chains(self, mocker, settings):
+        path = os.path.join(os.path.dirname(__file__), "data", "test_certs.pem")
+        with open(path) as f:
+            cert_pem = f.read()
+
+        settings.CERTIFICATES_CHECK_VALIDITY = False
+        settings.CERTIFICATES_EXPECTED_ROOT_HASH = None
+        settings.CERTIFICATES_EXPECTED_SUBJECT_CN = None
+        settings.X5U_CACHE_TIME = 600
+        signing.validated_chains.clear()
+
+        mock_requests = mocker.patch("normandy.recipes.signing.requests")
+        mock_requests.get.return_value.content.decode.return_value = cert_pem
+        mock_parse = mocker.patch(
+            "normandy.recipes.signing.parse_cert_from_der", wraps=signing.parse_cert_from_der
+        )
+
+        url = "https://example.com/cert.pem"
+        first = signing.verify_x5u(url)
+        parse_count = mock_parse.call_count
+        assert parse_count > 0
+
+        assert signing.verify_x5u(url) is first
+        assert mock_parse.call_count == parse_count
+
+        # Changing the settings used for validation means validating again
+        settings.CERTIFICATES_EXPECTED_SUBJECT_CN = "wrong.subject.example.com"
+        with pytest.raises(signing.CertificateHasWrongSubject):
+            signing.verify_x5u(url)
+
+
+class TestValidatedChainCache(object):
+    def test_it_works(self):
+        chains = signing.ValidatedChainCache(max_size=2)
+        chains.set("a", "chain", signing.utcnow() + timedelta(minutes=1))
+        assert chains.get("a") == "chain"
+        assert chains.get("b") is None
+
+    def test_it_does_not_return_expired_chains(self):
+        chains = signing.ValidatedChainCache(max_size=2)
+        chains.set("a", "chain", signing.utcnow() - timedelta(minutes=1))
+        assert chains.get("a") is None
+
+    def test_it_evicts_least_recently_used_chains(self):
+        chains = signing.ValidatedChainCache(max_size=2)
+        expires = signing.utcnow() + timedelta(minutes=1)
+        chains.set("a", "chain a", expires)
+        chains.set("b", "chain b", expires)
+        chains.get("a")
+        chains.set("c", "chain c", expires)
+        assert chains.get("a") == "chain a"
+        assert chains.get("b") is None
+        assert chains.get("c") == "chain c"
+
 
 class TestReadTimestampObject(object):
     def test_it_reads_utc_time_format(self):
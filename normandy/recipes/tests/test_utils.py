@@ -1,9 +1,21 @@
+import hashlib
 from random import random
 from fractions import Fraction
 
 import pytest
 
-from normandy.recipes.utils import fraction_to_key
+from normandy.recipes.utils import (
+    bucket_ranges,
+    bucket_sample,
+    bucket_sample_many,
+    deterministic_sample,
+    deterministic_sample_many,
+    find_free_range,
+    fraction_to_key,
+    fraction_to_point,
+    major_version,
+    ranges_overlap,
+)
 
 
 @pytest.fixture
@@ -44,3 +56,105 @@ class TestFractionToKey(object):
             r = random()
             key = fraction_to_key(r)
             assert len(key) == 64
+
+
+class TestBucketSample(object):
+    def test_it_covers_every_bucket(self):
+        inputs = [f"user-{i}" for i in range(100)]
+        assert all(bucket_sample([i], 0, 10, 10) for i in inputs)
+        assert not any(bucket_sample([i], 0, 0, 10) for i in inputs)
+
+    def test_ranges_partition_the_inputs(self):
+        for i in range(100):
+            matches = [bucket_sample([i], start, 25, 100) for start in range(0, 100, 25)]
+            assert matches.count(True) == 1
+
+    def test_it_wraps_around(self):
+        for i in range(100):
+            wrapped = bucket_sample([i], 90, 20, 100)
+            assert wrapped == (bucket_sample([i], 90, 10, 100) or bucket_sample([i], 0, 10, 100))
+
+
+class TestFractionToPoint(object):
+    def test_it_matches_keys(self):
+        for frac in [0, Fraction(1, 3), 0.00001, 0.5, 1.0] + [random() for _ in range(100)]:
+            assert fraction_to_point(frac) == int(fraction_to_key(frac), 16)
+
+    def test_it_saturates(self):
+        assert fraction_to_point(1) == 2 ** 256 - 1
+
+
+class TestDeterministicSampleMany(object):
+    inputs_list = [[f"user-{i}", 42] for i in range(500)]
+
+    @pytest.mark.parametrize("rate", [0, 0.001, 0.25, 0.5, 1])
+    def test_it_matches_single_samples(self, rate):
+        expected = [deterministic_sample(rate, inputs) for inputs in self.inputs_list]
+        assert deterministic_sample_many(rate, self.inputs_list) == expected
+
+    def test_prefix_is_hashed_first(self):
+        inputs_list = [[inputs[1]] for inputs in self.inputs_list]
+        expected = [deterministic_sample(0.5, ["ns"] + inputs) for inputs in inputs_list]
+        assert deterministic_sample_many(0.5, inputs_list, prefix=["ns"]) == expected
+
+    def test_it_compares_full_hashes_when_prefixes_are_equal(self):
+        # A rate of exactly the hash of the inputs shares its prefix with it.
+        digest = hashlib.sha256(b"user-1").digest()
+        rate = Fraction(int.from_bytes(digest, "big"), 2 ** 256 - 1)
+        assert deterministic_sample_many(rate, [["user-1"]]) == [False]
+        rate = Fraction(int.from_bytes(digest, "big") + 1, 2 ** 256 - 1)
+        assert deterministic_sample_many(rate, [["user-1"]]) == [True]
+
+
+class TestBucketSampleMany(object):
+    inputs_list = [[f"user-{i}"] for i in range(500)]
+
+    @pytest.mark.parametrize("start,count,total", [(0, 10, 100), (90, 20, 100), (0, 0, 10)])
+    def test_it_matches_single_samples(self, start, count, total):
+        expected = [
+            bucket_sample(["ns"] + inputs, start, count, total) for inputs in self.inputs_list
+        ]
+        result = bucket_sample_many(start, count, total, self.inputs_list, prefix=["ns"])
+        assert result == expected
+
+
+class TestBucketRanges(object):
+    def test_it_works(self):
+        assert bucket_ranges(10, 20, 100) == [(10, 30)]
+        assert bucket_ranges(0, 100, 100) == [(0, 100)]
+        assert bucket_ranges(10, 0, 100) == []
+
+    def test_it_wraps_around(self):
+        assert bucket_ranges(90, 20, 100) == [(90, 100), (0, 10)]
+        assert bucket_ranges(110, 20, 100) == [(10, 30)]
+        assert bucket_ranges(50, 200, 100) == [(0, 100)]
+
+    def test_ranges_overlap(self):
+        assert ranges_overlap(bucket_ranges(90, 20, 100), bucket_ranges(5, 10, 100))
+        assert not ranges_overlap(bucket_ranges(90, 20, 100), bucket_ranges(10, 10, 100))
+        assert not ranges_overlap([], bucket_ranges(0, 100, 100))
+
+
+class TestFindFreeRange(object):
+    def test_it_finds_the_first_gap(self):
+        ranges = [(0, 10), (20, 30), (30, 50)]
+        assert find_free_range(ranges, 10, 100) == 10
+        assert find_free_range(ranges, 11, 100) == 50
+        assert find_free_range(ranges, 51, 100) is None
+
+    def test_it_uses_wrapping_gaps_last(self):
+        ranges = [(10, 90)]
+        assert find_free_range(ranges, 10, 100) == 0
+        assert find_free_range(ranges, 15, 100) == 90
+
+    def test_invalid_counts(self):
+        assert find_free_range([], 0, 100) is None
+        assert find_free_range([], 101, 100) is None
+        assert find_free_range([], 100, 100) == 0
+
+
+def test_major_version():
+    assert major_version("72.0b5") == 72
+    assert major_version("100.0.1") == 100
+    assert major_version(78) == 78
+    assert major_version("nightly") is None
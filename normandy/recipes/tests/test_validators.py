@@ -2,7 +2,12 @@ from django.core.exceptions import ValidationError
 
 import pytest
 
-from normandy.recipes.validators import validate_json
+from normandy.recipes.validators import (
+    clear_schema_validators,
+    get_schema_validator,
+    schema_hash,
+    validate_json,
+)
 
 
 def test_validate_json():
@@ -10,3 +15,27 @@ def test_validate_json():
     validate_json('{"foo": 2, "bar": "bazz"}')
     with pytest.raises(ValidationError):
         validate_json('invalid_json"""""sadf')
+
+
+class TestGetSchemaValidator(object):
+    schema = {"type": "object", "properties": {"name": {"type": "string"}}, "required": ["name"]}
+
+    def test_it_reuses_validators(self):
+        validator = get_schema_validator(self.schema)
+        assert get_schema_validator(dict(reversed(list(self.schema.items())))) is validator
+        assert get_schema_validator({"type": "object"}) is not validator
+
+    def test_it_can_be_cleared(self):
+        validator = get_schema_validator(self.schema)
+        clear_schema_validators()
+        assert get_schema_validator(self.schema) is not validator
+
+    def test_it_keeps_blank_required_fields_invalid(self):
+        validator = get_schema_validator(self.schema)
+        errors = list(validator.iter_errors({"name": ""}))
+        assert [list(e.path) for e in errors] == [["name"]]
+        assert validator.is_valid({"name": "foo"})
+
+    def test_schema_hash_ignores_key_order(self):
+        assert schema_hash({"a": 1, "b": 2}) == schema_hash({"b": 2, "a": 1})
+        assert schema_hash({"a": 1}) != schema_hash({"a": 2})
@@ -1,27 +1,79 @@
 import hashlib
+import re
 
 
-def fraction_to_key(frac):
-    """Map from the range [0, 1] to [0, max(sha256)]. The result is a string."""
-    # SHA 256 hashes are 64-digit hexadecimal numbers. The largest possible SHA 256
-    # hash is 2^256 - 1
+# SHA 256 hashes are 256-bit numbers. The largest possible SHA 256 hash is 2^256 - 1.
+HASH_BITS = 256
+MAX_HASH = 2 ** HASH_BITS - 1
+
+# Hashes are compared by their first 64 bits, and only compared in full when
+# those are equal.
+PREFIX_BYTES = 8
+PREFIX_SHIFT = HASH_BITS - PREFIX_BYTES * 8
+
 
+def fraction_to_point(frac):
+    """Map from the range [0, 1] to [0, max(sha256)]. The result is an integer."""
     if frac < 0 or frac > 1:
         raise ValueError("frac must be between 0 and 1 inclusive (got {})".format(frac))
 
-    mult = 2 ** 256 - 1
-    in_decimal = int(frac * mult)
+    in_decimal = int(frac * MAX_HASH)
 
     assert in_decimal >= 0
 
-    hex_digits = hex(in_decimal)[2:]  # Strip off leading "0x"
-    padded = "{:0>64}".format(hex_digits)
-
     # Saturate at 2**256 - 1
-    if len(padded) > 64:
-        return "f" * 64
-    else:
-        return padded
+    return min(in_decimal, MAX_HASH)
+
+
+def fraction_to_key(frac):
+    """Map from the range [0, 1] to [0, max(sha256)]. The result is a string."""
+    return "{:064x}".format(fraction_to_point(frac))
+
+
+def hash_inputs(inputs_list, prefix=()):
+    """
+    Hash each list of inputs in `inputs_list`, after the inputs in `prefix`.
+
+    The prefix is only hashed once, which makes hashing many inputs that share
+    a namespace cheaper.
+
+    :returns: A generator of sha256 digests, as bytes
+    """
+    base = hashlib.sha256()
+    for inp in prefix:
+        base.update(str(inp).encode("utf8"))
+
+    for inputs in inputs_list:
+        hasher = base.copy()
+        for inp in inputs:
+            hasher.update(str(inp).encode("utf8"))
+        yield hasher.digest()
+
+
+def deterministic_sample_many(rate, inputs_list, prefix=()):
+    """
+    Deterministically choose True or False for each of many sets of inputs.
+
+    This is equivalent to calling :func:`deterministic_sample` for each set
+    of inputs, but converts `rate` only once, and compares the integer
+    prefixes of the hashes instead of their hexadecimal representations.
+
+    :param rate: The probability of returning True
+    :param inputs_list: A list of lists of hashable data to decide True or False about
+    :param prefix: Inputs to hash before each list of inputs, such as a namespace
+    :returns: A list of booleans, one for each list of inputs
+    """
+    sample_point = fraction_to_point(rate)
+    point_prefix = sample_point >> PREFIX_SHIFT
+
+    results = []
+    for digest in hash_inputs(inputs_list, prefix):
+        digest_prefix = int.from_bytes(digest[:PREFIX_BYTES], "big")
+        if digest_prefix != point_prefix:
+            results.append(digest_prefix < point_prefix)
+        else:
+            results.append(int.from_bytes(digest, "big") < sample_point)
+    return results
 
 
 def deterministic_sample(rate, inputs):
@@ -35,14 +87,117 @@ def deterministic_sample(rate, inputs):
     :param input: A list of hashable data to feed to decide True or False about
     :returns: True with probability `rate` and False otherwise
     """
-    hasher = hashlib.sha256()
-    for inp in inputs:
-        hasher.update(str(inp).encode("utf8"))
+    return deterministic_sample_many(rate, [inputs])[0]
 
-    sample_point = fraction_to_key(rate)
-    input_hash = hasher.hexdigest()
 
-    assert len(sample_point) == 64
-    assert len(input_hash) == 64
+def bucket_sample_many(start, count, total, inputs_list, prefix=()):
+    """
+    Deterministically choose True or False for each of many sets of inputs,
+    based on which bucket they hash into.
+
+    This is equivalent to calling :func:`bucket_sample` for each set of inputs.
+
+    :param start: The first bucket in the range
+    :param count: The number of buckets in the range
+    :param total: The total number of buckets
+    :param inputs_list: A list of lists of hashable data to decide True or False about
+    :param prefix: Inputs to hash before each list of inputs, such as a namespace
+    :returns: A list of booleans, one for each list of inputs
+    """
+    return [
+        ((int.from_bytes(digest, "big") * total >> HASH_BITS) - start) % total < count
+        for digest in hash_inputs(inputs_list, prefix)
+    ]
 
-    return input_hash < sample_point
+
+def bucket_sample(inputs, start, count, total):
+    """
+    Deterministically choose True or False for a set of inputs, based on which
+    bucket they hash into.
+
+    The hash of `inputs` is mapped to one of `total` buckets. The result is
+    True if that bucket is in the range of `count` buckets beginning at
+    `start`. The range wraps around to the first bucket if it goes past the
+    last one.
+
+    :param inputs: A list of hashable data to feed to decide True or False about
+    :param start: The first bucket in the range
+    :param count: The number of buckets in the range
+    :param total: The total number of buckets
+    :returns: True if the inputs fall in the range of buckets and False otherwise
+    """
+    return bucket_sample_many(start, count, total, [inputs])[0]
+
+
+def bucket_ranges(start, count, total):
+    """
+    Split the range of `count` buckets beginning at `start`, out of `total`
+    buckets, into ranges that don't wrap around.
+
+    :returns: A list of ``(first, end)`` tuples, where ``end`` is exclusive
+    """
+    if count <= 0:
+        return []
+    if count >= total:
+        return [(0, total)]
+
+    start = start % total
+    end = start + count
+    if end <= total:
+        return [(start, end)]
+    return [(start, total), (0, end - total)]
+
+
+def ranges_overlap(ranges, other_ranges):
+    """Check if any of two lists of bucket ranges overlap."""
+    return any(
+        first < other_end and other_first < end
+        for first, end in ranges
+        for other_first, other_end in other_ranges
+    )
+
+
+def find_free_range(ranges, count, total):
+    """
+    Find the first bucket of the first run of `count` buckets, out of `total`
+    buckets, that isn't in any of `ranges`. Runs that wrap around are only
+    used if there is no other free run.
+
+    :returns: The first bucket of the free range, or None if there isn't one
+    """
+    if count <= 0 or count > total:
+        return None
+
+    free_start = 0
+    gaps = []
+    for first, end in sorted(ranges):
+        if first > free_start:
+            gaps.append((free_start, first))
+        free_start = max(free_start, end)
+    if free_start < total:
+        gaps.append((free_start, total))
+
+    for first, end in gaps:
+        if end - first >= count:
+            return first
+
+    # The last gap and the first gap are contiguous if the range wraps around.
+    if len(gaps) > 1 and gaps[-1][1] == total and gaps[0][0] == 0:
+        first, end = gaps[-1]
+        if (end - first) + (gaps[0][1] - gaps[0][0]) >= count:
+            return first
+
+    return None
+
+
+def major_version(version):
+    """
+    Get the major version of a version string, such as 72 for ``72.0b5``.
+
+    :returns: The major version as an integer, or None if `version` doesn't
+        start with one
+    """
+    match = re.match(r"\s*(\d+)", str(version))
+    if match is None:
+        return None
+    return int(match.group(1))
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import jsonschema
 
@@ -21,6 +22,39 @@ JSONSchemaValidator = jsonschema.validators.extend(
     validator=jsonschema.validators.Draft4Validator, validators={"required": _required}
 )
 
+# Compiled validators, keyed by the hash of their schema. A changed schema
+# gets a new entry, so they never need to be invalidated. Validators aren't
+# code-generated, since that would lose the paths `_required` reports.
+_schema_validators = {}
+MAX_CACHED_SCHEMA_VALIDATORS = 128
+
+
+def schema_hash(schema):
+    """Hash a JSON schema, ignoring the order of its keys."""
+    canonical = json.dumps(schema, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def get_schema_validator(schema):
+    """
+    Get a validator for `schema`.
+
+    Validators are shared by the whole process, so that validating against
+    the same schema repeatedly doesn't set up a new validator every time.
+    """
+    key = schema_hash(schema)
+    validator = _schema_validators.get(key)
+    if validator is None:
+        if len(_schema_validators) >= MAX_CACHED_SCHEMA_VALIDATORS:
+            _schema_validators.clear()
+        validator = JSONSchemaValidator(schema)
+        _schema_validators[key] = validator
+    return validator
+
+
+def clear_schema_validators():
+    _schema_validators.clear()
+
 
 def validate_json(value):
     """
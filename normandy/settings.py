@@ -192,6 +192,12 @@ class Metrics:
     METRICS_STATSD_PORT = values.IntegerValue(8125)
     METRICS_STATSD_NAMESPACE = values.Value("")
 
+    QUERY_BUDGET_ENABLED = values.BooleanValue(False)
+    QUERY_BUDGET_DEFAULT = values.IntegerValue(50)
+    QUERY_BUDGETS = values.DictValue({})
+    QUERY_BUDGET_MAX_REPEATS = values.IntegerValue(10)
+    QUERY_BUDGET_RAISE = values.BooleanValue(False)
+
 
 # ==================== ENVIRONMENTS ====================
 
@@ -241,6 +247,10 @@ class Base(Core, CORS, OIDC, Metrics):
         middleware = Core.MIDDLEWARE + self.EXTRA_MIDDLEWARE
         if self.USE_OIDC:
             middleware.append("normandy.base.middleware.ConfigurableRemoteUserMiddleware")
+        if self.QUERY_BUDGET_ENABLED:
+            # Inside the response metrics middleware, so that it can report the counts
+            index = middleware.index("normandy.base.middleware.response_metrics_middleware")
+            middleware.insert(index + 1, "normandy.base.middleware.query_budget_middleware")
         return middleware
 
     def LOGGING(self):
@@ -349,6 +359,8 @@ class Base(Core, CORS, OIDC, Metrics):
     NUM_PROXIES = values.IntegerValue(0)
     API_CACHE_TIME = values.IntegerValue(30)
     API_CACHE_ENABLED = values.BooleanValue(True)
+    API_RESPONSE_CACHE_ENABLED = values.BooleanValue(True)
+    API_RESPONSE_CACHE_TIME = values.IntegerValue(60 * 60)
     PERMANENT_REDIRECT_CACHE_TIME = values.IntegerValue(60 * 60 * 24 * 30)
     HTTPS_REDIRECT_CACHE_TIME = values.IntegerValue(60 * 60 * 24 * 30)
     X5U_CACHE_TIME = values.IntegerValue(60 * 10)
@@ -365,6 +377,7 @@ class Base(Core, CORS, OIDC, Metrics):
     AUTOGRAPH_HAWK_SECRET_KEY = values.Value()
     AUTOGRAPH_SIGNATURE_MAX_AGE = values.IntegerValue(60 * 60 * 24 * 7)
     AUTOGRAPH_X5U_CACHE_BUST = values.Value(None)
+    AUTOGRAPH_SIGNING_BATCH_SIZE = values.IntegerValue(50)
 
     # Remote Settings connection configuration
     REMOTE_SETTINGS_URL = values.Value()
@@ -374,12 +387,22 @@ class Base(Core, CORS, OIDC, Metrics):
     REMOTE_SETTINGS_WORKSPACE_BUCKET_ID = values.Value("main-workspace")
     REMOTE_SETTINGS_CAPABILITIES_COLLECTION_ID = values.Value("normandy-recipes-capabilities")
     REMOTE_SETTINGS_RETRY_REQUESTS = values.IntegerValue(3)
+    REMOTE_SETTINGS_BATCH_SIZE = values.IntegerValue(25)
+    REMOTE_SETTINGS_OUTBOX_BACKOFF = values.IntegerValue(10)
+    REMOTE_SETTINGS_OUTBOX_MAX_BACKOFF = values.IntegerValue(600)
+    REMOTE_SETTINGS_OUTBOX_LEASE = values.IntegerValue(300)
 
     # How many days before expiration to warn for expired certificates
     CERTIFICATES_EXPIRE_EARLY_DAYS = values.IntegerValue(None)
     CERTIFICATES_CHECK_VALIDITY = values.BooleanValue(True)
     CERTIFICATES_EXPECTED_ROOT_HASH = values.Value(None)
     CERTIFICATES_EXPECTED_SUBJECT_CN = values.Value("normandy.content-signature.mozilla.org")
+    # Number of processes used to verify signatures during system checks. 0 means one per CPU.
+    SIGNATURE_VERIFICATION_PROCESSES = values.IntegerValue(1)
+
+    # Targeting simulation
+    TARGETING_SIMULATION_BATCH_SIZE = values.IntegerValue(10000)
+    TARGETING_SIMULATION_MAX_CLIENTS = values.IntegerValue(100000)
 
     # Storage settings
     DEFAULT_FILE_STORAGE = values.Value("normandy.base.storage.NormandyS3Boto3Storage")
@@ -541,6 +564,10 @@ class Test(InsecureAuthentication, Base):
     AUTOGRAPH_HAWK_ID = None
     AUTOGRAPH_HAWK_SECRET_KEY = None
     OIDC_USER_ENDPOINT = "https://auth.example.com/userinfo"
+    QUERY_BUDGET_RAISE = True
+    # The database is rolled back between tests, but the cache isn't, so
+    # cached responses could be served for the same generation of other data.
+    API_RESPONSE_CACHE_ENABLED = False
 
 
 class Docs(Base):
@@ -8,6 +8,7 @@ from xml.sax import SAXParseException
 
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.functions import Cast
 
 from dirtyfields import DirtyFieldsMixin
 
@@ -32,7 +33,9 @@ class Extension(DirtyFieldsMixin, models.Model):
     @property
     def recipes_used_by(self):
         """Set of enabled recipes that are using this extension."""
-        return Recipe.objects.filter(latest_revision__arguments_json__contains=self.xpi.url)
+        return Recipe.objects.annotate(
+            latest_arguments_text=Cast("latest_revision__arguments_json", models.TextField())
+        ).filter(latest_arguments_text__contains=self.xpi.url)
 
     def populate_metadata(self):
         # Validate XPI file